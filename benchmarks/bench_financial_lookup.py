@@ -0,0 +1,86 @@
+"""
+財務數據查詢效能比較
+比較舊版長格式逐次篩選與新版日期 × 科目矩陣的查詢路徑（模擬 get_financial_statement 每檔股票的查詢量）
+
+使用方式: python benchmarks/bench_financial_lookup.py [股票數量]
+"""
+import os
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_finmind import FIRST_STOCK_ID, QUARTER_ENDS, make_financial_rows
+from modules.financial import extract_value_by_date, get_year_values, index_financial_data
+
+# get_financial_statement 查詢的科目
+TYPES = ['Revenue', 'GrossProfit', 'OperatingIncome', 'PreTaxIncome', 'IncomeAfterTaxes', 'EPS']
+YEAR = datetime.now().year - 1
+
+
+def make_financial_data(seed, years=5):
+    """以假 FinMind 後端產生一檔股票近 N 年的長格式財務報表數據"""
+    now = datetime.now()
+    return pd.DataFrame(make_financial_rows(str(FIRST_STOCK_ID + seed), datetime(now.year - years, 1, 1), now))
+
+
+def legacy_extract_value_by_date(financial_data, data_type, target_date):
+    """舊版：每次查詢都對整份長格式數據建立兩個布林遮罩"""
+    filtered_data = financial_data[
+        (financial_data['type'] == data_type) &
+        (financial_data['date'] == target_date)
+    ]
+    return filtered_data.iloc[0]['value'] if not filtered_data.empty else None
+
+
+def legacy_year_total(financial_data, data_type, year):
+    """舊版：以 str.startswith 篩選年度"""
+    data = financial_data[
+        (financial_data['type'] == data_type) &
+        (financial_data['date'].str.startswith(str(year)))
+    ]
+    return data['value'].sum() if not data.empty else None
+
+
+def legacy_workload(financial_data):
+    """舊版查詢路徑：6 個科目 × 4 季 + 今年/去年加總"""
+    for data_type in TYPES:
+        for month, day in QUARTER_ENDS:
+            legacy_extract_value_by_date(financial_data, data_type, f'{YEAR}-{month:02d}-{day}')
+        legacy_year_total(financial_data, data_type, YEAR)
+        legacy_year_total(financial_data, data_type, YEAR - 1)
+
+
+def indexed_workload(financial_data):
+    """新版查詢路徑：先建立矩陣，再進行相同的查詢"""
+    matrix = index_financial_data(financial_data)
+    for data_type in TYPES:
+        for month, day in QUARTER_ENDS:
+            extract_value_by_date(matrix, data_type, f'{YEAR}-{month:02d}-{day}')
+        get_year_values(matrix, data_type, YEAR).sum()
+        get_year_values(matrix, data_type, YEAR - 1).sum()
+
+
+def run(stock_count):
+    """執行比較並輸出結果"""
+    frames = [make_financial_data(seed) for seed in range(stock_count)]
+    
+    results = {}
+    for name, workload in (('legacy', legacy_workload), ('indexed', indexed_workload)):
+        start = time.perf_counter()
+        for financial_data in frames:
+            workload(financial_data)
+        results[name] = time.perf_counter() - start
+    
+    print(f"股票數: {stock_count}（每檔 {len(frames[0])} 筆，36 次查詢）")
+    print(f"  舊版逐次篩選: {results['legacy']:.3f} 秒")
+    print(f"  日期×科目矩陣: {results['indexed']:.3f} 秒（含建立矩陣）")
+    print(f"  加速倍數: {results['legacy'] / results['indexed']:.1f}x")
+    return results
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
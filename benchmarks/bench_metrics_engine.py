@@ -0,0 +1,62 @@
+"""
+綜合損益表 / EPS 計算效能比較
+比較逐檔計算（tests/financial_reference.py 的 process_financial_data、process_eps_data）與整批面板計算
+（process_financial_table、process_eps_table）
+
+使用方式: python benchmarks/bench_metrics_engine.py [股票數量 ...]（預設 100 1000 2000）
+"""
+import os
+import sys
+import time
+
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, 'tests'))
+
+from bench_financial_lookup import make_financial_data
+from financial_reference import process_eps_data, process_financial_data
+from modules.financial import process_eps_table, process_financial_table
+from modules.utils import ensure_column_exists
+
+
+def per_stock_workload(df_financial, df_eps, frames):
+    """逐檔計算並合併回主表（舊版流程）"""
+    for idx in df_financial.index:
+        for df, process in ((df_financial, process_financial_data), (df_eps, process_eps_data)):
+            row = pd.DataFrame(index=[idx])
+            process(row, idx, frames[idx])
+            for column in row.columns:
+                ensure_column_exists(df, column)
+                df.at[idx, column] = row.at[idx, column]
+
+
+def table_workload(df_financial, df_eps, frames):
+    """整批面板計算"""
+    process_financial_table(df_financial, frames)
+    process_eps_table(df_eps, frames)
+
+
+def run(stock_count):
+    """執行比較並輸出結果"""
+    frames = {idx: make_financial_data(idx, years=3) for idx in range(stock_count)}
+    
+    results = {}
+    for name, workload in (('per_stock', per_stock_workload), ('table', table_workload)):
+        df_financial = pd.DataFrame({'代號': range(stock_count)})
+        df_eps = df_financial.copy()
+        start = time.perf_counter()
+        workload(df_financial, df_eps, frames)
+        results[name] = time.perf_counter() - start
+    
+    print(f"股票數: {stock_count}（每檔 {len(frames[0])} 筆）")
+    print(f"  逐檔計算: {results['per_stock']:.3f} 秒")
+    print(f"  整批面板: {results['table']:.3f} 秒")
+    print(f"  加速倍數: {results['per_stock'] / results['table']:.1f}x")
+    return results
+
+
+if __name__ == '__main__':
+    for count in [int(arg) for arg in sys.argv[1:]] or [100, 1000, 2000]:
+        run(count)
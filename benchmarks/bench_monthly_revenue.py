@@ -0,0 +1,92 @@
+"""
+月營收年度表效能比較
+比較舊版逐月逐年篩選與新版期間索引位移（get_monthly_revenue_by_years）建立「月份 × 年度 + MoM/YoY」表的耗時
+
+使用方式: python benchmarks/bench_monthly_revenue.py [年數 ...]（預設 3 5 10 15）
+"""
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import modules.revenue
+import stock_analysis
+from fake_finmind import FIRST_STOCK_ID, make_revenue_rows
+
+REPEAT = 20
+
+
+def make_revenue_data(seed, years):
+    """以假 FinMind 後端產生一檔股票的月營收數據（涵蓋查詢年數再往前一年）"""
+    now = datetime.now()
+    return pd.DataFrame(make_revenue_rows(str(FIRST_STOCK_ID + seed), datetime(now.year - years, 1, 1), now))
+
+
+def legacy_monthly_revenue(revenue_data, years):
+    """舊版：每個月份、年度各做一次布林篩選"""
+    current_year = datetime.now().year
+    start_year = current_year - years + 1
+    
+    def get_revenue(year, month):
+        data = revenue_data[
+            (revenue_data['revenue_year'] == year) &
+            (revenue_data['revenue_month'] == month)
+        ]
+        if not data.empty:
+            return data.iloc[0]['revenue']
+        return None
+    
+    result_rows = []
+    for month in range(12, 0, -1):
+        row = {'月份': f'{month}月'}
+        for year in range(current_year, start_year - 1, -1):
+            revenue = get_revenue(year, month)
+            row[f'{year}年'] = round(revenue / 1000000) if revenue is not None else None
+        
+        current_revenue = get_revenue(current_year, month)
+        prev_revenue = get_revenue(current_year if month > 1 else current_year - 1, month - 1 if month > 1 else 12)
+        last_year_revenue = get_revenue(current_year - 1, month)
+        row['MoM(%)'] = round((current_revenue - prev_revenue) / prev_revenue * 100, 2) if current_revenue and prev_revenue else None
+        row['YoY(%)'] = round((current_revenue - last_year_revenue) / last_year_revenue * 100, 2) if current_revenue and last_year_revenue else None
+        result_rows.append(row)
+    
+    columns = ['月份'] + [f'{y}年' for y in range(current_year, start_year - 1, -1)] + ['MoM(%)', 'YoY(%)']
+    return pd.DataFrame(result_rows, columns=columns)
+
+
+def pivot_monthly_revenue(revenue_data, years):
+    """新版：以 get_monthly_revenue_by_years 計算（快取讀取改為直接回傳預先產生的數據）"""
+    modules.revenue.get_stock_revenue_data = lambda *args, **kwargs: revenue_data
+    return stock_analysis.get_monthly_revenue_by_years(None, '2330', years=years)
+
+
+def run(years):
+    """執行比較並輸出結果"""
+    revenue_data = make_revenue_data(years, years)
+    
+    results = {}
+    outputs = {}
+    for name, workload in (('legacy', legacy_monthly_revenue), ('pivot', pivot_monthly_revenue)):
+        start = time.perf_counter()
+        for _ in range(REPEAT):
+            outputs[name] = workload(revenue_data, years)
+        results[name] = (time.perf_counter() - start) / REPEAT
+    
+    assert outputs['legacy'].equals(outputs['pivot']), "新舊版本結果不一致"
+    
+    print(f"年數: {years}（{len(revenue_data)} 筆月營收，平均 {REPEAT} 次）")
+    print(f"  舊版逐月篩選: {results['legacy'] * 1000:.2f} 毫秒")
+    print(f"  期間索引位移: {results['pivot'] * 1000:.2f} 毫秒")
+    print(f"  加速倍數: {results['legacy'] / results['pivot']:.1f}x")
+    return results
+
+
+if __name__ == '__main__':
+    logging.disable(logging.INFO)
+    for count in [int(arg) for arg in sys.argv[1:]] or [3, 5, 10, 15]:
+        run(count)
@@ -0,0 +1,140 @@
+"""
+啟動時間測試
+  - 以 python -X importtime 統計各進入點載入時匯入的模組與耗時，列出最耗時的模組，
+    另外統計延遲到開始處理時才載入的部分（pandas、數據處理模組、FinMind）
+  - 測量程式啟動到第一個輸出、到結束的時間：冷啟動為第一次執行（Python 原始碼以空的 bytecode 快取執行），
+    熱啟動為之後數次執行的中位數；另以「立即載入」模擬在模組開頭就匯入 pandas 等模組的舊版行為作為對照
+  - 可指定打包後的 exe（onedir 或 onefile）一起測量
+以不存在的輸入檔執行 stock_processor：錯誤訊息與正常執行的開始訊息在同一時間點輸出，不需連線即可測量；
+stock_analysis 的第一個輸出為輸入股票代號的提示
+
+使用方式: python benchmarks/bench_startup.py [選項]
+選項:
+  --runs N     熱啟動次數（預設 5）
+  --top N      列出最耗時的模組數（預設 10）
+  --exe 路徑   一併測量打包後的 stock_processor 執行檔（可指定多次，例如 onedir 與 onefile 各一個）
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+MISSING_INPUT = os.path.join(tempfile.gettempdir(), 'bench_startup_missing.xlsx')
+
+# importtime 統計的項目：名稱與匯入的程式碼
+IMPORT_CASES = [
+    ('stock_processor', 'import stock_processor'),
+    ('stock_analysis', 'import stock_analysis'),
+    ('開始處理時載入', 'import stock_processor; import pandas, modules.revenue, modules.financial, modules.bulk, '
+                       'modules.checkpoint, modules.price, modules.excel_writer, FinMind.data'),
+]
+
+# 舊版行為：進入點執行前就匯入 pandas 與數據處理模組
+EAGER_IMPORTS = 'import pandas, modules.revenue, modules.financial, modules.excel_writer'
+
+
+def parse_importtime(stderr):
+    """解析 -X importtime 的輸出，回傳 [(模組名稱, 深度, 自身微秒, 累計微秒)]"""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return modules
+
+
+def run_importtime(code):
+    """以 -X importtime 執行 code，回傳解析後的模組清單"""
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=REPO_DIR, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+    return parse_importtime(completed.stderr)
+
+
+def report_imports(top):
+    """輸出各進入點的匯入耗時與最耗時的模組"""
+    # Python 啟動時本來就會載入的模組（site、encodings 等）不計入
+    startup = {name for name, *_ in run_importtime('pass')}
+    
+    for title, code in IMPORT_CASES:
+        try:
+            modules = [module for module in run_importtime(code) if module[0] not in startup]
+        except RuntimeError as e:
+            print(f"\n{title}: 無法執行（{e}）")
+            continue
+        
+        top_level = [module for module in modules if module[1] == 0]
+        total = sum(cumulative for _, _, _, cumulative in top_level)
+        names = {name for name, *_ in modules}
+        heavy = [name for name in ('pandas', 'numpy', 'openpyxl', 'FinMind') if name in names]
+        print(f"\n{title}: 共 {len(modules)} 個模組，{total / 1000:.0f} 毫秒（載入 {', '.join(heavy) or '無大型套件'}）")
+        
+        # 依累計時間列出最頂層與下一層的模組（例如 stock_processor 直接匯入的模組）
+        listed = [module for module in modules if module[1] <= 1]
+        for name, depth, self_us, cumulative in sorted(listed, key=lambda module: module[3], reverse=True)[:top]:
+            print(f"  {'  ' * depth}{name:<{40 - 2 * depth}}{cumulative / 1000:>8.1f} 毫秒（自身 {self_us / 1000:.1f}）")
+
+
+def measure_launch(command, env):
+    """啟動程式，回傳 (到第一個輸出的秒數, 到結束的秒數)"""
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=REPO_DIR, env=env, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, bufsize=0)
+    os.read(process.stdout.fileno(), 1)
+    first_output = time.perf_counter() - start
+    process.stdout.read()
+    process.wait()
+    return first_output, time.perf_counter() - start
+
+
+def measure_cold_warm(command, runs):
+    """測量冷啟動（第一次）與熱啟動（之後 runs 次的中位數）"""
+    with tempfile.TemporaryDirectory(prefix='bench_startup_') as pycache:
+        # 原始碼執行時 bytecode 快取指向空的暫存目錄，第一次執行需重新編譯所有模組，之後的執行直接使用
+        env = dict(os.environ, PYTHONUNBUFFERED='1', PYTHONPYCACHEPREFIX=pycache)
+        env.pop('PYTHONDONTWRITEBYTECODE', None)
+        cold = measure_launch(command, env)
+        warm = [measure_launch(command, env) for _ in range(runs)]
+    return cold, tuple(statistics.median(values) for values in zip(*warm))
+
+
+def report_launches(runs, exe_paths):
+    """輸出各啟動方式的冷熱啟動時間"""
+    processor = os.path.join(REPO_DIR, 'stock_processor.py')
+    launches = [
+        ('stock_processor（延遲載入）', [sys.executable, processor, MISSING_INPUT]),
+        ('stock_processor（立即載入）', [sys.executable, '-c', f"import runpy, sys; {EAGER_IMPORTS}; "
+                                         f"sys.argv = {[processor, MISSING_INPUT]!r}; runpy.run_path({processor!r}, run_name='__main__')"]),
+        ('stock_analysis（延遲載入）', [sys.executable, os.path.join(REPO_DIR, 'stock_analysis.py')]),
+    ]
+    for path in exe_paths:
+        # onedir 打包的 exe 旁邊有 _internal 資料夾
+        mode = 'onedir' if os.path.isdir(os.path.join(os.path.dirname(os.path.abspath(path)), '_internal')) else 'onefile'
+        launches.append((f"{mode} exe {path}", [path, MISSING_INPUT]))
+    
+    print(f"\n啟動時間（秒，熱啟動為 {runs} 次中位數）:")
+    print("   冷:首個輸出   冷:結束  熱:首個輸出   熱:結束")
+    for title, command in launches:
+        (cold_first, cold_exit), (warm_first, warm_exit) = measure_cold_warm(command, runs)
+        print(f"  {cold_first:>10.3f}{cold_exit:>10.3f}{warm_first:>10.3f}{warm_exit:>10.3f}  {title}")
+
+
+def get_option_values(args, option):
+    """取得命令列選項後面的所有值（選項可重複指定）"""
+    return [args[index + 1] for index, arg in enumerate(args[:-1]) if arg == option]
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    runs = int((get_option_values(args, '--runs') or [5])[-1])
+    top = int((get_option_values(args, '--top') or [10])[-1])
+    
+    print(f"Python {sys.version.split()[0]}")
+    report_imports(top)
+    report_launches(runs, get_option_values(args, '--exe'))
@@ -0,0 +1,229 @@
+"""
+效能測試用的本機假 FinMind 後端
+依股票代號與期間產生固定（可重現）的月營收、財務報表與日線數據，欄位與 FinMind DataLoader 相同，
+可設定每次請求的延遲秒數與錯誤率，不需連線即可測量整個流程的吞吐量
+
+用法：
+    loader = FakeDataLoader(latency=0.05, error_rate=0.02)
+    with install(loader):
+        ...  # 此範圍內 `from FinMind.data import DataLoader` 取得的都是 loader
+"""
+import contextlib
+import random
+import sys
+import threading
+import time
+import types
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+FIRST_STOCK_ID = 1101
+
+# 財務報表科目（與 FinMind 綜合損益表相同的 type 名稱）
+FINANCIAL_TYPES = ['Revenue', 'CostOfGoodsSold', 'GrossProfit', 'OperatingExpenses', 'OperatingIncome',
+                   'TotalNonoperatingIncomeAndExpense', 'PreTaxIncome', 'TAX', 'IncomeFromContinuingOperations',
+                   'IncomeAfterTaxes', 'NetIncome', 'OtherComprehensiveIncome', 'EquityAttributableToOwnersOfParent',
+                   'NoncontrollingInterests', 'EPS']
+QUARTER_ENDS = [(3, 31), (6, 30), (9, 30), (12, 31)]
+
+
+def make_stock_ids(count):
+    """產生連續的股票代號清單（字串）"""
+    return [str(FIRST_STOCK_ID + offset) for offset in range(count)]
+
+
+def _rng(seed, *keys):
+    """依種子與鍵值建立固定的亂數產生器"""
+    return random.Random(':'.join(str(key) for key in (seed,) + keys))
+
+
+def _date_range(start_date, end_date):
+    """將 FinMind 的起訖日期參數轉為 datetime（起始未提供時為 10 年前，結束未提供時為今天）"""
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    start = datetime.strptime(start_date, '%Y-%m-%d') if start_date else today.replace(year=today.year - 10)
+    end = min(datetime.strptime(end_date, '%Y-%m-%d'), today) if end_date else today
+    return start, end
+
+
+def make_revenue_rows(stock_id, start, end, seed=0):
+    """產生一檔股票的月營收資料列：營收於次月 10 日前公布，date 為公布月份的 1 日"""
+    base = _rng(seed, stock_id).uniform(1e8, 5e10)
+    rows = []
+    year, month = start.year - 1, 11
+    while True:
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        published = datetime(year + (month == 12), month % 12 + 1, 1)
+        if published > end:
+            break
+        if published < start or published + timedelta(days=9) > datetime.now():
+            continue
+        rng = _rng(seed, stock_id, year, month)
+        rows.append({
+            'date': published.strftime('%Y-%m-%d'),
+            'stock_id': stock_id,
+            'country': 'Taiwan',
+            'revenue': int(base * (1 + 0.03 * (year - 2000)) * rng.uniform(0.7, 1.3)),
+            'revenue_month': month,
+            'revenue_year': year,
+        })
+    return rows
+
+
+def make_financial_rows(stock_id, start, end, seed=0):
+    """產生一檔股票的財務報表資料列：Q1~Q3 於季底後 45 天、年報於 90 天後公布"""
+    base = _rng(seed, stock_id).uniform(3e8, 1.5e11)
+    shares = _rng(seed, stock_id, 'shares').uniform(1e8, 2.5e10)
+    rows = []
+    for year in range(start.year, end.year + 1):
+        for month, day in QUARTER_ENDS:
+            quarter_end = datetime(year, month, day)
+            if quarter_end < start or quarter_end > end:
+                continue
+            if quarter_end + timedelta(days=90 if month == 12 else 45) > datetime.now():
+                continue
+            
+            rng = _rng(seed, stock_id, year, month)
+            revenue = base * rng.uniform(0.8, 1.2)
+            cost = revenue * rng.uniform(0.5, 0.9)
+            expenses = revenue * rng.uniform(0.03, 0.15)
+            operating = revenue - cost - expenses
+            non_operating = revenue * rng.uniform(-0.02, 0.03)
+            pre_tax = operating + non_operating
+            tax = max(pre_tax, 0) * 0.2
+            after_tax = pre_tax - tax
+            values = {
+                'Revenue': revenue,
+                'CostOfGoodsSold': cost,
+                'GrossProfit': revenue - cost,
+                'OperatingExpenses': expenses,
+                'OperatingIncome': operating,
+                'TotalNonoperatingIncomeAndExpense': non_operating,
+                'PreTaxIncome': pre_tax,
+                'TAX': tax,
+                'IncomeFromContinuingOperations': after_tax,
+                'IncomeAfterTaxes': after_tax,
+                'NetIncome': after_tax,
+                'OtherComprehensiveIncome': revenue * rng.uniform(-0.01, 0.01),
+                'EquityAttributableToOwnersOfParent': after_tax * 0.98,
+                'NoncontrollingInterests': after_tax * 0.02,
+                'EPS': round(after_tax / shares, 2),
+            }
+            date = quarter_end.strftime('%Y-%m-%d')
+            for data_type in FINANCIAL_TYPES:
+                rows.append({'date': date, 'stock_id': stock_id, 'type': data_type, 'value': values[data_type], 'origin_name': data_type})
+    return rows
+
+
+def make_daily_rows(stock_id, start, end, seed=0):
+    """產生一檔股票的日線資料列（只有平日，約 1% 的交易日無成交）"""
+    price = _rng(seed, stock_id).uniform(10, 1000)
+    rows = []
+    date = start
+    while date <= end:
+        if date.weekday() < 5:
+            rng = _rng(seed, stock_id, date.toordinal())
+            if rng.random() >= 0.01:
+                close = round(price * rng.uniform(0.9, 1.1), 2)
+                volume = rng.randint(1000, 10 ** 7)
+                rows.append({
+                    'date': date.strftime('%Y-%m-%d'),
+                    'stock_id': stock_id,
+                    'Trading_Volume': volume,
+                    'Trading_money': int(volume * close),
+                    'open': round(close * rng.uniform(0.98, 1.02), 2),
+                    'max': round(close * 1.03, 2),
+                    'min': round(close * 0.97, 2),
+                    'close': close,
+                    'spread': round(close * rng.uniform(-0.05, 0.05), 2),
+                    'Trading_turnover': rng.randint(10, 10 ** 4),
+                })
+        date += timedelta(days=1)
+    return rows
+
+
+class FakeDataLoader:
+    """介面與 FinMind DataLoader 相同的假後端
+    
+    stock_count 為市場上的股票數（未指定 stock_id 的全市場查詢會回傳全部）；latency 為每次請求的延遲秒數；
+    error_rate 為請求失敗（拋出暫時性錯誤）的機率，錯誤順序由 seed 決定
+    """
+    
+    def __init__(self, stock_count=2000, latency=0.0, error_rate=0.0, seed=0):
+        self.stock_ids = make_stock_ids(stock_count)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.seed = seed
+        self._errors = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = {}
+        self.errors = 0
+    
+    def __call__(self):
+        # 讓 FinMind.data.DataLoader() 取得同一個實例，呼叫統計才會累計在一起
+        return self
+    
+    def login_by_token(self, api_token=None):
+        pass
+    
+    def _request(self, name):
+        """模擬一次 API 請求：記錄次數、等待延遲，依錯誤率拋出例外"""
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+            failed = self._errors.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if failed:
+            raise ConnectionError(f"{name}: 503 Service Unavailable (fake)")
+    
+    def _frame(self, make_rows, stock_id, start_date, end_date):
+        start, end = _date_range(start_date, end_date)
+        stock_ids = [str(stock_id)] if stock_id else self.stock_ids
+        rows = []
+        for sid in stock_ids:
+            rows.extend(make_rows(sid, start, end, self.seed))
+        return pd.DataFrame(rows)
+    
+    def taiwan_stock_info(self):
+        self._request('taiwan_stock_info')
+        return pd.DataFrame({
+            'industry_category': '測試',
+            'stock_id': self.stock_ids,
+            'stock_name': [f'測試{stock_id}' for stock_id in self.stock_ids],
+            'type': 'twse',
+            'date': datetime.now().strftime('%Y-%m-%d'),
+        })
+    
+    def taiwan_stock_month_revenue(self, stock_id='', start_date='', end_date=''):
+        self._request('taiwan_stock_month_revenue')
+        return self._frame(make_revenue_rows, stock_id, start_date, end_date)
+    
+    def taiwan_stock_financial_statement(self, stock_id='', start_date='', end_date=''):
+        self._request('taiwan_stock_financial_statement')
+        return self._frame(make_financial_rows, stock_id, start_date, end_date)
+    
+    def taiwan_stock_daily(self, stock_id='', start_date='', end_date=''):
+        self._request('taiwan_stock_daily')
+        return self._frame(make_daily_rows, stock_id, start_date, end_date)
+
+
+@contextlib.contextmanager
+def install(loader):
+    """暫時以假後端取代 FinMind.data.DataLoader（未安裝 FinMind 時也可使用）"""
+    saved = {name: sys.modules.get(name) for name in ('FinMind', 'FinMind.data')}
+    package = types.ModuleType('FinMind')
+    data_module = types.ModuleType('FinMind.data')
+    data_module.DataLoader = loader
+    package.data = data_module
+    sys.modules['FinMind'] = package
+    sys.modules['FinMind.data'] = data_module
+    try:
+        yield loader
+    finally:
+        for name, module in saved.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
@@ -0,0 +1,328 @@
+"""
+整體效能測試
+以假 FinMind 後端（fake_finmind.py）在不同觀察清單大小下測量：
+  - process_stock 完整執行（冷快取與熱快取）
+  - 快取寫入與讀取
+  - 營收 / 綜合損益表 / EPS 指標計算
+  - Excel 輸出（openpyxl / splice / sidecar）
+每個項目在獨立的子程序與暫存目錄中執行，不會讀寫正式的 data/ 與 logs/；結果寫入 JSON，可與其他版本比較
+
+使用方式: python benchmarks/run_benchmarks.py [股票數量 ...] [選項]（預設 50 200 1000）
+選項:
+  --latency 秒       假 API 每次請求的延遲（預設 0）
+  --error-rate 比率  假 API 請求失敗的機率（預設 0）
+  --cases 名稱,...   只執行指定項目（process_stock,cache,metrics,excel）
+  -o 檔名            結果 JSON 路徑（預設 benchmarks/results/benchmark_<時間>.json）
+  --compare 檔名     與先前的結果 JSON 比較耗時
+"""
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+CASES = ['process_stock', 'cache', 'metrics', 'excel']
+DEFAULT_SIZES = [50, 200, 1000]
+
+# 市場股票數（全市場查詢回傳的筆數），須不小於測試的觀察清單大小
+MARKET_SIZE = 2000
+
+
+###########################################################################
+# 子程序：在暫存目錄中執行單一測試項目
+###########################################################################
+
+def setup_workspace(workdir):
+    """將 config 的資料與日誌目錄指向暫存目錄，並解除 API 限速（須在載入其他模組前呼叫）"""
+    import config
+    
+    config.BASE_DIR = workdir
+    config.DATA_DIR = os.path.join(workdir, 'data')
+    config.LOGS_DIR = os.path.join(workdir, 'logs')
+    config.REVENUE_CACHE_DIR = os.path.join(config.DATA_DIR, 'revenue')
+    config.FINANCIAL_CACHE_DIR = os.path.join(config.DATA_DIR, 'financial')
+    config.API_REQUESTS_PER_HOUR = 10 ** 9
+    config.API_BURST = 10 ** 6
+    
+    # 錯誤重試的退避時間縮短為毫秒級，測量重試的次數與開銷而不是實際等待
+    config.API_BACKOFF_BASE_SECONDS = 0.01
+    config.API_BACKOFF_MAX_SECONDS = 0.1
+    config.API_THROTTLE_PAUSE_SECONDS = 0.1
+
+
+def make_input_workbook(path, stock_ids):
+    """建立觀察清單活頁簿（第一個工作表含「代號」欄）"""
+    from openpyxl import Workbook
+    
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.title = '清單'
+    worksheet.append(['代號', '備註'])
+    for stock_id in stock_ids:
+        worksheet.append([int(stock_id), f'備註{stock_id}'])
+    workbook.save(path)
+
+
+def make_frames(loader, stock_ids):
+    """以假後端產生各股票的營收（近 6 年）與財務報表（近 3 年）數據"""
+    from fake_finmind import make_financial_rows, make_revenue_rows
+    import pandas as pd
+    
+    now = datetime.now()
+    revenue_start = now.replace(year=now.year - 6, month=1, day=1)
+    financial_start = now.replace(year=now.year - 3, month=1, day=1)
+    revenue_frames = {}
+    financial_frames = {}
+    for idx, stock_id in enumerate(stock_ids):
+        revenue_frames[idx] = pd.DataFrame(make_revenue_rows(stock_id, revenue_start, now, loader.seed))
+        financial_frames[idx] = pd.DataFrame(make_financial_rows(stock_id, financial_start, now, loader.seed))
+    return revenue_frames, financial_frames
+
+
+def directory_size(path):
+    """計算目錄內所有檔案的總位元組數"""
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+def bench_process_stock(workdir, stock_ids, loader):
+    """完整執行 process_stock 兩次：第一次快取為空（全部呼叫 API），第二次全部使用快取"""
+    from stock_processor import process_stock
+    
+    input_file = os.path.join(workdir, 'target.xlsx')
+    make_input_workbook(input_file, stock_ids)
+    
+    results = {}
+    for name in ('cold', 'warm'):
+        calls_before = sum(loader.calls.values())
+        errors_before = loader.errors
+        start = time.perf_counter()
+        process_stock(input_file=input_file)
+        results[f'{name}_seconds'] = time.perf_counter() - start
+        results[f'{name}_api_calls'] = sum(loader.calls.values()) - calls_before
+        results[f'{name}_api_errors'] = loader.errors - errors_before
+    results['cache_bytes'] = directory_size(os.path.join(workdir, 'data'))
+    return results
+
+
+def bench_cache(workdir, stock_ids, loader):
+    """逐檔寫入與讀取營收、財務報表快取"""
+    from modules.cache import load_cache, save_cache
+    from modules.manifest import save_manifest
+    
+    revenue_frames, financial_frames = make_frames(loader, stock_ids)
+    
+    start = time.perf_counter()
+    for idx, stock_id in enumerate(stock_ids):
+        save_cache(stock_id, 'revenue', revenue_frames[idx])
+        save_cache(stock_id, 'financial', financial_frames[idx])
+    save_manifest()
+    save_seconds = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    rows = 0
+    for stock_id in stock_ids:
+        rows += len(load_cache(stock_id, 'revenue')) + len(load_cache(stock_id, 'financial'))
+    load_seconds = time.perf_counter() - start
+    
+    return {
+        'save_seconds': save_seconds,
+        'load_seconds': load_seconds,
+        'rows': rows,
+        'cache_bytes': directory_size(os.path.join(workdir, 'data')),
+    }
+
+
+def build_tables(loader, stock_ids):
+    """計算營收、綜合損益表、EPS 三張表，回傳 ({工作表名稱: DataFrame}, {項目: 耗時})"""
+    import pandas as pd
+    from modules.financial import process_eps_table, process_financial_table
+    from modules.revenue import get_previous_three_months, process_revenue_table
+    
+    revenue_frames, financial_frames = make_frames(loader, stock_ids)
+    (last_month_year, last_month), (previous_month_year, previous_month), (previous_month_year2, previous_month2) = get_previous_three_months()
+    
+    tables = {name: pd.DataFrame({'代號': [int(stock_id) for stock_id in stock_ids]}) for name in ('月營收', '綜合損益表', 'EPS')}
+    timings = {}
+    
+    start = time.perf_counter()
+    process_revenue_table(tables['月營收'], revenue_frames, last_month_year, last_month, previous_month_year, previous_month, previous_month_year2, previous_month2, last_month_year - 1)
+    timings['revenue_seconds'] = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    process_financial_table(tables['綜合損益表'], financial_frames)
+    timings['financial_seconds'] = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    process_eps_table(tables['EPS'], financial_frames)
+    timings['eps_seconds'] = time.perf_counter() - start
+    
+    return tables, timings
+
+
+def bench_metrics(workdir, stock_ids, loader):
+    """整批計算三張表的指標"""
+    _, timings = build_tables(loader, stock_ids)
+    return timings
+
+
+def bench_excel(workdir, stock_ids, loader):
+    """以三種輸出模式將三張表寫入觀察清單活頁簿的複本"""
+    from modules.excel_writer import write_output
+    
+    tables, _ = build_tables(loader, stock_ids)
+    input_file = os.path.join(workdir, 'target.xlsx')
+    make_input_workbook(input_file, stock_ids)
+    
+    results = {}
+    for mode in ('openpyxl', 'splice', 'sidecar'):
+        output_file = os.path.join(workdir, f'{mode}.xlsx')
+        shutil.copyfile(input_file, output_file)
+        start = time.perf_counter()
+        output_file = write_output(output_file, tables, mode=mode)
+        results[f'{mode}_seconds'] = time.perf_counter() - start
+        results[f'{mode}_bytes'] = os.path.getsize(output_file)
+    return results
+
+
+BENCHMARKS = {
+    'process_stock': bench_process_stock,
+    'cache': bench_cache,
+    'metrics': bench_metrics,
+    'excel': bench_excel,
+}
+
+
+def run_case(case, size, workdir, result_file, latency, error_rate):
+    """子程序進入點：執行單一項目並將結果寫入 result_file"""
+    setup_workspace(workdir)
+    
+    import logging
+    from fake_finmind import FakeDataLoader, install, make_stock_ids
+    from modules.logger import setup_logging
+    
+    # 日誌仍寫入暫存目錄的檔案（計入開銷），只移除 console 輸出
+    setup_logging()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if not isinstance(handler, logging.FileHandler):
+            root.removeHandler(handler)
+    
+    loader = FakeDataLoader(stock_count=max(MARKET_SIZE, size), latency=latency, error_rate=error_rate)
+    with install(loader):
+        result = BENCHMARKS[case](workdir, make_stock_ids(size), loader)
+    
+    with open(result_file, 'w', encoding='utf-8') as f:
+        json.dump(result, f)
+
+
+###########################################################################
+# 主程序：依序啟動各項目並彙整結果
+###########################################################################
+
+def get_option_value(args, option, default=None):
+    """取得命令列選項後面的值"""
+    if option in args:
+        index = args.index(option)
+        if index + 1 < len(args):
+            return args[index + 1]
+    return default
+
+
+def get_version():
+    """取得目前的 git commit（無法取得時回傳 None）"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_in_subprocess(case, size, latency, error_rate):
+    """在新的子程序與暫存目錄中執行單一項目，回傳結果 dict"""
+    workdir = tempfile.mkdtemp(prefix=f'bench_{case}_')
+    result_file = os.path.join(workdir, 'result.json')
+    try:
+        command = [sys.executable, os.path.abspath(__file__), '--run-case', case, str(size), workdir, result_file, str(latency), str(error_rate)]
+        completed = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        if completed.returncode != 0 or not os.path.exists(result_file):
+            return {'error': completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else f'exit {completed.returncode}'}
+        with open(result_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare_results(previous_file, results):
+    """與先前的結果比較各項目的耗時（比值 > 1 表示變慢）"""
+    with open(previous_file, 'r', encoding='utf-8') as f:
+        previous = json.load(f)
+    previous_results = {(item['case'], item['stocks']): item for item in previous['results']}
+    
+    print(f"\n與 {previous_file}（{previous.get('version')}）比較:")
+    for item in results:
+        old = previous_results.get((item['case'], item['stocks']))
+        if not old:
+            continue
+        for key, value in item.items():
+            if key.endswith('_seconds') and old.get(key):
+                print(f"  {item['case']:<14}{item['stocks']:>6} 檔  {key:<20}{old[key]:>9.3f} → {value:>9.3f} 秒  ({value / old[key]:.2f}x)")
+
+
+def main():
+    args = sys.argv[1:]
+    if args and args[0] == '--run-case':
+        case, size, workdir, result_file, latency, error_rate = args[1:7]
+        run_case(case, int(size), workdir, result_file, float(latency), float(error_rate))
+        return 0
+    
+    option_values = {get_option_value(args, option) for option in ('--latency', '--error-rate', '--cases', '-o', '--compare')}
+    sizes = [int(arg) for arg in args if arg.isdigit() and arg not in option_values] or DEFAULT_SIZES
+    latency = float(get_option_value(args, '--latency', 0))
+    error_rate = float(get_option_value(args, '--error-rate', 0))
+    cases = get_option_value(args, '--cases', ','.join(CASES)).split(',')
+    output_file = get_option_value(args, '-o') or os.path.join(BENCH_DIR, 'results', f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json")
+    
+    import pandas as pd
+    
+    results = []
+    for case in cases:
+        for size in sizes:
+            print(f"執行 {case}（{size} 檔）...", flush=True)
+            result = run_in_subprocess(case, size, latency, error_rate)
+            results.append({'case': case, 'stocks': size, **result})
+            summary = ', '.join(f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}" for key, value in result.items())
+            print(f"  {summary}")
+    
+    report = {
+        'version': get_version(),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'settings': {'sizes': sizes, 'latency': latency, 'error_rate': error_rate, 'market_size': MARKET_SIZE},
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n結果已寫入: {output_file}")
+    
+    previous_file = get_option_value(args, '--compare')
+    if previous_file:
+        compare_results(previous_file, results)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,10 @@
 # 一鍵打包腳本
 # 執行此腳本自動完成打包流程
+#   .\build_exe.ps1            onedir 模式（預設）：exe 與 _internal 資料夾，啟動時不需解壓
+#   .\build_exe.ps1 -OneFile   單一 exe：方便傳送，但每次啟動都要先解壓，需多等數秒
+param(
+    [switch]$OneFile
+)
 
 Write-Host "================================================" -ForegroundColor Cyan
 Write-Host "股票數據處理系統 - 自動打包工具" -ForegroundColor Cyan
@@ -34,8 +39,9 @@ if (Test-Path "build") {
 }
 Write-Host ""
 
-# 執行打包
-Write-Host "[3/4] 開始打包..." -ForegroundColor Yellow
+# 執行打包（stock_processor.spec 依 STOCK_BUILD_MODE 決定打包模式）
+$env:STOCK_BUILD_MODE = if ($OneFile) { "onefile" } else { "onedir" }
+Write-Host "[3/4] 開始打包（$env:STOCK_BUILD_MODE 模式）..." -ForegroundColor Yellow
 Write-Host "這可能需要幾分鐘，請耐心等候..." -ForegroundColor Yellow
 pyinstaller stock_processor.spec
 
@@ -57,8 +63,12 @@ if (Test-Path $releaseFolder) {
 }
 New-Item -ItemType Directory -Path $releaseFolder | Out-Null
 
-# 複製必要檔案
-Copy-Item "dist\股票數據處理器.exe" "$releaseFolder\" -ErrorAction SilentlyContinue
+# 複製必要檔案（onedir 模式的 exe 須與 _internal 資料夾放在一起）
+if ($OneFile) {
+    Copy-Item "dist\股票數據處理器.exe" "$releaseFolder\" -ErrorAction SilentlyContinue
+} else {
+    Copy-Item -Recurse "dist\股票數據處理器\*" "$releaseFolder\" -ErrorAction SilentlyContinue
+}
 Copy-Item "執行股票處理.bat" "$releaseFolder\" -ErrorAction SilentlyContinue
 Copy-Item "打包與部署指南.md" "$releaseFolder\使用說明.md" -ErrorAction SilentlyContinue
 Copy-Item "Excel_VBA_代碼.vba" "$releaseFolder\" -ErrorAction SilentlyContinue
@@ -79,6 +89,9 @@ Write-Host "發布檔案位置：$releaseFolder\" -ForegroundColor Cyan
 Write-Host ""
 Write-Host "包含檔案：" -ForegroundColor White
 Write-Host "  - 股票數據處理器.exe" -ForegroundColor White
+if (-not $OneFile) {
+    Write-Host "  - _internal\（函式庫，須與 exe 放在一起）" -ForegroundColor White
+}
 Write-Host "  - 執行股票處理.bat" -ForegroundColor White
 Write-Host "  - Excel_VBA_代碼.vba" -ForegroundColor White
 Write-Host "  - 使用說明.md" -ForegroundColor White
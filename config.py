@@ -26,6 +26,43 @@ LOGS_DIR = os.path.join(BASE_DIR, 'logs')
 REVENUE_CACHE_DIR = os.path.join(DATA_DIR, 'revenue')
 FINANCIAL_CACHE_DIR = os.path.join(DATA_DIR, 'financial')
 
+# 快取儲存方式：
+#   'sqlite' - 每種數據類型一個 SQLite 檔案（data/<type>.sqlite），以股票代號建立索引
+#   'json'   - 每檔股票一個 JSON 檔案（data/<type>/<id>.json，舊版格式）
+# 舊版 JSON 快取可用 `python migrate_cache.py` 一次轉換
+CACHE_BACKEND = 'sqlite'
+
+# 快取過期時只向 API 抓取最新快取期間之後的數據，合併回既有快取（保留較舊的歷史）
+INCREMENTAL_FETCH = True
+
+# 最新一期尚未公布時，同一檔股票在幾小時內不重複向 API 查詢
+# （例如上季財報遲交的公司，不會每次執行都重新抓取）
+CACHE_RETRY_HOURS = {
+    'revenue': 6,
+    'financial': 12,
+    'stock_info': 6,
+}
+
+# 依公布時程規劃 API 查詢：最新一期已過法定公布期限、且期限後已查詢過仍沒有數據時，
+# 下次公布期間開始前不再查詢（False 則只依 CACHE_RETRY_HOURS 限制重複查詢）
+REFRESH_PLANNER = True
+
+# 月營收公布期限：每月幾日前公布上個月營收
+REVENUE_DEADLINE_DAY = 10
+
+# 財報公布期限：季末月份 -> (月, 日)，第一季 5/15、第二季 8/14、第三季 11/14、年度財報隔年 3/31
+FINANCIAL_DEADLINES = {3: (5, 15), 6: (8, 14), 9: (11, 14), 12: (3, 31)}
+
+# 公布期限後等待 FinMind 更新數據的天數（期限後這幾天內仍視為公布期間）
+PUBLICATION_GRACE_DAYS = 2
+
+# 已過公布期限仍沒有最新一期（遲交、暫停公開發行等）的股票，每隔幾天再查詢一次（0 為不再查詢）
+LATE_FILING_RETRY_DAYS = 7
+
+# 股票名稱對照表（data/stock_info.json）超過幾天未更新時，於背景重新抓取
+# 遇到對照表中沒有的股票代號（例如新上市）時也會重新抓取，但在 CACHE_RETRY_HOURS['stock_info'] 小時內不重複
+STOCK_INFO_REFRESH_DAYS = 7
+
 ###########################################################################
 # API 設定
 ###########################################################################
@@ -33,6 +70,69 @@ FINANCIAL_CACHE_DIR = os.path.join(DATA_DIR, 'financial')
 # FinMind API Token（如需要可在此設定）
 API_TOKEN = ""
 
+# API 限速（FinMind 未登入約 300 次/小時，使用 Token 約 600 次/小時），依是否設定 API_TOKEN 決定
+API_REQUESTS_PER_HOUR = 600 if API_TOKEN else 300
+
+# 限速器允許的瞬間連續請求數
+API_BURST = 10
+
+# 遇到限流或暫時性錯誤時的重試次數與指數退避秒數（實際等待時間會加上隨機抖動）
+API_MAX_RETRIES = 4
+API_BACKOFF_BASE_SECONDS = 2
+API_BACKOFF_MAX_SECONDS = 120
+
+# 觸發 API 用量上限時，所有執行緒暫停的秒數
+API_THROTTLE_PAUSE_SECONDS = 60
+
+# 收盤價先以全市場單日數據一次取得（需 FinMind 付費方案），預設只在有設定 API_TOKEN 時使用；
+# 未使用或方案不支援時逐檔抓取日線（每檔一次 API 呼叫）
+MARKET_WIDE_CLOSES = bool(API_TOKEN)
+
+###########################################################################
+# 併發設定
+###########################################################################
+
+# 同時抓取股票數據的最大執行緒數量（設為 1 即為逐檔循序處理）
+MAX_WORKERS = 8
+
+# stock_analysis.py 批次模式同時分析的程序數（各程序平分 API_REQUESTS_PER_HOUR 額度）
+BATCH_WORKERS = 4
+
+###########################################################################
+# 輸出設定
+###########################################################################
+
+# Excel 輸出模式
+#   openpyxl: 載入整個活頁簿後覆寫月營收、綜合損益表、EPS 三個工作表（保留這些工作表中的其他儲存格；
+#             需載入整個活頁簿並逐格寫入，活頁簿較大時請改用 splice）
+#   splice:   直接替換 xlsx 壓縮檔中這三個工作表的內容，其他工作表不載入、原樣複製（適合大型活頁簿）
+#   sidecar:  不修改原活頁簿，將三個工作表輸出到另一個檔案（檔名加上 SIDECAR_SUFFIX）
+OUTPUT_MODE = 'openpyxl'
+
+# sidecar 模式輸出檔案的檔名後綴（target.xlsx -> target_數據.xlsx）
+SIDECAR_SUFFIX = '_數據'
+
+# 工作表內容與上次輸出相同時略過寫入（各工作表的內容指紋記錄於 data/output_fingerprint.json），
+# 三個工作表都沒有變動時不開啟、不儲存活頁簿；執行時加上 --force 則一律重寫
+SKIP_UNCHANGED_SHEETS = True
+
+###########################################################################
+# 常駐服務設定
+###########################################################################
+
+# stock_processor.py --serve 常駐服務監聽的位址與埠號（只接受本機連線）
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = 52380
+
+# 常駐服務閒置超過幾分鐘自動結束（0 表示不自動結束）
+SERVER_IDLE_MINUTES = 240
+
+# 用戶端（stock_client.py）自動啟動常駐服務後，等待服務就緒的最長秒數
+SERVER_START_TIMEOUT_SECONDS = 120
+
+# 常駐服務的存取權杖檔（第一次使用時自動產生）：請求必須附上相同的權杖，其他本機程式無法任意指定讀寫的檔案
+SERVER_TOKEN_PATH = os.path.join(DATA_DIR, 'server_token')
+
 ###########################################################################
 # 日誌設定
 ###########################################################################
@@ -43,3 +143,8 @@ LOG_RETENTION_DAYS = 7
 # 日誌檔案名稱格式
 LOG_FILENAME_FORMAT = 'stock_processor_%Y%m%d.log'
 
+# 執行摘要（各階段耗時、API 延遲、快取命中等，每次執行附加一行 JSON）檔案名稱格式
+RUN_SUMMARY_FILENAME_FORMAT = 'run_summary_%Y%m%d.jsonl'
+
+# --profile 輸出的 cProfile 統計檔案名稱格式
+PROFILE_FILENAME_FORMAT = 'profile_%Y%m%d_%H%M%S.prof'
@@ -0,0 +1,36 @@
+"""
+快取格式轉換工具
+將 data/ 目錄下的舊版 JSON 快取一次轉換為 SQLite（或反向轉換）
+"""
+import logging
+import sys
+
+from modules.cache import CACHE_BACKENDS, migrate_cache
+from modules.logger import setup_logging
+
+
+def main():
+    """主程式進入點"""
+    args = sys.argv[1:]
+    source = 'json'
+    target = 'sqlite'
+    
+    if '--from' in args:
+        source = args[args.index('--from') + 1]
+    if '--to' in args:
+        target = args[args.index('--to') + 1]
+    
+    if source not in CACHE_BACKENDS or target not in CACHE_BACKENDS or source == target:
+        print("使用方式: python migrate_cache.py [--from json] [--to sqlite]")
+        print(f"可用的快取格式: {', '.join(CACHE_BACKENDS)}")
+        return 1
+    
+    setup_logging()
+    logging.info(f"開始轉換快取: {source} → {target}")
+    migrated = migrate_cache(source, target)
+    logging.info(f"轉換完成，共 {sum(migrated.values())} 筆股票快取")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+全市場批次下載模組
+一次抓取整個期間所有股票的月營收與季報，拆分寫入各股票快取
+"""
+import logging
+from datetime import datetime
+
+from modules.cache import load_cache, merge_incremental, save_cache
+from modules.financial import get_last_season_month, get_previous_season_month, get_season_date
+from modules.manifest import get_entry, mark_fetched
+from modules.planner import plan_fetch
+from modules.revenue import get_previous_three_months
+
+
+def _bulk_update(data_type, bulk_data, stock_ids, previous_period):
+    """將批次數據拆分到各股票快取，回傳 (已由批次更新, 需逐檔抓取) 的股票代號"""
+    served = []
+    fallback = []
+    groups = {str(stock_id): group for stock_id, group in bulk_data.groupby('stock_id')}
+    
+    for stock_id in stock_ids:
+        entry = get_entry(stock_id, data_type)
+        # 快取必須剛好停在上一期，補上最新一期後才是完整數據；否則改為逐檔抓取
+        if not entry or entry['latest'] != previous_period:
+            fallback.append(stock_id)
+            continue
+        
+        group = groups.get(str(stock_id))
+        if group is None:
+            # 批次結果中沒有這檔股票：代表尚未公布，記錄查詢時間即可
+            mark_fetched(stock_id, data_type)
+        else:
+            cached_data = load_cache(stock_id, data_type)
+            if cached_data is None:
+                fallback.append(stock_id)
+                continue
+            save_cache(stock_id, data_type, merge_incremental(cached_data, group.reset_index(drop=True), data_type))
+        served.append(stock_id)
+    
+    return served, fallback
+
+
+def bulk_prefetch_revenue(api, stock_ids):
+    """批次抓取上個月全市場月營收並寫入快取"""
+    stale_ids = [stock_id for stock_id in stock_ids if plan_fetch(stock_id, 'revenue')[0]]
+    if not stale_ids:
+        logging.info("批次下載: 月營收快取皆為最新，略過")
+        return [], []
+    
+    _, (previous_year, previous_month), _ = get_previous_three_months()
+    previous_period = f"{previous_year}-{previous_month:02d}"
+    
+    # 上個月營收於本月公布，FinMind 以公布月份的 1 日作為數據日期
+    start_date = datetime.now().replace(day=1).strftime('%Y-%m-%d')
+    end_date = datetime.now().strftime('%Y-%m-%d')
+    
+    logging.info(f"批次下載: 全市場月營收 {start_date} ~ {end_date}（{len(stale_ids)} 檔待更新）")
+    bulk_data = api.taiwan_stock_month_revenue(start_date=start_date, end_date=end_date)
+    if bulk_data is None or bulk_data.empty:
+        raise ValueError("批次月營收沒有回傳數據")
+    
+    return _bulk_update('revenue', bulk_data, stale_ids, previous_period)
+
+
+def bulk_prefetch_financial(api, stock_ids):
+    """批次抓取上一季全市場財務報表並寫入快取"""
+    stale_ids = [stock_id for stock_id in stock_ids if plan_fetch(stock_id, 'financial')[0]]
+    if not stale_ids:
+        logging.info("批次下載: 財務報表快取皆為最新，略過")
+        return [], []
+    
+    target_year, last_season_month = get_last_season_month()
+    prev_year, prev_month = get_previous_season_month(target_year, last_season_month)
+    target_date = get_season_date(target_year, last_season_month)
+    previous_period = get_season_date(prev_year, prev_month)
+    
+    logging.info(f"批次下載: 全市場財務報表 {target_date}（{len(stale_ids)} 檔待更新）")
+    bulk_data = api.taiwan_stock_financial_statement(start_date=target_date, end_date=target_date)
+    if bulk_data is None or bulk_data.empty:
+        raise ValueError("批次財務報表沒有回傳數據")
+    
+    return _bulk_update('financial', bulk_data, stale_ids, previous_period)
+
+
+def bulk_prefetch(api, stock_ids):
+    """批次模式：先以全市場下載更新快取，失敗或無法涵蓋的股票自動改為逐檔抓取"""
+    for label, prefetch in (('月營收', bulk_prefetch_revenue), ('財務報表', bulk_prefetch_financial)):
+        try:
+            served, fallback = prefetch(api, stock_ids)
+            if served or fallback:
+                logging.info(f"批次下載: {label} 已更新 {len(served)} 檔，{len(fallback)} 檔改為逐檔抓取")
+        except Exception as e:
+            logging.warning(f"批次下載: {label} 失敗，改為逐檔抓取 - {str(e)}")
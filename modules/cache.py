@@ -4,112 +4,407 @@
 import json
 import logging
 import os
+import sqlite3
 from datetime import datetime
 
 import pandas as pd
 
-from config import DATA_DIR
+from config import CACHE_BACKEND, DATA_DIR
+from modules import metrics
+from modules.manifest import get_entry, update_entry
 
 
-def get_cache_path(stock_id, data_type):
-    """取得快取檔案路徑"""
-    cache_dir = os.path.join(DATA_DIR, data_type)
-    os.makedirs(cache_dir, exist_ok=True)
-    return os.path.join(cache_dir, f'{stock_id}.json')
+###########################################################################
+# 快取儲存後端
+###########################################################################
+
+class JsonCacheBackend:
+    """每檔股票一個 JSON 檔案：data/<type>/<id>.json"""
+    
+    name = 'json'
+    
+    def __init__(self, data_dir=DATA_DIR):
+        self.data_dir = data_dir
+    
+    def _path(self, stock_id, data_type):
+        """取得單一股票的 JSON 檔案路徑"""
+        cache_dir = os.path.join(self.data_dir, data_type)
+        os.makedirs(cache_dir, exist_ok=True)
+        return os.path.join(cache_dir, f'{stock_id}.json')
+    
+    def load(self, stock_id, data_type):
+        """載入單一股票數據，不存在時回傳 None"""
+        cache_path = self._path(stock_id, data_type)
+        if not os.path.exists(cache_path):
+            return None
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return pd.DataFrame(data)
+    
+    def save(self, stock_id, data_type, df):
+        """儲存單一股票數據"""
+        df.to_json(self._path(stock_id, data_type), orient='records', force_ascii=False, indent=2)
+    
+    def data_types(self):
+        """列出已快取的數據類型"""
+        if not os.path.isdir(self.data_dir):
+            return []
+        return sorted(
+            name for name in os.listdir(self.data_dir)
+            if os.path.isdir(os.path.join(self.data_dir, name))
+        )
+    
+    def stock_ids(self, data_type):
+        """列出指定數據類型已快取的股票代號"""
+        cache_dir = os.path.join(self.data_dir, data_type)
+        if not os.path.isdir(cache_dir):
+            return []
+        return sorted(name[:-len('.json')] for name in os.listdir(cache_dir) if name.endswith('.json'))
+
+
+def _sqlite_type(dtype):
+    """將 pandas 欄位型別對應到 SQLite 欄位型別"""
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return 'INTEGER'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'REAL'
+    return 'TEXT'
+
+
+class SqliteCacheBackend:
+    """每種數據類型一個 SQLite 檔案：data/<type>.sqlite，所有股票存於同一張以代號索引的表"""
+    
+    name = 'sqlite'
+    
+    def __init__(self, data_dir=DATA_DIR):
+        self.data_dir = data_dir
+    
+    def _path(self, data_type):
+        """取得數據類型對應的 SQLite 檔案路徑"""
+        return os.path.join(self.data_dir, f'{data_type}.sqlite')
+    
+    def _connect(self, data_type):
+        """開啟資料庫連線（每次呼叫各自連線，可於多執行緒使用）"""
+        os.makedirs(self.data_dir, exist_ok=True)
+        conn = sqlite3.connect(self._path(data_type), timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('CREATE TABLE IF NOT EXISTS cache_meta (cache_key TEXT PRIMARY KEY, columns TEXT NOT NULL)')
+        return conn
+    
+    def _table_columns(self, conn):
+        """取得數據表現有欄位"""
+        rows = conn.execute("SELECT name FROM pragma_table_info('cache_data')").fetchall()
+        return [row[0] for row in rows]
+    
+    def load(self, stock_id, data_type):
+        """載入單一股票數據（保留原欄位順序與數值型別），不存在時回傳 None"""
+        if not os.path.exists(self._path(data_type)):
+            return None
+        
+        conn = self._connect(data_type)
+        try:
+            meta = conn.execute(
+                'SELECT columns FROM cache_meta WHERE cache_key = ?', (str(stock_id),)
+            ).fetchone()
+            if meta is None:
+                return None
+            columns = json.loads(meta[0])
+            if not columns:
+                return pd.DataFrame()
+            
+            column_sql = ', '.join(f'"{column}"' for column in columns)
+            return pd.read_sql_query(
+                f'SELECT {column_sql} FROM cache_data WHERE cache_key = ? ORDER BY rowid',
+                conn,
+                params=(str(stock_id),),
+            )
+        finally:
+            conn.close()
+    
+    def save(self, stock_id, data_type, df):
+        """儲存單一股票數據（同一交易內刪除舊資料並寫入新資料）
+        
+        沒有任何欄位的 DataFrame 只記錄 cache_meta（載入時回傳空 DataFrame），不建立或擴充數據表
+        """
+        key = str(stock_id)
+        columns = [str(column) for column in df.columns]
+        
+        # 轉為 Python 原生型別，NaN 轉為 NULL
+        values = df.astype(object).where(df.notna(), None)
+        rows = [(key, *row) for row in values.itertuples(index=False, name=None)]
+        
+        conn = self._connect(data_type)
+        try:
+            with conn:
+                # 先取得寫入鎖，避免多執行緒同時建立數據表
+                conn.execute('BEGIN IMMEDIATE')
+                existing_columns = self._table_columns(conn)
+                if existing_columns:
+                    # API 新增欄位時擴充資料表
+                    for column, dtype in zip(columns, df.dtypes):
+                        if column not in existing_columns:
+                            conn.execute(f'ALTER TABLE cache_data ADD COLUMN "{column}" {_sqlite_type(dtype)}')
+                    conn.execute('DELETE FROM cache_data WHERE cache_key = ?', (key,))
+                elif columns:
+                    column_defs = ', '.join(
+                        f'"{column}" {_sqlite_type(dtype)}' for column, dtype in zip(columns, df.dtypes)
+                    )
+                    conn.execute(f'CREATE TABLE cache_data (cache_key TEXT NOT NULL, {column_defs})')
+                    conn.execute('CREATE INDEX idx_cache_key ON cache_data (cache_key)')
+                
+                if columns:
+                    column_sql = ', '.join(f'"{column}"' for column in ['cache_key'] + columns)
+                    placeholders = ', '.join('?' * (len(columns) + 1))
+                    conn.executemany(f'INSERT INTO cache_data ({column_sql}) VALUES ({placeholders})', rows)
+                conn.execute(
+                    'INSERT OR REPLACE INTO cache_meta (cache_key, columns) VALUES (?, ?)',
+                    (key, json.dumps(columns, ensure_ascii=False)),
+                )
+        finally:
+            conn.close()
+    
+    def data_types(self):
+        """列出已快取的數據類型"""
+        if not os.path.isdir(self.data_dir):
+            return []
+        return sorted(name[:-len('.sqlite')] for name in os.listdir(self.data_dir) if name.endswith('.sqlite'))
+    
+    def stock_ids(self, data_type):
+        """列出指定數據類型已快取的股票代號"""
+        if not os.path.exists(self._path(data_type)):
+            return []
+        conn = self._connect(data_type)
+        try:
+            return [row[0] for row in conn.execute('SELECT cache_key FROM cache_meta ORDER BY cache_key')]
+        finally:
+            conn.close()
+
+
+CACHE_BACKENDS = {
+    'json': JsonCacheBackend,
+    'sqlite': SqliteCacheBackend,
+}
+
+_backend = None
+
+
+def get_cache_backend(name=None):
+    """取得快取後端（未指定名稱時使用 config.CACHE_BACKEND）"""
+    global _backend
+    if name is not None:
+        if name not in CACHE_BACKENDS:
+            raise ValueError(f"未知的快取後端: {name}（可用: {', '.join(CACHE_BACKENDS)}）")
+        return CACHE_BACKENDS[name]()
+    
+    if _backend is None:
+        _backend = get_cache_backend(CACHE_BACKEND)
+    return _backend
+
+
+def migrate_cache(source='json', target='sqlite', data_types=None):
+    """將快取從一種後端一次性轉換到另一種後端，回傳各數據類型轉換的股票數量"""
+    source_backend = get_cache_backend(source)
+    target_backend = get_cache_backend(target)
+    
+    migrated = {}
+    for data_type in data_types or source_backend.data_types():
+        count = 0
+        for stock_id in source_backend.stock_ids(data_type):
+            try:
+                df = source_backend.load(stock_id, data_type)
+                if df is None:
+                    continue
+                target_backend.save(stock_id, data_type, df)
+                count += 1
+            except Exception as e:
+                logging.warning(f"  無法轉換快取: {data_type}/{stock_id} - {str(e)}")
+        migrated[data_type] = count
+        logging.info(f"  {data_type}: 已轉換 {count} 檔股票")
+    return migrated
 
 
+###########################################################################
+# 快取存取
+###########################################################################
+
 def has_latest_revenue(stock_id):
     """檢查快取中是否有上個月的營收資料"""
-    cache_path = get_cache_path(stock_id, 'revenue')
-    if not os.path.exists(cache_path):
-        return False
+    # 計算上個月
+    current_year = datetime.now().year
+    current_month = datetime.now().month
+    if current_month > 1:
+        last_month = current_month - 1
+        last_month_year = current_year
+    else:
+        last_month = 12
+        last_month_year = current_year - 1
+    target_period = f"{last_month_year}-{last_month:02d}"
+    
+    # 優先使用快取索引中的最新期間，不需載入快取內容
+    entry = get_entry(stock_id, 'revenue')
+    if entry is not None:
+        return entry['latest'] is not None and entry['latest'] >= target_period
     
     try:
-        with open(cache_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        df = pd.DataFrame(data)
+        df = load_cache(stock_id, 'revenue')
         
-        if df.empty:
+        if df is None or df.empty:
             return False
         
-        # 計算上個月
-        current_year = datetime.now().year
-        current_month = datetime.now().month
-        if current_month > 1:
-            last_month = current_month - 1
-            last_month_year = current_year
-        else:
-            last_month = 12
-            last_month_year = current_year - 1
+        # 補建索引紀錄，下次檢查即可直接使用
+        update_entry(stock_id, 'revenue', df)
         
         # 檢查是否有上個月的資料
-        has_data = any(
-            (int(row['revenue_year']) == last_month_year and 
-             int(row['revenue_month']) == last_month)
-            for _, row in df.iterrows()
-        )
-        return has_data
+        has_data = (
+            (df['revenue_year'].astype(int) == last_month_year) &
+            (df['revenue_month'].astype(int) == last_month)
+        ).any()
+        return bool(has_data)
     except:
         return False
 
 
 def has_latest_financial(stock_id):
     """檢查快取中是否有上季的財務資料"""
-    cache_path = get_cache_path(stock_id, 'financial')
-    if not os.path.exists(cache_path):
-        return False
+    # 計算上一季
+    current_month = datetime.now().month
+    season_months = [3, 6, 9, 12]
+    last_season_month = None
+    for month in reversed(season_months):
+        if current_month > month:
+            last_season_month = month
+            break
+    
+    if last_season_month is None:
+        last_season_month = 12
+        target_year = datetime.now().year - 1
+    else:
+        target_year = datetime.now().year
+    
+    # 組合目標日期
+    if last_season_month in [6, 9]:
+        target_date = f"{target_year}-{last_season_month:02d}-30"
+    else:
+        target_date = f"{target_year}-{last_season_month:02d}-31"
+    
+    # 優先使用快取索引中的最新期間，不需載入快取內容
+    entry = get_entry(stock_id, 'financial')
+    if entry is not None:
+        return entry['latest'] is not None and entry['latest'] >= target_date
     
     try:
-        with open(cache_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        df = pd.DataFrame(data)
+        df = load_cache(stock_id, 'financial')
         
-        if df.empty:
+        if df is None or df.empty:
             return False
         
-        # 計算上一季
-        current_month = datetime.now().month
-        season_months = [3, 6, 9, 12]
-        last_season_month = None
-        for month in reversed(season_months):
-            if current_month > month:
-                last_season_month = month
-                break
-        
-        if last_season_month is None:
-            last_season_month = 12
-            target_year = datetime.now().year - 1
-        else:
-            target_year = datetime.now().year
-        
-        # 組合目標日期
-        if last_season_month in [6, 9]:
-            target_date = f"{target_year}-{last_season_month:02d}-30"
-        else:
-            target_date = f"{target_year}-{last_season_month:02d}-31"
+        # 補建索引紀錄，下次檢查即可直接使用
+        update_entry(stock_id, 'financial', df)
         
         # 檢查是否有上一季的資料
-        has_data = any(
-            row['date'] == target_date
-            for _, row in df.iterrows()
-        )
-        return has_data
+        has_data = (df['date'] == target_date).any()
+        return bool(has_data)
     except:
         return False
 
 
+# 記憶體快取（常駐服務使用）：{(數據類型, 股票代號): DataFrame}，None 表示未啟用
+_memory = None
+
+
+def enable_memory_cache():
+    """啟用記憶體快取：載入過的快取內容保留在記憶體，之後載入同一檔股票不再讀取與解析檔案（寫入時清除）
+    
+    只適用於常駐服務這類由單一程序寫入快取的情況
+    """
+    global _memory
+    if _memory is None:
+        _memory = {}
+
+
+def clear_memory_cache():
+    """清除記憶體快取的內容（維持啟用狀態）"""
+    if _memory is not None:
+        _memory.clear()
+
+
+def get_cache_signature():
+    """取得快取目錄中各檔案與資料夾的修改時間與大小，用於偵測其他程序是否寫入過快取
+    
+    SQLite 後端的寫入會更新 .sqlite/.sqlite-wal，JSON 後端新增檔案會更新資料夾時間，
+    兩者寫入快取時也都會更新 manifest.json
+    """
+    if not os.path.isdir(DATA_DIR):
+        return {}
+    signature = {}
+    with os.scandir(DATA_DIR) as entries:
+        for entry in entries:
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            signature[entry.name] = (stat.st_mtime_ns, stat.st_size)
+    return signature
+
+
 def load_cache(stock_id, data_type):
     """從快取載入數據"""
-    cache_path = get_cache_path(stock_id, data_type)
+    if _memory is not None:
+        df = _memory.get((data_type, str(stock_id)))
+        if df is not None:
+            return df.copy()
     
-    if os.path.exists(cache_path):
-        with open(cache_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return pd.DataFrame(data)
-    return None
+    backend = get_cache_backend()
+    df = backend.load(stock_id, data_type)
+    metrics.record_bytes_read(data_type, df)
+    
+    # 尚未轉換的舊版 JSON 快取：讀取後寫入目前的後端
+    if df is None and backend.name != 'json':
+        legacy_path = os.path.join(DATA_DIR, data_type, f'{stock_id}.json')
+        if os.path.exists(legacy_path):
+            df = get_cache_backend('json').load(stock_id, data_type)
+            if df is not None:
+                backend.save(stock_id, data_type, df)
+    
+    if _memory is not None and df is not None:
+        _memory[(data_type, str(stock_id))] = df.copy()
+    return df
+
+
+# 增量合併時用來判斷重複資料的欄位
+CACHE_DEDUP_KEYS = {
+    'revenue': ['revenue_year', 'revenue_month'],
+    'financial': ['date', 'type'],
+}
+
+
+def get_incremental_start_date(cached_data, start_date, since=None):
+    """決定增量抓取的起始日期：快取涵蓋所需區間時從最新快取日期開始，否則沿用原起始日期
+    
+    since 為快取當初的查詢起始日期（記錄於快取索引），沒有紀錄時以快取中最早的日期判斷
+    """
+    if cached_data is None or cached_data.empty or 'date' not in cached_data.columns:
+        return start_date
+    covered_from = since or str(cached_data['date'].min())
+    if covered_from > start_date:
+        return start_date
+    return str(cached_data['date'].max())
+
+
+def merge_incremental(cached_data, new_data, data_type):
+    """將增量抓取的數據合併進既有快取，重複的期間以新數據為準"""
+    if new_data is None or new_data.empty:
+        return cached_data
+    
+    merged = pd.concat([cached_data, new_data], ignore_index=True)
+    merged = merged.drop_duplicates(subset=CACHE_DEDUP_KEYS[data_type], keep='last')
+    return merged.sort_values('date', kind='stable').reset_index(drop=True)
 
 
-def save_cache(stock_id, data_type, df):
-    """儲存數據到快取"""
-    cache_path = get_cache_path(stock_id, data_type)
-    df.to_json(cache_path, orient='records', force_ascii=False, indent=2)
+def save_cache(stock_id, data_type, df, since=None):
+    """儲存從 API 取得的數據到快取，並更新快取索引（含查詢時間與查詢起始日期）"""
+    get_cache_backend().save(stock_id, data_type, df)
+    if _memory is not None:
+        # 下次載入時重新從檔案讀取，與未啟用記憶體快取時的欄位型別一致
+        _memory.pop((data_type, str(stock_id)), None)
+    update_entry(stock_id, data_type, df, fetched_at=datetime.now(), since=since)
@@ -0,0 +1,134 @@
+"""
+執行檢查點模組
+process_stock 每完成一檔股票就將股票代號附加到 data/checkpoints/ 下該輸入檔的檢查點檔，
+執行中斷（額度用盡、當機、電腦休眠）後以 --resume 重新執行時略過已完成股票的 API 查詢；
+抓取結果已在快取中，檢查點只記錄代號，續用時由快取重新載入
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+
+from config import DATA_DIR
+
+CHECKPOINT_DIR = os.path.join(DATA_DIR, 'checkpoints')
+
+
+def get_checkpoint_path(input_file):
+    """取得輸入檔對應的檢查點路徑（不同活頁簿各自一個檢查點，不會互相覆蓋）"""
+    key = os.path.normcase(os.path.abspath(input_file))
+    name = os.path.splitext(os.path.basename(key))[0]
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:10]
+    return os.path.join(CHECKPOINT_DIR, f'{name}-{digest}.jsonl')
+
+
+def _read_journal(path):
+    """讀取檢查點檔，回傳 (標頭, 已完成的股票代號)；最後一行寫到一半時略過"""
+    header, completed = None, set()
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if header is None:
+                header = record
+            elif record.get('status') == 'done':
+                completed.add(record['stock_id'])
+    return header, completed
+
+
+class CheckpointJournal:
+    """單次執行的檢查點日誌（多執行緒共用），每完成一檔股票即附加一行並寫入磁碟"""
+    
+    def __init__(self, path, header, completed=None):
+        self.path = path
+        self.header = header
+        self._completed = completed or set()
+        self._lock = threading.Lock()
+        self.reused = 0
+        self.recorded = 0
+        self.failed = 0
+        
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if self._completed:
+            # 續用既有檔案；上次中斷時最後一行可能未寫完，先補上換行
+            self._file = open(path, 'a+', encoding='utf-8')
+            self._file.seek(0, os.SEEK_END)
+            if self._file.tell() > 0:
+                self._file.seek(self._file.tell() - 1)
+                if self._file.read(1) != '\n':
+                    self._file.write('\n')
+        else:
+            self._file = open(path, 'w', encoding='utf-8')
+            self._write(header)
+    
+    def _write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+    
+    def __contains__(self, stock_id):
+        return str(stock_id) in self._completed
+    
+    def mark_reused(self):
+        """記錄一檔股票續用檢查點（數據由快取重新載入）"""
+        with self._lock:
+            self.reused += 1
+    
+    def record(self, stock_id):
+        """記錄一檔股票已完成（數據已寫入快取）"""
+        with self._lock:
+            self._write({'stock_id': str(stock_id), 'status': 'done'})
+            self.recorded += 1
+    
+    def mark_failed(self):
+        """記錄一檔股票抓取失敗（不寫入檢查點，下次 --resume 會重新抓取）"""
+        with self._lock:
+            self.failed += 1
+    
+    def close(self, completed):
+        """結束本次執行：全部完成時刪除檢查點檔，否則保留供下次 --resume 使用"""
+        self._file.close()
+        if completed and not self.failed:
+            os.remove(self.path)
+            return
+        reason = f"{self.failed} 檔股票抓取失敗" if self.failed else "輸出未完成"
+        logging.warning(f"{reason}，已保留檢查點 {self.path}，可加上 --resume 重新執行（只處理未完成的股票）")
+
+
+def open_checkpoint(input_file, period, resume=False, path=None):
+    """開啟本次執行的檢查點日誌
+    
+    period 為本次計算的營收月份與財報季度；resume=True 且既有檢查點的輸入檔與 period 相同時，
+    載入已完成的結果並續寫，否則建立新的檢查點
+    """
+    path = path or get_checkpoint_path(input_file)
+    header = {
+        'input_file': os.path.normcase(os.path.abspath(input_file)),
+        'period': period,
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+    }
+    
+    if not os.path.exists(path):
+        if resume:
+            logging.info("沒有可續用的檢查點，從頭開始處理")
+        return CheckpointJournal(path, header)
+    
+    if not resume:
+        logging.info("發現上次未完成的檢查點（可加上 --resume 續用），本次重新開始")
+        return CheckpointJournal(path, header)
+    
+    try:
+        previous, completed = _read_journal(path)
+    except OSError as e:
+        logging.warning(f"檢查點讀取失敗，從頭開始處理: {str(e)}")
+        return CheckpointJournal(path, header)
+    
+    if not previous or previous.get('input_file') != header['input_file'] or previous.get('period') != period:
+        logging.info("檢查點的輸入檔或數據期間與本次不同，從頭開始處理")
+        return CheckpointJournal(path, header)
+    
+    logging.info(f"續用檢查點（{previous.get('started_at')} 開始的執行）: 已完成 {len(completed)} 檔")
+    return CheckpointJournal(path, previous, completed)
@@ -0,0 +1,193 @@
+"""
+API 用戶端模組
+包裝 FinMind DataLoader，提供限速、重試退避與本次執行的 API 用量統計
+"""
+import logging
+import random
+import re
+import threading
+import time
+
+from config import (
+    API_BACKOFF_BASE_SECONDS,
+    API_BACKOFF_MAX_SECONDS,
+    API_BURST,
+    API_MAX_RETRIES,
+    API_REQUESTS_PER_HOUR,
+    API_THROTTLE_PAUSE_SECONDS,
+    API_TOKEN,
+)
+from modules import metrics
+
+# HTTP 狀態碼：FinMind 達到用量上限時回傳 402（部分代理伺服器為 429）
+THROTTLE_STATUS_CODES = (402, 429)
+
+# FinMind 達到用量上限時的錯誤訊息（"Requests reach the upper limit"）
+THROTTLE_MESSAGE = re.compile(r'upper limit|too many requests', re.IGNORECASE)
+
+# FinMind 以 Exception("Final response status: 402, text: ...") 回報 HTTP 錯誤，從訊息中取出狀態碼
+STATUS_CODE_PATTERN = re.compile(r'\bstatus(?:_code)?\s*[:=]\s*(\d{3})\b', re.IGNORECASE)
+
+
+def get_status_code(error):
+    """取得例外對應的 HTTP 狀態碼，無法判斷時回傳 None"""
+    response = getattr(error, 'response', None)
+    if response is not None and getattr(response, 'status_code', None):
+        return response.status_code
+    match = STATUS_CODE_PATTERN.search(str(error))
+    return int(match.group(1)) if match else None
+
+
+def classify_error(error):
+    """將 API 例外分類：'throttle' 用量上限、'transient' 暫時性錯誤（連線、逾時、5xx）、'permanent' 其他錯誤
+    
+    只有 throttle 與 transient 會重試；權限或方案不足、參數錯誤與程式錯誤直接拋出
+    """
+    import requests
+    
+    status_code = get_status_code(error)
+    if status_code in THROTTLE_STATUS_CODES or THROTTLE_MESSAGE.search(str(error)):
+        return 'throttle'
+    transient_errors = (
+        requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError,
+        ConnectionError, TimeoutError,
+    )
+    if isinstance(error, transient_errors):
+        return 'transient'
+    if status_code is not None and 500 <= status_code < 600:
+        return 'transient'
+    return 'permanent'
+
+
+class TokenBucket:
+    """權杖桶限速器（多執行緒共用）"""
+    
+    def __init__(self, rate_per_second, capacity):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """取得一個權杖，必要時等待，回傳等待秒數"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            
+            # 先預約權杖（可為負值），等待時間依欠額計算，讓各執行緒依序排隊
+            self.tokens -= 1
+            wait = max(0.0, -self.tokens / self.rate, self.paused_until - now)
+        
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+    
+    def pause(self, seconds):
+        """暫停所有請求指定秒數（觸發用量上限時使用）"""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class RateLimitedClient:
+    """限速並自動重試的 DataLoader 包裝，介面與 DataLoader 相同"""
+    
+    def __init__(self, api, requests_per_hour=API_REQUESTS_PER_HOUR, burst=API_BURST, max_retries=API_MAX_RETRIES,
+                 backoff_base=API_BACKOFF_BASE_SECONDS, backoff_max=API_BACKOFF_MAX_SECONDS,
+                 throttle_pause=API_THROTTLE_PAUSE_SECONDS, sleep=time.sleep):
+        self.api = api
+        self.bucket = TokenBucket(requests_per_hour / 3600, burst)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.throttle_pause = throttle_pause
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self.reset_stats()
+    
+    def reset_stats(self):
+        """清除用量統計（常駐服務每次處理請求前呼叫，限速狀態保留）"""
+        self.stats = {
+            'calls': 0,
+            'success': 0,
+            'retries': 0,
+            'throttled': 0,
+            'failures': 0,
+            'wait_seconds': 0.0,
+            'by_method': {},
+        }
+    
+    def __getattr__(self, name):
+        attr = getattr(self.api, name)
+        if not name.startswith('taiwan_') or not callable(attr):
+            return attr
+        
+        def wrapper(*args, **kwargs):
+            return self._call(name, attr, *args, **kwargs)
+        return wrapper
+    
+    def _record(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+    
+    def _backoff_seconds(self, attempt):
+        """指數退避加上隨機抖動"""
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.5)
+    
+    def _call(self, name, func, *args, **kwargs):
+        """執行 API 呼叫：先取得限速權杖，限流或暫時性錯誤時指數退避重試，其他錯誤直接拋出"""
+        with self._lock:
+            self.stats['by_method'][name] = self.stats['by_method'].get(name, 0) + 1
+        
+        for attempt in range(self.max_retries + 1):
+            self._record('wait_seconds', self.bucket.acquire())
+            self._record('calls')
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+                self._record('success')
+                metrics.record_api_call(name, kwargs.get('stock_id'), time.perf_counter() - start)
+                return result
+            except Exception as e:
+                metrics.record_api_call(name, kwargs.get('stock_id'), time.perf_counter() - start, ok=False)
+                kind = classify_error(e)
+                throttled = kind == 'throttle'
+                if throttled:
+                    self._record('throttled')
+                    self.bucket.pause(self.throttle_pause)
+                
+                if kind == 'permanent' or attempt >= self.max_retries:
+                    self._record('failures')
+                    raise
+                
+                delay = self._backoff_seconds(attempt)
+                self._record('retries')
+                logging.warning(f"  API {'限流' if throttled else '錯誤'}: {name} 第 {attempt + 1} 次重試（{delay:.1f} 秒後）- {str(e)}")
+                self._record('wait_seconds', delay)
+                self._sleep(delay)
+    
+    def log_budget(self):
+        """輸出本次執行的 API 用量報告"""
+        stats = self.stats
+        logging.info(
+            f"API 用量: 呼叫 {stats['calls']} 次，成功 {stats['success']} 次，重試 {stats['retries']} 次，"
+            f"限流 {stats['throttled']} 次，失敗 {stats['failures']} 次，等待 {stats['wait_seconds']:.1f} 秒"
+        )
+        for name, count in sorted(stats['by_method'].items()):
+            logging.info(f"  - {name}: {count} 筆請求")
+
+
+def create_api_client(share=1):
+    """建立限速的 FinMind API 用戶端（有設定 API_TOKEN 時自動登入）
+    
+    多個程序同時執行時以 share 指定程序數，每個程序只使用 1/share 的每小時額度
+    """
+    from FinMind.data import DataLoader
+    
+    api = DataLoader()
+    if API_TOKEN:
+        api.login_by_token(api_token=API_TOKEN)
+    return RateLimitedClient(api, requests_per_hour=API_REQUESTS_PER_HOUR / share, burst=max(1, API_BURST // share))
@@ -0,0 +1,80 @@
+"""
+單次執行數據上下文模組
+"""
+import logging
+import threading
+
+
+class StockDataContext:
+    """單次執行內共用的股票數據上下文，每檔股票的營收、財務和日線數據最多載入一次"""
+    
+    def __init__(self, api):
+        self.api = api
+        self._frames = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self.loads = {'revenue': 0, 'financial': 0, 'daily': 0}
+        self.reuses = {'revenue': 0, 'financial': 0, 'daily': 0}
+    
+    def _load(self, data_type, stock_id):
+        """實際載入數據（快取或 API）"""
+        from modules.financial import get_stock_daily_data, get_stock_financial_data
+        from modules.revenue import get_stock_revenue_data
+        
+        if data_type == 'revenue':
+            return get_stock_revenue_data(self.api, stock_id)
+        if data_type == 'financial':
+            return get_stock_financial_data(self.api, stock_id)
+        if data_type == 'daily':
+            return get_stock_daily_data(self.api, stock_id)
+        raise ValueError(f"未知的數據類型: {data_type}")
+    
+    def get(self, data_type, stock_id):
+        """取得指定股票的數據，同一執行內重複取用時直接回傳已載入的結果"""
+        key = (data_type, str(stock_id))
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        
+        with key_lock:
+            if key in self._frames:
+                with self._lock:
+                    self.reuses[data_type] += 1
+                data, error = self._frames[key]
+            else:
+                try:
+                    data, error = self._load(data_type, stock_id), None
+                except Exception as e:
+                    data, error = None, e
+                self._frames[key] = (data, error)
+                with self._lock:
+                    self.loads[data_type] += 1
+        
+        # 載入失敗時保留例外，避免其他處理器再次呼叫 API
+        if error is not None:
+            raise error
+        return data
+    
+    def failed(self, data_type, stock_id):
+        """指定股票的數據是否載入失敗（API 錯誤等，不含查無數據）"""
+        entry = self._frames.get((data_type, str(stock_id)))
+        return entry is not None and entry[1] is not None
+    
+    def get_revenue(self, stock_id):
+        """取得營收數據"""
+        return self.get('revenue', stock_id)
+    
+    def get_financial(self, stock_id):
+        """取得財務報表數據"""
+        return self.get('financial', stock_id)
+    
+    def get_daily(self, stock_id):
+        """取得近期日線數據"""
+        return self.get('daily', stock_id)
+    
+    def log_summary(self):
+        """輸出載入次數統計"""
+        total_loads = sum(self.loads.values())
+        total_reuses = sum(self.reuses.values())
+        logging.info(f"數據載入統計: 實際載入 {total_loads} 次，重複使用 {total_reuses} 次（避免 {total_reuses} 次重複載入）")
+        for data_type in self.loads:
+            logging.info(f"  - {data_type}: 載入 {self.loads[data_type]} 次，避免 {self.reuses[data_type]} 次")
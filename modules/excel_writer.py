@@ -0,0 +1,176 @@
+"""
+Excel 輸出模組
+以 openpyxl 一次寫入 DataFrame：百分比儲存格在寫入時直接換算並套用格式，不需寫入後再逐格回頭修改
+
+覆寫既有活頁簿時須保留工作表中 DataFrame 範圍以外的儲存格與格式（與原本 ExcelWriter 的 overlay 模式相同），
+openpyxl 只能載入整個活頁簿後逐格覆寫，不適用串流寫入；大型活頁簿請使用 OUTPUT_MODE = 'splice'
+（直接替換壓縮檔中的工作表，不載入其他工作表）。建立新檔（sidecar 模式或輸出檔不存在）時以 write-only 模式逐列串流寫入
+"""
+import logging
+import math
+import os
+import tempfile
+
+import pandas as pd
+
+PERCENT_FORMAT = '0.00%'
+
+
+def get_percent_mask(df, percent_rows=None):
+    """標記需以百分比輸出的儲存格：欄名含 (%) 的欄位，以及首欄名稱在 percent_rows 中的列（首欄除外）"""
+    mask = pd.DataFrame(False, index=df.index, columns=df.columns)
+    for column in df.columns:
+        if '(%)' in str(column):
+            mask[column] = True
+    
+    if percent_rows and len(df.columns) > 1:
+        row_mask = df.iloc[:, 0].isin(percent_rows)
+        for column in df.columns[1:]:
+            mask[column] = mask[column] | row_mask
+    return mask
+
+
+def to_cell_value(value):
+    """轉換為 openpyxl 可寫入的值（缺值為 None、無限大為文字，與 pandas to_excel 相同）"""
+    if value is None:
+        return None
+    if hasattr(value, 'item') and not isinstance(value, str):
+        value = value.item()
+    if isinstance(value, float):
+        if math.isnan(value):
+            return None
+        if math.isinf(value):
+            return 'inf' if value > 0 else '-inf'
+    elif isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    elif value is pd.NaT or value is pd.NA:
+        return None
+    elif not isinstance(value, (int, bool)) and not hasattr(value, 'year'):
+        return str(value)
+    return value
+
+
+def write_frame(worksheet, df, percent_rows=None):
+    """將 DataFrame 寫入工作表（含標題列），百分比儲存格除以 100 並設定格式
+    
+    只覆寫 DataFrame 範圍內的儲存格，其餘內容與格式保留（與 ExcelWriter 的 overlay 模式相同）
+    """
+    mask = get_percent_mask(df, percent_rows)
+    
+    for col_idx, column in enumerate(df.columns, start=1):
+        worksheet.cell(row=1, column=col_idx, value=to_cell_value(column))
+        
+        for row_idx, (value, percent) in enumerate(zip(df[column].tolist(), mask[column].tolist()), start=2):
+            value = to_cell_value(value)
+            if percent and isinstance(value, (int, float)) and not isinstance(value, bool):
+                cell = worksheet.cell(row=row_idx, column=col_idx, value=value / 100)
+                cell.number_format = PERCENT_FORMAT
+            else:
+                worksheet.cell(row=row_idx, column=col_idx, value=value)
+
+
+def iter_frame_rows(worksheet, df, percent_rows=None):
+    """逐列產生 write-only 工作表的儲存格值（含標題列），百分比儲存格除以 100 並設定格式"""
+    from openpyxl.cell import WriteOnlyCell
+    
+    mask = get_percent_mask(df, percent_rows)
+    yield [to_cell_value(column) for column in df.columns]
+    
+    columns = [df[column].tolist() for column in df.columns]
+    masks = [mask[column].tolist() for column in df.columns]
+    for row_pos in range(len(df)):
+        row = []
+        for values, percents in zip(columns, masks):
+            value = to_cell_value(values[row_pos])
+            if percents[row_pos] and isinstance(value, (int, float)) and not isinstance(value, bool):
+                cell = WriteOnlyCell(worksheet, value=value / 100)
+                cell.number_format = PERCENT_FORMAT
+                row.append(cell)
+            else:
+                row.append(value)
+        yield row
+
+
+def write_new_excel(output_file, frames, percent_rows=None):
+    """以 write-only 模式建立只含 frames 工作表的新檔（逐列串流寫入，不保留任何既有內容）"""
+    from openpyxl import Workbook
+    
+    workbook = Workbook(write_only=True)
+    percent_rows = percent_rows or {}
+    for sheet_name, df in frames.items():
+        worksheet = workbook.create_sheet(sheet_name)
+        for row in iter_frame_rows(worksheet, df, percent_rows.get(sheet_name)):
+            worksheet.append(row)
+        logging.debug(f"  寫入工作表 {sheet_name}: {len(df)} 列")
+    workbook.save(output_file)
+
+
+def write_excel(output_file, frames, percent_rows=None, new=False):
+    """將多個 DataFrame 寫入 Excel 的指定工作表，保留活頁簿中的其他工作表
+    
+    frames 為 {工作表名稱: DataFrame}；percent_rows 為 {工作表名稱: 需以百分比輸出的首欄名稱}
+    既有檔案須載入整個活頁簿以保留其他內容；檔案不存在或 new=True 時以 write_new_excel 串流建立新檔
+    """
+    from openpyxl import load_workbook
+    
+    if new or not os.path.exists(output_file):
+        write_new_excel(output_file, frames, percent_rows)
+        return
+    
+    workbook = load_workbook(output_file)
+    percent_rows = percent_rows or {}
+    for sheet_name, df in frames.items():
+        if sheet_name in workbook.sheetnames:
+            worksheet = workbook[sheet_name]
+        else:
+            worksheet = workbook.create_sheet(sheet_name)
+        write_frame(worksheet, df, percent_rows.get(sheet_name))
+        logging.debug(f"  寫入工作表 {sheet_name}: {len(df)} 列")
+    
+    workbook.save(output_file)
+
+
+def get_sidecar_path(output_file):
+    """取得 sidecar 模式的輸出檔案路徑（原檔名加上 SIDECAR_SUFFIX）"""
+    from config import SIDECAR_SUFFIX
+    
+    stem, _ = os.path.splitext(output_file)
+    return f'{stem}{SIDECAR_SUFFIX}.xlsx'
+
+
+def get_output_path(output_file, mode=None):
+    """取得輸出模式實際寫入的檔案路徑（sidecar 模式為另一個檔案）"""
+    from config import OUTPUT_MODE
+    
+    if (mode or OUTPUT_MODE) == 'sidecar':
+        return get_sidecar_path(output_file)
+    return output_file
+
+
+def write_output(output_file, frames, mode=None, percent_rows=None):
+    """依輸出模式（config.OUTPUT_MODE）寫入工作表，回傳實際寫入的檔案路徑
+    
+    openpyxl: 載入活頁簿覆寫工作表；splice: 只替換壓縮檔中的工作表內容（檔案不存在時改為建立新檔）；
+    sidecar: 原活頁簿不變，每次重新產生另一個只含這些工作表的檔案
+    """
+    from config import OUTPUT_MODE
+    
+    mode = mode or OUTPUT_MODE
+    output_file = get_output_path(output_file, mode)
+    if mode == 'sidecar':
+        fd, temp_path = tempfile.mkstemp(suffix='.xlsx', dir=os.path.dirname(os.path.abspath(output_file)))
+        os.close(fd)
+        try:
+            write_excel(temp_path, frames, percent_rows, new=True)
+            os.replace(temp_path, output_file)
+        except Exception:
+            os.remove(temp_path)
+            raise
+    elif mode == 'splice' and os.path.exists(output_file):
+        from modules.xlsx_splice import splice_sheets
+        splice_sheets(output_file, frames, percent_rows)
+    elif mode in ('openpyxl', 'splice'):
+        write_excel(output_file, frames, percent_rows)
+    else:
+        raise ValueError(f"未知的輸出模式: {mode}")
+    return output_file
@@ -4,7 +4,13 @@
 import logging
 from datetime import datetime
 
-from modules.cache import has_latest_financial, load_cache, save_cache
+import pandas as pd
+
+from config import INCREMENTAL_FETCH
+from modules import metrics
+from modules.cache import get_incremental_start_date, has_latest_financial, load_cache, merge_incremental, save_cache
+from modules.manifest import get_entry, mark_fetched
+from modules.planner import PLAN_REASONS, plan_fetch
 
 
 def get_last_season_month():
@@ -36,6 +42,16 @@ def get_stock_financial_data(api, stock_id, start_date=None, use_cache=True):
         cached_data = load_cache(stock_id, 'financial')
         if cached_data is not None:
             logging.info(f"  ✓ 快取: {stock_id} 財務")
+            metrics.record_cache('financial', hit=True)
+            return cached_data
+    
+    # 上季財報尚未公布：近期已查詢過 API，或已過公布期限且期限後已查詢過時沿用現有快取（見 modules.planner）
+    fetch, reason = plan_fetch(stock_id, 'financial') if use_cache else (True, None)
+    if not fetch:
+        cached_data = load_cache(stock_id, 'financial')
+        if cached_data is not None or not get_entry(stock_id, 'financial')['rows']:
+            logging.info(f"  ✓ 快取: {stock_id} 財務（{PLAN_REASONS[reason]}）")
+            metrics.record_cache('financial', hit=True)
             return cached_data
     
     # 地端沒有上季資料，從 API 抓取
@@ -43,26 +59,82 @@ def get_stock_financial_data(api, stock_id, start_date=None, use_cache=True):
         two_years_ago = datetime.now().replace(year=datetime.now().year - 2)
         start_date = two_years_ago.strftime('%Y-%m-%d')
     
-    logging.info(f"  ⟳ API: {stock_id} 財務")
+    # 增量模式：只抓取最新快取期間之後的數據
+    cached_data = load_cache(stock_id, 'financial') if use_cache and INCREMENTAL_FETCH else None
+    entry = get_entry(stock_id, 'financial')
+    fetch_start_date = get_incremental_start_date(cached_data, start_date, since=entry.get('since') if entry else None)
+    incremental = fetch_start_date != start_date
+    
+    if incremental:
+        logging.info(f"  ⟳ API: {stock_id} 財務（增量: {fetch_start_date} 起）")
+    else:
+        logging.info(f"  ⟳ API: {stock_id} 財務")
+    metrics.record_cache('financial', hit=False)
     data = api.taiwan_stock_financial_statement(
         stock_id=stock_id,
-        start_date=start_date,
+        start_date=fetch_start_date,
     )
     
-    # 儲存到快取
+    # 儲存到快取（沒有新數據時仍記錄查詢時間）
     if data is not None and not data.empty:
-        save_cache(stock_id, 'financial', data)
+        if incremental:
+            data = merge_incremental(cached_data, data, 'financial')
+            save_cache(stock_id, 'financial', data)
+        else:
+            save_cache(stock_id, 'financial', data, since=start_date)
+    else:
+        mark_fetched(stock_id, 'financial')
+        if incremental:
+            data = cached_data
     
     return data
 
 
+def get_stock_daily_data(api, stock_id, days=10):
+    """獲取股票近期日線數據（用於取得最新收盤價）"""
+    from datetime import timedelta
+    
+    start_date = datetime.now() - timedelta(days=days)
+    return api.taiwan_stock_daily(
+        stock_id=stock_id,
+        start_date=start_date.strftime('%Y-%m-%d')
+    )
+
+
+def index_financial_data(financial_data):
+    """將長格式財務數據（date, type, value）轉為以日期為列、科目為欄的矩陣
+    
+    日期解析為 DatetimeIndex，之後的日期/科目查詢與年度加總都直接在矩陣上進行；
+    已是矩陣時原樣回傳
+    """
+    if 'type' not in financial_data.columns and isinstance(financial_data.index, pd.DatetimeIndex):
+        return financial_data
+    
+    # 同一日期同一科目有多筆時取第一筆（與逐筆篩選的結果一致）
+    deduplicated = financial_data.drop_duplicates(subset=['date', 'type'], keep='first')
+    matrix = deduplicated.pivot(index='date', columns='type', values='value')
+    matrix.index = pd.to_datetime(matrix.index)
+    return matrix.sort_index()
+
+
+def get_year_values(financial_data, data_type, year):
+    """取得指定科目在某年度所有季度的數值（依日期排序，不含缺值）"""
+    matrix = index_financial_data(financial_data)
+    if data_type not in matrix.columns:
+        return pd.Series(dtype=float)
+    return matrix.loc[matrix.index.year == year, data_type].dropna()
+
+
 def extract_value_by_date(financial_data, data_type, target_date):
-    """從財務數據中提取指定類型和日期的數據（優化版）"""
-    filtered_data = financial_data[
-        (financial_data['type'] == data_type) & 
-        (financial_data['date'] == target_date)
-    ]
-    return filtered_data.iloc[0]['value'] if not filtered_data.empty else None
+    """從財務數據中提取指定類型和日期的數據（先以 index_financial_data 建立矩陣可避免重複轉換）"""
+    matrix = index_financial_data(financial_data)
+    if data_type not in matrix.columns:
+        return None
+    try:
+        value = matrix.at[pd.Timestamp(target_date), data_type]
+    except KeyError:
+        return None
+    return None if pd.isna(value) else value
 
 
 def get_quarter_name(target_year, season_month):
@@ -90,257 +162,179 @@ def get_previous_season_month(target_year, target_month):
         return target_year - 1, 12
 
 
-def get_last_two_season_data(financial_data, data_type):
-    """通用函數：取得上一季和上上季的指定數據"""
-    # 計算上一季和上上季的年份月份
-    target_year, last_season_month = get_last_season_month()
-    prev_year, prev_month = get_previous_season_month(target_year, last_season_month)
-    
-    # 組合目標日期
-    last_date = get_season_date(target_year, last_season_month)
-    prev_date = get_season_date(prev_year, prev_month)
-    
-    # 提取兩季的數據
-    value_last = extract_value_by_date(financial_data, data_type, last_date)
-    value_prev = extract_value_by_date(financial_data, data_type, prev_date)
-    
-    # 取得季度名稱
-    quarter_last = get_quarter_name(target_year, last_season_month)
-    quarter_prev = get_quarter_name(prev_year, prev_month)
+def load_financial_for_table(ctx, stock_id):
+    """抓取單一股票的財務數據供整批計算使用，無數據或失敗時回傳 None"""
+    try:
+        financial_data = ctx.get_financial(stock_id)
+    except Exception as e:
+        logging.error(f"  錯誤: {stock_id} 財務數據獲取失敗 - {str(e)}")
+        return None
     
-    return value_last, quarter_last, value_prev, quarter_prev
+    if financial_data is None or financial_data.empty:
+        logging.warning(f"  警告: {stock_id} 無財務數據")
+        return None
+    return financial_data
 
 
-def get_last_three_season_data(financial_data, data_type):
-    """通用函數：取得上一季、上上季和上上上季的指定數據"""
-    # 計算上一季、上上季和上上上季的年份月份
-    target_year, last_season_month = get_last_season_month()
-    prev_year, prev_month = get_previous_season_month(target_year, last_season_month)
-    prev2_year, prev2_month = get_previous_season_month(prev_year, prev_month)
-    
-    # 組合目標日期
-    last_date = get_season_date(target_year, last_season_month)
-    prev_date = get_season_date(prev_year, prev_month)
-    prev2_date = get_season_date(prev2_year, prev2_month)
-    
-    # 提取三季的數據
-    value_last = extract_value_by_date(financial_data, data_type, last_date)
-    value_prev = extract_value_by_date(financial_data, data_type, prev_date)
-    value_prev2 = extract_value_by_date(financial_data, data_type, prev2_date)
-    
-    # 取得季度名稱
-    quarter_last = get_quarter_name(target_year, last_season_month)
-    quarter_prev = get_quarter_name(prev_year, prev_month)
-    quarter_prev2 = get_quarter_name(prev2_year, prev2_month)
-    
-    return value_last, quarter_last, value_prev, quarter_prev, value_prev2, quarter_prev2
+def build_financial_panel(financial_frames, rows):
+    """將所有股票的財務數據合併為 (列索引, 日期, 科目) 面板，回傳 {科目: 列索引 × 日期 矩陣}
+    
+    financial_frames 為 {列索引: 長格式財務 DataFrame 或 None}；同一股票同一日期同一科目有多筆時
+    取第一筆，與 index_financial_data 相同
+    """
+    available = {
+        row: financial_data
+        for row, financial_data in financial_frames.items()
+        if financial_data is not None and not financial_data.empty
+    }
+    if not available:
+        return {}
+    
+    # 直接串接原始數據，再以各股票筆數展開列索引
+    panel = pd.concat(available.values(), ignore_index=True)[['date', 'type', 'value']]
+    panel['row'] = pd.Index(list(available)).repeat([len(financial_data) for financial_data in available.values()])
+    panel['date'] = pd.to_datetime(panel['date'])
+    panel = panel.drop_duplicates(subset=['row', 'date', 'type'], keep='first')
+    panel['value'] = pd.to_numeric(panel['value'])
+    
+    wide = panel.pivot(index='row', columns=['type', 'date'], values='value').reindex(rows)
+    return {data_type: wide[data_type].sort_index(axis=1) for data_type in wide.columns.get_level_values(0).unique()}
 
 
-def calculate_gross_margin(financial_data):
-    """計算所有季度的毛利率"""
-    # 提取毛利和營收數據
-    gross_profit_data = financial_data[financial_data['type'] == 'GrossProfit'][['date', 'value']].rename(columns={'value': 'gross_profit'})
-    revenue_data = financial_data[financial_data['type'] == 'Revenue'][['date', 'value']].rename(columns={'value': 'revenue'})
-    
-    # 合併數據
-    merged_data = gross_profit_data.merge(revenue_data, on='date', how='inner')
-    
-    # 計算毛利率
-    merged_data['gross_margin'] = (merged_data['gross_profit'] / merged_data['revenue'] * 100).round(2)
-    
-    return merged_data
+def _panel_values_at(panel, data_type, target_date):
+    """從面板取出所有股票指定科目在某日期的數值（無數據為 NaN）"""
+    matrix = panel.get(data_type)
+    target_date = pd.Timestamp(target_date)
+    if matrix is None or target_date not in matrix.columns:
+        return pd.Series(float('nan'), index=next(iter(panel.values())).index)
+    return matrix[target_date]
 
 
-def get_ytd_revenue(financial_data):
-    """計算今年累積營收（Year-To-Date Revenue）"""
-    current_year = datetime.now().year
-    
-    # 篩選今年的 Revenue 數據
-    revenue_data = financial_data[
-        (financial_data['type'] == 'Revenue') &
-        (financial_data['date'].str.startswith(str(current_year)))
-    ]
-    
-    if revenue_data.empty:
+def _panel_year_values(panel, data_type, year):
+    """從面板取出所有股票指定科目某年度的季度數值矩陣（無該科目時回傳 None）"""
+    matrix = panel.get(data_type)
+    if matrix is None:
         return None
-    
-    # 加總今年所有季度的營收
-    ytd_revenue = revenue_data['value'].sum()
-    return ytd_revenue
+    return matrix.loc[:, matrix.columns.year == year]
+
+
+def _panel_year_sum(panel, data_type, year):
+    """所有股票指定科目的年度加總與是否有數據（對應 get_year_values(...).sum() 與 .empty）"""
+    values = _panel_year_values(panel, data_type, year)
+    if values is None or values.empty:
+        index = next(iter(panel.values())).index
+        return pd.Series(0.0, index=index), pd.Series(False, index=index)
+    return values.sum(axis=1), values.notna().any(axis=1)
+
 
+def _to_million_list(values, valid=None):
+    """整批換算為百萬單位（與 convert_to_million 相同：0 或缺值為 None）"""
+    if valid is None:
+        valid = values.notna()
+    return [round(value / 1000000) if ok and value else None for value, ok in zip(values, valid)]
 
-def get_last_two_season_gross_margin(financial_data):
-    """取得股票上一季和上上季的毛利率"""
-    # 計算上一季和上上季的年份月份
+
+def _present_list(values, valid):
+    """有數據的位置保留數值，其餘為 None"""
+    return [value if ok else None for value, ok in zip(values, valid)]
+
+
+def _object_table(columns, rows):
+    """以 object 欄位組成結果表，缺值維持 None"""
+    return pd.DataFrame(
+        {column: pd.Series(values, index=rows, dtype=object) for column, values in columns.items()},
+        index=rows,
+    )
+
+
+def compute_financial_table(financial_frames, rows):
+    """以整批向量化運算計算所有股票的綜合損益表欄位（季營收、毛利率、累積營收、去年整年數據）
+    
+    去年整年欄位只在至少一檔股票有數據時建立
+    """
+    panel = build_financial_panel(financial_frames, rows)
+    if not panel:
+        return pd.DataFrame(index=rows)
+    
     target_year, last_season_month = get_last_season_month()
     prev_year, prev_month = get_previous_season_month(target_year, last_season_month)
-    
-    # 組合目標日期
     last_date = get_season_date(target_year, last_season_month)
     prev_date = get_season_date(prev_year, prev_month)
-    
-    # 計算毛利率
-    gross_margin_data = calculate_gross_margin(financial_data)
-    
-    # 提取指定日期的毛利率
-    gross_margin_last = gross_margin_data[gross_margin_data['date'] == last_date]['gross_margin'].values
-    gross_margin_prev = gross_margin_data[gross_margin_data['date'] == prev_date]['gross_margin'].values
-    
-    gross_margin_last = gross_margin_last[0] if len(gross_margin_last) > 0 else None
-    gross_margin_prev = gross_margin_prev[0] if len(gross_margin_prev) > 0 else None
-    
-    # 取得季度名稱
     quarter_last = get_quarter_name(target_year, last_season_month)
     quarter_prev = get_quarter_name(prev_year, prev_month)
     
-    return gross_margin_last, quarter_last, gross_margin_prev, quarter_prev
-
-
-def get_ytd_eps(financial_data):
-    """計算今年累積EPS（Year-To-Date EPS）"""
-    current_year = datetime.now().year
+    columns = {}
     
-    # 篩選今年的 EPS 數據
-    eps_data = financial_data[
-        (financial_data['type'] == 'EPS') &
-        (financial_data['date'].str.startswith(str(current_year)))
-    ]
+    # 季營收
+    columns[f'{quarter_last}季營收(M)'] = _to_million_list(_panel_values_at(panel, 'Revenue', last_date))
+    columns[f'{quarter_prev}季營收(M)'] = _to_million_list(_panel_values_at(panel, 'Revenue', prev_date))
     
-    if eps_data.empty:
-        return None
+    # 毛利率（毛利和營收皆有數據的季度）
+    for quarter, season_date in ((quarter_last, last_date), (quarter_prev, prev_date)):
+        gross_profit = _panel_values_at(panel, 'GrossProfit', season_date)
+        revenue = _panel_values_at(panel, 'Revenue', season_date)
+        gross_margin = (gross_profit / revenue * 100).round(2)
+        columns[f'{quarter}毛利率(%)'] = _present_list(gross_margin, gross_profit.notna() & revenue.notna())
     
-    # 加總今年所有季度的 EPS
-    ytd_eps = eps_data['value'].sum()
-    return round(ytd_eps, 2) if ytd_eps else None
+    # 今年累積營收
+    current_year = datetime.now().year
+    ytd_revenue, ytd_valid = _panel_year_sum(panel, 'Revenue', current_year)
+    columns[f'{str(current_year)[-2:]}年累積營收(M)'] = _to_million_list(ytd_revenue, ytd_valid)
+    
+    # 去年整年營收
+    last_year = current_year - 1
+    last_year_revenue, last_year_revenue_valid = _panel_year_sum(panel, 'Revenue', last_year)
+    if last_year_revenue_valid.any():
+        columns[f'{str(last_year)[-2:]}年整年營收(M)'] = _to_million_list(last_year_revenue, last_year_revenue_valid)
+    
+    # 去年整年毛利率（加權平均）
+    last_year_gross_profit, last_year_gross_profit_valid = _panel_year_sum(panel, 'GrossProfit', last_year)
+    last_year_margin_valid = last_year_revenue_valid & last_year_gross_profit_valid & (last_year_revenue != 0)
+    if last_year_margin_valid.any():
+        last_year_gross_margin = (last_year_gross_profit / last_year_revenue * 100).round(2)
+        columns[f'{str(last_year)[-2:]}年整年毛利率(%)'] = _present_list(last_year_gross_margin, last_year_margin_valid)
+    
+    return _object_table(columns, rows)
 
 
-def process_financial_data(api, df, idx, stock_id):
-    """處理單一股票的綜合損益表（季營收、毛利率、累積營收、去年整年數據）"""
-    from datetime import datetime
-    from modules.utils import convert_to_million, ensure_column_exists
-    
-    financial_data = get_stock_financial_data(api, stock_id)
-    if financial_data is None or financial_data.empty:
-        logging.warning(f"  警告: {stock_id} 無財務數據")
-        return
-    
-    # 處理季營收（從財務報表的 Revenue 提取）
-    season_revenue_last, sr_quarter_last, season_revenue_prev, sr_quarter_prev = get_last_two_season_data(financial_data, 'Revenue')
-    
-    # 轉換為百萬單位
-    season_revenue_last_million = convert_to_million(season_revenue_last)
-    season_revenue_prev_million = convert_to_million(season_revenue_prev)
+def compute_eps_table(financial_frames, rows):
+    """以整批向量化運算計算所有股票近三季 EPS 與今年累積 EPS"""
+    panel = build_financial_panel(financial_frames, rows)
+    if not panel:
+        return pd.DataFrame(index=rows)
     
-    # 初始化並更新季營收欄位
-    ensure_column_exists(df, f'{sr_quarter_last}季營收(M)')
-    ensure_column_exists(df, f'{sr_quarter_prev}季營收(M)')
-    df.at[idx, f'{sr_quarter_last}季營收(M)'] = season_revenue_last_million
-    df.at[idx, f'{sr_quarter_prev}季營收(M)'] = season_revenue_prev_million
-    
-    # 處理毛利率
-    gross_margin_last, gm_quarter_last, gross_margin_prev, gm_quarter_prev = get_last_two_season_gross_margin(financial_data)
-    
-    # 初始化並更新毛利率欄位
-    ensure_column_exists(df, f'{gm_quarter_last}毛利率(%)')
-    ensure_column_exists(df, f'{gm_quarter_prev}毛利率(%)')
-    df.at[idx, f'{gm_quarter_last}毛利率(%)'] = gross_margin_last
-    df.at[idx, f'{gm_quarter_prev}毛利率(%)'] = gross_margin_prev
+    target_year, last_season_month = get_last_season_month()
+    prev_year, prev_month = get_previous_season_month(target_year, last_season_month)
+    prev2_year, prev2_month = get_previous_season_month(prev_year, prev_month)
     
-    # 處理今年累積營收
-    ytd_revenue = get_ytd_revenue(financial_data)
-    ytd_revenue_million = convert_to_million(ytd_revenue)
+    columns = {}
+    for year, month in ((target_year, last_season_month), (prev_year, prev_month), (prev2_year, prev2_month)):
+        eps = _panel_values_at(panel, 'EPS', get_season_date(year, month))
+        columns[f'{get_quarter_name(year, month)}EPS'] = _present_list(eps, eps.notna())
     
-    # 初始化並更新累積營收欄位
+    # 今年累積 EPS（加總為 0 時為 None）
     current_year = datetime.now().year
-    ensure_column_exists(df, f'{str(current_year)[-2:]}年累積營收(M)')
-    df.at[idx, f'{str(current_year)[-2:]}年累積營收(M)'] = ytd_revenue_million
-    
-    # 處理去年整年營收
-    last_year = current_year - 1
-    last_year_revenue_data = financial_data[
-        (financial_data['type'] == 'Revenue') &
-        (financial_data['date'].str.startswith(str(last_year)))
-    ]
-    
-    if not last_year_revenue_data.empty:
-        last_year_total_revenue = last_year_revenue_data['value'].sum()
-        last_year_revenue_million = convert_to_million(last_year_total_revenue)
-        ensure_column_exists(df, f'{str(last_year)[-2:]}年整年營收(M)')
-        df.at[idx, f'{str(last_year)[-2:]}年整年營收(M)'] = last_year_revenue_million
-    
-    # 處理去年整年毛利率（計算加權平均）
-    last_year_gross_profit_data = financial_data[
-        (financial_data['type'] == 'GrossProfit') &
-        (financial_data['date'].str.startswith(str(last_year)))
+    ytd_eps, ytd_valid = _panel_year_sum(panel, 'EPS', current_year)
+    columns[f'{str(current_year)[-2:]}年累積EPS'] = [
+        round(value, 2) if ok and value else None for value, ok in zip(ytd_eps, ytd_valid)
     ]
-    
-    if not last_year_revenue_data.empty and not last_year_gross_profit_data.empty:
-        last_year_total_gross_profit = last_year_gross_profit_data['value'].sum()
-        last_year_total_revenue_value = last_year_revenue_data['value'].sum()
-        
-        if last_year_total_revenue_value and last_year_total_revenue_value != 0:
-            last_year_gross_margin = round((last_year_total_gross_profit / last_year_total_revenue_value) * 100, 2)
-            ensure_column_exists(df, f'{str(last_year)[-2:]}年整年毛利率(%)')
-            df.at[idx, f'{str(last_year)[-2:]}年整年毛利率(%)'] = last_year_gross_margin
-
-
-def process_eps_data(api, df, idx, stock_id):
-    """處理單一股票的 EPS 數據（包含最新收盤價）"""
-    from datetime import datetime, timedelta
+    return _object_table(columns, rows)
+
+
+def _assign_table(df, table):
+    """將整批計算結果依欄位順序寫入 DataFrame"""
     from modules.utils import ensure_column_exists
     
-    # 獲取最新收盤價
-    try:
-        # 計算查詢起始日期（最近 30 天）
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=10)
-        
-        daily_data = api.taiwan_stock_daily(
-            stock_id=stock_id,
-            start_date=start_date.strftime('%Y-%m-%d')
-        )
-        
-        if daily_data is not None and not daily_data.empty:
-            # 取得最新一筆資料
-            latest_data = daily_data.sort_values(by="date", ascending=False).head(1)
-            latest_date = latest_data.iloc[0]["date"]
-            latest_close = latest_data.iloc[0]["close"]
-            
-            # 初始化並更新收盤價欄位（欄位名稱為日期）
-            ensure_column_exists(df, latest_date)
-            df.at[idx, latest_date] = latest_close
-        else:
-            logging.warning(f"  警告: {stock_id} 無法取得收盤價")
-    except Exception as e:
-        logging.error(f"  錯誤: {stock_id} 收盤價取得失敗 - {str(e)}")
-    
-    # 獲取財務數據
-    financial_data = get_stock_financial_data(api, stock_id)
-    if financial_data is None or financial_data.empty:
-        logging.warning(f"  警告: {stock_id} 無財務數據")
-        return
-    
-    # 處理 EPS（取得三季數據）
-    try:
-        eps_last, quarter_last, eps_prev, quarter_prev, eps_prev2, quarter_prev2 = get_last_three_season_data(financial_data, 'EPS')
-    except Exception as e:
-        logging.error(f"  錯誤: {stock_id} EPS 提取失敗 - {str(e)}")
-        eps_last = quarter_last = eps_prev = quarter_prev = eps_prev2 = quarter_prev2 = None
-    
-    # 計算今年累積 EPS
-    try:
-        ytd_eps = get_ytd_eps(financial_data)
-    except Exception as e:
-        logging.error(f"  錯誤: {stock_id} YTD EPS 計算失敗 - {str(e)}")
-        ytd_eps = None
-    
-    # 初始化並更新 EPS 欄位
-    ensure_column_exists(df, f'{quarter_last}EPS')
-    ensure_column_exists(df, f'{quarter_prev}EPS')
-    ensure_column_exists(df, f'{quarter_prev2}EPS')
-    current_year = datetime.now().year
-    ensure_column_exists(df, f'{str(current_year)[-2:]}年累積EPS')
-    df.at[idx, f'{quarter_last}EPS'] = eps_last
-    df.at[idx, f'{quarter_prev}EPS'] = eps_prev
-    df.at[idx, f'{quarter_prev2}EPS'] = eps_prev2
-    df.at[idx, f'{str(current_year)[-2:]}年累積EPS'] = ytd_eps
+    for column in table.columns:
+        ensure_column_exists(df, column)
+        df[column] = table[column]
+
+
+def process_financial_table(df, financial_frames):
+    """整批計算所有股票的綜合損益表並一次寫入 DataFrame（與逐檔計算結果相同，見 tests/test_financial.py）"""
+    _assign_table(df, compute_financial_table(financial_frames, df.index))
+
+
+def process_eps_table(df, financial_frames):
+    """整批計算所有股票的 EPS 並一次寫入 DataFrame（與逐檔計算結果相同，見 tests/test_financial.py）"""
+    _assign_table(df, compute_eps_table(financial_frames, df.index))
@@ -0,0 +1,80 @@
+"""
+輸出指紋模組
+記錄每個輸出檔各工作表上次寫入的內容指紋（data/output_fingerprint.json），
+重新計算的月營收、綜合損益表、EPS 與上次相同時不再開啟與儲存活頁簿，只重寫有變動的工作表
+"""
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+
+import pandas as pd
+
+from config import DATA_DIR
+
+FINGERPRINT_PATH = os.path.join(DATA_DIR, 'output_fingerprint.json')
+
+
+def frame_fingerprint(df):
+    """計算 DataFrame 內容（欄名、型別與所有儲存格，含代號欄即輸入的股票清單與順序）的指紋"""
+    digest = hashlib.sha256()
+    digest.update(json.dumps([[str(column), str(dtype)] for column, dtype in df.dtypes.items()], ensure_ascii=False).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def _get_key(output_file):
+    return os.path.normcase(os.path.abspath(output_file))
+
+
+def _load(path):
+    """讀取指紋檔，不存在或損毀時回傳空 dict"""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        logging.warning(f"輸出指紋讀取失敗，將重新寫入所有工作表: {str(e)}")
+        return {}
+
+
+def get_changed_sheets(output_file, frames, path=None):
+    """比對 frames 與 output_file 上次寫入的指紋，回傳 (需重寫的工作表名稱, 本次的指紋)
+    
+    輸出檔不存在、工作表已被刪除或改名、或沒有上次的紀錄時視為有變動
+    """
+    from modules.xlsx_splice import read_sheet_names
+    
+    fingerprints = {sheet_name: frame_fingerprint(df) for sheet_name, df in frames.items()}
+    previous = _load(path or FINGERPRINT_PATH).get(_get_key(output_file), {}).get('sheets', {})
+    if not previous or not os.path.exists(output_file):
+        return list(frames), fingerprints
+    
+    try:
+        existing = set(read_sheet_names(output_file))
+    except Exception as e:
+        logging.warning(f"無法讀取輸出檔的工作表清單，將重新寫入所有工作表: {str(e)}")
+        return list(frames), fingerprints
+    
+    changed = [
+        sheet_name for sheet_name, fingerprint in fingerprints.items()
+        if sheet_name not in existing or previous.get(sheet_name) != fingerprint
+    ]
+    return changed, fingerprints
+
+
+def save_fingerprints(output_file, fingerprints, path=None):
+    """記錄 output_file 已寫入的工作表指紋（與其他輸出檔的紀錄合併）"""
+    path = path or FINGERPRINT_PATH
+    entries = _load(path)
+    entry = entries.setdefault(_get_key(output_file), {'sheets': {}})
+    entry['sheets'].update(fingerprints)
+    entry['updated_at'] = datetime.now().isoformat(timespec='seconds')
+    
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(entries, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
@@ -40,7 +40,9 @@ def clean_old_logs(days=None):
         return
     
     cutoff_time = datetime.now() - timedelta(days=days)
-    log_files = glob(os.path.join(LOGS_DIR, 'stock_processor_*.log'))
+    log_files = []
+    for pattern in ('stock_processor_*.log', 'run_summary_*.jsonl', 'profile_*.prof'):
+        log_files.extend(glob(os.path.join(LOGS_DIR, pattern)))
     
     deleted_count = 0
     for log_file in log_files:
@@ -0,0 +1,170 @@
+"""
+快取索引（manifest）模組
+記錄每檔股票各數據類型快取的最新期間、筆數與最後查詢 API 的時間，
+讓新鮮度檢查不需載入整份快取，並限制最新一期未公布時的重複查詢
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from config import CACHE_RETRY_HOURS, DATA_DIR
+
+MANIFEST_PATH = os.path.join(DATA_DIR, 'manifest.json')
+
+_lock = threading.Lock()
+_entries = None
+_changed = set()
+
+
+def _load():
+    """載入索引檔（整個程序只讀取一次）"""
+    global _entries
+    if _entries is None:
+        _entries = {}
+        if os.path.exists(MANIFEST_PATH):
+            try:
+                with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+                    _entries = json.load(f)
+            except Exception as e:
+                logging.warning(f"快取索引讀取失敗，將重新建立: {str(e)}")
+                _entries = {}
+    return _entries
+
+
+def get_latest_period(data_type, df):
+    """計算快取數據中的最新期間（營收為 YYYY-MM，財務為季末日期）"""
+    if df is None or df.empty:
+        return None
+    if data_type == 'revenue':
+        periods = df['revenue_year'].astype(int) * 100 + df['revenue_month'].astype(int)
+        latest = int(periods.max())
+        return f"{latest // 100}-{latest % 100:02d}"
+    if 'date' in df.columns:
+        return str(df['date'].max())
+    return None
+
+
+def get_entry(stock_id, data_type):
+    """取得指定股票與數據類型的索引紀錄，不存在時回傳 None"""
+    with _lock:
+        entry = _load().get(data_type, {}).get(str(stock_id))
+        return dict(entry) if entry else None
+
+
+def update_entry(stock_id, data_type, df, fetched_at=None, since=None):
+    """依快取數據更新索引紀錄
+    
+    fetched_at 為本次向 API 查詢的時間，since 為快取涵蓋的查詢起始日期，未提供時保留原紀錄
+    """
+    with _lock:
+        entries = _load().setdefault(data_type, {})
+        entry = entries.get(str(stock_id), {})
+        entry['latest'] = get_latest_period(data_type, df)
+        entry['rows'] = 0 if df is None else len(df)
+        if fetched_at is not None:
+            entry['fetched_at'] = fetched_at.isoformat(timespec='seconds')
+        else:
+            entry.setdefault('fetched_at', None)
+        if since is not None:
+            entry['since'] = since
+        entries[str(stock_id)] = entry
+        _changed.add((data_type, str(stock_id)))
+
+
+def mark_fetched(stock_id, data_type, fetched_at=None):
+    """記錄已向 API 查詢但沒有取得新數據（保留原本的最新期間與筆數）"""
+    if fetched_at is None:
+        fetched_at = datetime.now()
+    with _lock:
+        entries = _load().setdefault(data_type, {})
+        entry = entries.setdefault(str(stock_id), {'latest': None, 'rows': 0})
+        entry['fetched_at'] = fetched_at.isoformat(timespec='seconds')
+        _changed.add((data_type, str(stock_id)))
+
+
+def is_recently_fetched(stock_id, data_type, hours=None, now=None):
+    """檢查指定股票是否在 N 小時內已向 API 查詢過（N 預設取自 config.CACHE_RETRY_HOURS，now 預設為目前時間）"""
+    if hours is None:
+        hours = CACHE_RETRY_HOURS.get(data_type, 0)
+    if not hours:
+        return False
+    
+    entry = get_entry(stock_id, data_type)
+    if not entry or not entry.get('fetched_at'):
+        return False
+    fetched_at = datetime.fromisoformat(entry['fetched_at'])
+    return (now or datetime.now()) - fetched_at < timedelta(hours=hours)
+
+
+@contextmanager
+def _file_lock(path):
+    """跨程序的獨占檔案鎖（Windows 使用 msvcrt，其他平台使用 fcntl），等待直到取得鎖"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a+b') as f:
+        if os.name == 'nt':
+            import msvcrt
+            f.seek(0)
+            while True:
+                try:
+                    # LK_LOCK 約重試 10 秒後仍未取得時拋出 OSError，繼續等待
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def reload_manifest():
+    """寫回本程序的變更後捨棄記憶體中的索引，下次存取時重新讀取檔案（常駐服務每次處理請求前呼叫）"""
+    global _entries
+    save_manifest()
+    with _lock:
+        _entries = None
+
+
+def save_manifest():
+    """將本程序變更過的紀錄寫回磁碟（僅在有變更時寫入）
+    
+    寫入前重新讀取檔案並只覆蓋本程序變更的紀錄；讀取到取代檔案之間持有跨程序的檔案鎖（manifest.json.lock），
+    --batch 的子程序或常駐服務與單次執行同時寫回時不會互相蓋掉對方的更新
+    """
+    global _entries
+    with _lock:
+        if not _changed:
+            return
+        os.makedirs(DATA_DIR, exist_ok=True)
+        with _file_lock(f'{MANIFEST_PATH}.lock'):
+            merged = {}
+            if os.path.exists(MANIFEST_PATH):
+                try:
+                    with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+                        merged = json.load(f)
+                except Exception:
+                    merged = {}
+            for data_type, stock_id in _changed:
+                merged.setdefault(data_type, {})[stock_id] = _entries[data_type][stock_id]
+            
+            tmp_path = f'{MANIFEST_PATH}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(merged, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, MANIFEST_PATH)
+        _entries = merged
+        _changed.clear()
+
+
+atexit.register(save_manifest)
@@ -0,0 +1,188 @@
+"""
+執行效能統計模組
+記錄單次執行各階段耗時、每次 API 呼叫的延遲（依方法與股票代號）、快取命中次數與讀取量，
+執行結束時以一行 JSON 附加到日誌目錄的執行摘要檔（logs/run_summary_YYYYMMDD.jsonl）
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from config import LOGS_DIR, RUN_SUMMARY_FILENAME_FORMAT
+
+# 階段名稱與日誌中顯示的中文名稱
+STAGE_LABELS = {
+    'import': '載入模組',
+    'read_input': '讀取輸入',
+    'bulk': '批次下載',
+    'names': '股票名稱',
+    'price': '收盤價',
+    'fetch': '等待數據抓取',
+    'revenue': '營收計算',
+    'financial': '綜合損益表計算',
+    'eps': 'EPS計算',
+    'write': 'Excel輸出',
+}
+
+_lock = threading.Lock()
+_started_at = datetime.now()
+_started = time.perf_counter()
+_stages = {}
+_api = {}
+_tickers = {}
+_cache = {}
+
+
+def reset():
+    """清除所有統計並重新開始計時（每次執行開始時呼叫）"""
+    global _started_at, _started
+    with _lock:
+        _started_at = datetime.now()
+        _started = time.perf_counter()
+        _stages.clear()
+        _api.clear()
+        _tickers.clear()
+        _cache.clear()
+
+
+@contextmanager
+def stage(name):
+    """計時一個處理階段，同名階段多次執行時累加"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        with _lock:
+            _stages[name] = _stages.get(name, 0.0) + elapsed
+
+
+def record_api_call(method, stock_id, seconds, ok=True):
+    """記錄一次 API 呼叫（不含限速等待與重試退避）的延遲"""
+    with _lock:
+        entry = _api.setdefault(method, {'calls': 0, 'errors': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+        entry['calls'] += 1
+        entry['errors'] += 0 if ok else 1
+        entry['seconds'] += seconds
+        entry['max_seconds'] = max(entry['max_seconds'], seconds)
+        
+        # 全市場查詢沒有股票代號，只計入方法統計
+        if stock_id:
+            ticker = _tickers.setdefault(str(stock_id), {'calls': 0, 'seconds': 0.0})
+            ticker['calls'] += 1
+            ticker['seconds'] += seconds
+
+
+def record_cache(data_type, hit):
+    """記錄一次快取命中或未命中（未命中即需呼叫 API）"""
+    with _lock:
+        entry = _cache.setdefault(data_type, {'hit': 0, 'miss': 0, 'bytes_read': 0})
+        entry['hit' if hit else 'miss'] += 1
+
+
+def record_bytes_read(data_type, df):
+    """記錄從快取載入的數據量（DataFrame 佔用的位元組數）"""
+    if df is None:
+        return
+    size = int(df.memory_usage(index=False, deep=True).sum())
+    with _lock:
+        entry = _cache.setdefault(data_type, {'hit': 0, 'miss': 0, 'bytes_read': 0})
+        entry['bytes_read'] += size
+
+
+def get_summary(**extra):
+    """取得目前的統計摘要（dict），extra 為額外寫入的欄位"""
+    with _lock:
+        api_calls = sum(entry['calls'] for entry in _api.values())
+        summary = {
+            'started_at': _started_at.isoformat(timespec='seconds'),
+            'finished_at': datetime.now().isoformat(timespec='seconds'),
+            'total_seconds': round(time.perf_counter() - _started, 3),
+            **extra,
+            'stages': {name: round(seconds, 3) for name, seconds in _stages.items()},
+            'api': {
+                'calls': api_calls,
+                'errors': sum(entry['errors'] for entry in _api.values()),
+                'seconds': round(sum(entry['seconds'] for entry in _api.values()), 3),
+                'by_method': {
+                    method: {key: round(value, 3) if isinstance(value, float) else value for key, value in entry.items()}
+                    for method, entry in sorted(_api.items())
+                },
+            },
+            'cache': {data_type: dict(entry) for data_type, entry in sorted(_cache.items())},
+            'tickers': {
+                stock_id: {'calls': entry['calls'], 'seconds': round(entry['seconds'], 3)}
+                for stock_id, entry in _tickers.items()
+            },
+        }
+    return summary
+
+
+def log_summary(summary):
+    """將摘要中的階段耗時、API 延遲與快取命中輸出到文字日誌"""
+    logging.info(f"執行耗時: 共 {summary['total_seconds']:.1f} 秒")
+    for name, seconds in summary['stages'].items():
+        logging.info(f"  - {STAGE_LABELS.get(name, name)}: {seconds:.2f} 秒")
+    
+    api = summary['api']
+    if api['calls']:
+        logging.info(f"API 延遲: {api['calls']} 次共 {api['seconds']:.1f} 秒，平均 {api['seconds'] / api['calls']:.2f} 秒")
+        slowest = sorted(summary['tickers'].items(), key=lambda item: item[1]['seconds'], reverse=True)[:5]
+        if slowest:
+            logging.info("  最慢股票: " + "，".join(f"{stock_id} {entry['seconds']:.2f} 秒" for stock_id, entry in slowest))
+    
+    for data_type, entry in summary['cache'].items():
+        logging.info(f"快取 {data_type}: 命中 {entry['hit']} 次，未命中 {entry['miss']} 次，讀取 {entry['bytes_read'] / 1024:.0f} KB")
+
+
+def write_run_summary(**extra):
+    """將統計摘要附加到當日的執行摘要檔（JSON lines）並輸出到文字日誌，回傳摘要"""
+    summary = get_summary(**extra)
+    log_summary(summary)
+    
+    os.makedirs(LOGS_DIR, exist_ok=True)
+    path = os.path.join(LOGS_DIR, datetime.now().strftime(RUN_SUMMARY_FILENAME_FORMAT))
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(summary, ensure_ascii=False) + '\n')
+    logging.info(f"執行摘要已寫入: {path}")
+    return summary
+
+
+def run_profiled(output_path, func, *args, **kwargs):
+    """以 cProfile 執行 func（包含其間啟動的工作執行緒），將統計輸出到 output_path，回傳 func 的結果
+    
+    輸出檔可用 `python -m pstats <檔案>` 或 snakeviz 檢視
+    """
+    import cProfile
+    import pstats
+    import sys
+    
+    thread_profilers = []
+    
+    def profile_thread(*_):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12 起 cProfile 改以 sys.monitoring 實作，主執行緒的分析器已涵蓋所有執行緒
+            sys.setprofile(None)
+            return
+        thread_profilers.append(profiler)
+    
+    profiler = cProfile.Profile()
+    threading.setprofile(profile_thread)
+    profiler.enable()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        profiler.disable()
+        threading.setprofile(None)
+        stats = pstats.Stats(profiler)
+        for thread_profiler in thread_profilers:
+            stats.add(thread_profiler)
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        stats.dump_stats(output_path)
+        logging.info(f"效能分析已輸出: {output_path}")
@@ -0,0 +1,153 @@
+"""
+刷新規劃模組
+依台灣月營收與財報的法定公布期限，判斷每檔股票各數據類型現在向 API 查詢是否可能取得新數據：
+  月營收: 每月 10 日前公布上個月營收
+  財報: 第一季 5/15、第二季 8/14、第三季 11/14 前公布，年度財報於隔年 3/31 前公布
+最新一期已在快取中，或已過公布期限且期限後已查詢過時，下次公布期間開始前不再查詢 API
+（遲交的公司每 LATE_FILING_RETRY_DAYS 天再查詢一次）
+"""
+import logging
+from datetime import date, datetime, timedelta
+
+from config import (
+    API_REQUESTS_PER_HOUR, FINANCIAL_DEADLINES, LATE_FILING_RETRY_DAYS,
+    PUBLICATION_GRACE_DAYS, REFRESH_PLANNER, REVENUE_DEADLINE_DAY,
+)
+from modules.cache import has_latest_financial, has_latest_revenue
+from modules.manifest import get_entry, is_recently_fetched
+
+DATA_TYPE_LABELS = {
+    'revenue': '月營收',
+    'financial': '財報',
+}
+
+# 規劃結果的原因代碼與說明（日誌與 --plan 報表使用）
+PLAN_REASONS = {
+    'new': '尚無快取',
+    'window': '公布期間內',
+    'overdue': '已過公布期限，期限後尚未查詢',
+    'late': '已過公布期限，遲交公司定期重新查詢',
+    'latest': '快取已有最新一期',
+    'retry': '近期已查詢，最新一期尚未公布',
+    'closed': '已過公布期限，下次公布期間再查詢',
+}
+
+
+def _month_end(year, month):
+    """取得指定月份的最後一天"""
+    if month == 12:
+        return date(year, 12, 31)
+    return date(year, month + 1, 1) - timedelta(days=1)
+
+
+def get_revenue_window(today):
+    """取得月營收目前的公布期間，回傳 (最新一期 YYYY-MM, 公布期限, 下一期開始公布的日期)"""
+    first_day = today.replace(day=1)
+    last_month = first_day - timedelta(days=1)
+    next_month = _month_end(today.year, today.month) + timedelta(days=1)
+    return f"{last_month.year}-{last_month.month:02d}", first_day.replace(day=REVENUE_DEADLINE_DAY), next_month
+
+
+def get_financial_window(today):
+    """取得財報目前的公布期間，回傳 (最新一季季末日期, 公布期限, 下一季開始公布的日期)
+    
+    最新一季為已結束的上一季，與 has_latest_financial 的判斷相同
+    """
+    season_month = (today.month - 1) // 3 * 3
+    season_year = today.year
+    if season_month == 0:
+        season_month, season_year = 12, today.year - 1
+    season_end = _month_end(season_year, season_month)
+    
+    deadline_month, deadline_day = FINANCIAL_DEADLINES[season_month]
+    deadline_year = season_year + 1 if deadline_month < season_month else season_year
+    next_season = _month_end(today.year, (today.month - 1) // 3 * 3 + 3) + timedelta(days=1)
+    return season_end.isoformat(), date(deadline_year, deadline_month, deadline_day), next_season
+
+
+def get_publication_window(data_type, today=None):
+    """取得指定數據類型目前的公布期間，回傳 (最新一期, 公布期限, 下一期開始公布的日期)"""
+    today = today or date.today()
+    if data_type == 'revenue':
+        return get_revenue_window(today)
+    if data_type == 'financial':
+        return get_financial_window(today)
+    raise ValueError(f"未知的數據類型: {data_type}")
+
+
+def has_latest(stock_id, data_type):
+    """快取中是否已有最新一期數據"""
+    if data_type == 'revenue':
+        return has_latest_revenue(stock_id)
+    return has_latest_financial(stock_id)
+
+
+def plan_fetch(stock_id, data_type, now=None):
+    """判斷指定股票與數據類型是否需要向 API 查詢，回傳 (是否查詢, 原因代碼)
+    
+    原因代碼見 PLAN_REASONS；REFRESH_PLANNER 為 False 時只依最新一期與 CACHE_RETRY_HOURS 判斷
+    """
+    now = now or datetime.now()
+    if has_latest(stock_id, data_type):
+        return False, 'latest'
+    entry = get_entry(stock_id, data_type)
+    if entry is None or not (entry.get('rows') or entry.get('fetched_at')):
+        return True, 'new'
+    if is_recently_fetched(stock_id, data_type, now=now):
+        return False, 'retry'
+    if not REFRESH_PLANNER:
+        return True, 'window'
+    
+    _, deadline, _ = get_publication_window(data_type, now.date())
+    closes_at = datetime.combine(deadline + timedelta(days=PUBLICATION_GRACE_DAYS + 1), datetime.min.time())
+    if now < closes_at:
+        return True, 'window'
+    
+    # 已過公布期限：期限後查詢過仍沒有最新一期時，只定期重新查詢遲交的公司
+    fetched_at = datetime.fromisoformat(entry['fetched_at']) if entry.get('fetched_at') else None
+    if fetched_at is None or fetched_at < closes_at:
+        return True, 'overdue'
+    if LATE_FILING_RETRY_DAYS and now - fetched_at >= timedelta(days=LATE_FILING_RETRY_DAYS):
+        return True, 'late'
+    return False, 'closed'
+
+
+def build_plan(stock_ids, now=None):
+    """規劃所有股票各數據類型的查詢，回傳 {數據類型: {原因代碼: [股票代號]}}"""
+    plan = {}
+    for data_type in DATA_TYPE_LABELS:
+        reasons = plan.setdefault(data_type, {})
+        for stock_id in stock_ids:
+            _, reason = plan_fetch(stock_id, data_type, now)
+            reasons.setdefault(reason, []).append(stock_id)
+    return plan
+
+
+def count_fetches(plan):
+    """計算規劃中需向 API 查詢的次數"""
+    fetch_reasons = ('new', 'window', 'overdue', 'late')
+    return sum(len(reasons.get(reason, [])) for reasons in plan.values() for reason in fetch_reasons)
+
+
+def log_plan(stock_ids, now=None):
+    """輸出查詢規劃（不呼叫 API、不寫入 Excel），回傳需向 API 查詢的次數"""
+    now = now or datetime.now()
+    plan = build_plan(stock_ids, now)
+    
+    logging.info(f"刷新規劃（{now:%Y-%m-%d %H:%M}，共 {len(stock_ids)} 檔股票）")
+    for data_type, reasons in plan.items():
+        period, deadline, next_opens = get_publication_window(data_type, now.date())
+        logging.info(f"{DATA_TYPE_LABELS[data_type]}: 最新一期 {period}，公布期限 {deadline}，下一期 {next_opens} 起公布")
+        for reason, label in PLAN_REASONS.items():
+            stock_list = reasons.get(reason)
+            if stock_list:
+                preview = '、'.join(map(str, stock_list[:10])) + ('…' if len(stock_list) > 10 else '')
+                logging.info(f"  - {label}: {len(stock_list)} 檔（{preview}）")
+    
+    fetches = count_fetches(plan)
+    if fetches:
+        hours = fetches / API_REQUESTS_PER_HOUR if API_REQUESTS_PER_HOUR else 0
+        logging.info(f"預計查詢 API {fetches} 次（每小時額度 {API_REQUESTS_PER_HOUR} 次，約 {hours:.1f} 小時額度）")
+    else:
+        logging.info("沒有可能取得新數據的查詢，月營收與財報將全部使用快取")
+    return fetches
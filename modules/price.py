@@ -0,0 +1,186 @@
+"""
+收盤價處理模組
+一次取得整份觀察清單的最新交易日收盤價，並依交易日期快取：
+全市場數據標記 complete=True；逐檔抓取的收盤價標記 complete=False 與抓取日期 fetched_on，
+當天再次執行時只抓取快取中沒有的股票
+"""
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from config import DATA_DIR, MARKET_WIDE_CLOSES, MAX_WORKERS
+from modules import metrics
+
+PRICE_CACHE_DIR = os.path.join(DATA_DIR, 'price')
+
+# 全市場查詢被拒（方案不支援等非暫時性錯誤）後，本程序（含常駐服務的後續請求）不再嘗試
+_market_unavailable = False
+
+
+def get_price_snapshot_path(trading_date):
+    """取得指定交易日收盤價快取的路徑"""
+    os.makedirs(PRICE_CACHE_DIR, exist_ok=True)
+    return os.path.join(PRICE_CACHE_DIR, f'{trading_date}.json')
+
+
+def load_price_snapshot(trading_date):
+    """載入指定交易日的收盤價快取：{'complete': 是否為全市場數據, 'closes': {代號: 收盤價}, 'fetched_on': 逐檔抓取日期}"""
+    path = get_price_snapshot_path(trading_date)
+    if not os.path.exists(path):
+        return {'complete': False, 'closes': {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_price_snapshot(trading_date, snapshot):
+    """儲存指定交易日的收盤價快取（先寫入暫存檔再取代，並行的程序不會讀到寫到一半的檔案）"""
+    path = get_price_snapshot_path(trading_date)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(temp_path, path)
+
+
+def load_fallback_snapshot():
+    """取得今天逐檔抓取過的最新收盤價快取，回傳 (交易日, 快取)，沒有時回傳 (None, None)
+    
+    只看交易日最新的快取檔；其他日期抓取的收盤價可能已有更新的交易日，不沿用
+    """
+    names = sorted(name for name in os.listdir(PRICE_CACHE_DIR) if name.endswith('.json')) if os.path.isdir(PRICE_CACHE_DIR) else []
+    if not names:
+        return None, None
+    trading_date = names[-1][:-len('.json')]
+    try:
+        snapshot = load_price_snapshot(trading_date)
+    except Exception as e:
+        logging.warning(f"收盤價快取讀取失敗，將重新抓取: {trading_date} - {str(e)}")
+        return None, None
+    if snapshot.get('fetched_on') != datetime.now().strftime('%Y-%m-%d'):
+        return None, None
+    return trading_date, snapshot
+
+
+def get_recent_weekdays(days=10):
+    """取得最近 N 天內的平日日期（由新到舊）"""
+    today = datetime.now()
+    dates = []
+    for offset in range(days + 1):
+        date = today - timedelta(days=offset)
+        if date.weekday() < 5:
+            dates.append(date.strftime('%Y-%m-%d'))
+    return dates
+
+
+def fetch_market_closes(api, days=10):
+    """以全市場單日數據找出最新交易日，回傳 (交易日, {代號: 收盤價})，找不到時回傳 (None, {})"""
+    for trading_date in get_recent_weekdays(days):
+        snapshot = load_price_snapshot(trading_date)
+        if snapshot['complete']:
+            logging.info(f"  ✓ 快取: {trading_date} 全市場收盤價")
+            metrics.record_cache('price', hit=True)
+            return trading_date, snapshot['closes']
+        
+        logging.info(f"  ⟳ API: {trading_date} 全市場收盤價")
+        metrics.record_cache('price', hit=False)
+        daily_data = api.taiwan_stock_daily(start_date=trading_date, end_date=trading_date)
+        if daily_data is None or daily_data.empty:
+            continue
+        
+        snapshot['complete'] = True
+        snapshot['closes'].update(zip(daily_data['stock_id'].astype(str), daily_data['close'].astype(float)))
+        save_price_snapshot(trading_date, snapshot)
+        return trading_date, snapshot['closes']
+    return None, {}
+
+
+def fetch_stock_close(ctx, stock_id):
+    """逐檔取得單一股票的最新收盤價，回傳 (日期, 收盤價)，失敗時回傳 (None, None)"""
+    try:
+        daily_data = ctx.get_daily(stock_id)
+    except Exception as e:
+        logging.error(f"  錯誤: {stock_id} 收盤價取得失敗 - {str(e)}")
+        return None, None
+    
+    if daily_data is None or daily_data.empty:
+        logging.warning(f"  警告: {stock_id} 無法取得收盤價")
+        return None, None
+    
+    latest_data = daily_data.sort_values(by="date", ascending=False).head(1)
+    return latest_data.iloc[0]["date"], float(latest_data.iloc[0]["close"])
+
+
+def get_latest_closes(api, stock_ids, ctx):
+    """取得觀察清單的最新交易日收盤價，回傳 (交易日, {代號: 收盤價})
+    
+    MARKET_WIDE_CLOSES 時優先使用全市場單日數據（每個交易日只需一次 API 呼叫）；未使用、無法取得時，
+    或該日沒有成交的股票，改為逐檔抓取近期日線並取最後一筆收盤價。逐檔抓取的結果存入該交易日的快取，
+    當天再次執行時只抓取快取中沒有的股票
+    """
+    from modules.client import classify_error
+    global _market_unavailable
+    
+    stock_ids = [str(stock_id) for stock_id in stock_ids]
+    
+    trading_date, market_closes = None, {}
+    if MARKET_WIDE_CLOSES and not _market_unavailable:
+        try:
+            trading_date, market_closes = fetch_market_closes(api)
+        except Exception as e:
+            if classify_error(e) == 'permanent':
+                _market_unavailable = True
+            logging.warning(f"全市場收盤價取得失敗，改為逐檔抓取 - {str(e)}")
+    
+    # 沒有全市場數據時，沿用今天逐檔抓取過的收盤價
+    market_date, known_closes = trading_date, market_closes
+    if market_date is None:
+        trading_date, snapshot = load_fallback_snapshot()
+        if snapshot is not None:
+            known_closes = snapshot['closes']
+    
+    closes = {stock_id: known_closes[stock_id] for stock_id in stock_ids if stock_id in known_closes}
+    missing_ids = [stock_id for stock_id in stock_ids if stock_id not in closes]
+    if market_date is None and closes:
+        logging.info(f"  ✓ 快取: {trading_date} 逐檔收盤價 {len(closes)} 檔")
+        metrics.record_cache('price', hit=True)
+    if not missing_ids:
+        return trading_date, closes
+    
+    logging.info(f"逐檔抓取收盤價: {len(missing_ids)} 檔")
+    metrics.record_cache('price', hit=False)
+    workers = max(1, min(MAX_WORKERS, len(missing_ids)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(lambda stock_id: fetch_stock_close(ctx, stock_id), missing_ids))
+    
+    # 該日未成交的股票沿用其最後一筆收盤價
+    fetched = {stock_id: close for stock_id, (date, close) in zip(missing_ids, results) if date is not None}
+    if not fetched:
+        return trading_date, closes
+    closes.update(fetched)
+    
+    # 全市場數據的交易日為準；否則取快取與逐檔結果中最新的日期
+    if market_date is None:
+        trading_date = max([date for date, _ in results if date is not None] + ([trading_date] if trading_date else []))
+    
+    try:
+        snapshot = load_price_snapshot(trading_date)
+        if market_date is None:
+            # 今天稍早的逐檔結果一併存入（交易日更新時移到新的快取檔）
+            snapshot['closes'].update(known_closes)
+        snapshot['closes'].update(fetched)
+        snapshot['fetched_on'] = datetime.now().strftime('%Y-%m-%d')
+        save_price_snapshot(trading_date, snapshot)
+    except Exception as e:
+        logging.warning(f"收盤價快取儲存失敗: {trading_date} - {str(e)}")
+    return trading_date, closes
+
+
+def add_close_column(df, trading_date, closes):
+    """以交易日為欄位名稱加入收盤價欄位（所有股票對齊同一欄）"""
+    from modules.utils import ensure_column_exists
+    
+    if trading_date is None:
+        return
+    ensure_column_exists(df, trading_date)
+    df[trading_date] = [closes.get(str(stock_id)) for stock_id in df['代號']]
@@ -4,7 +4,11 @@
 import logging
 from datetime import datetime
 
-from modules.cache import has_latest_revenue, load_cache, save_cache
+from config import INCREMENTAL_FETCH
+from modules import metrics
+from modules.cache import get_incremental_start_date, has_latest_revenue, load_cache, merge_incremental, save_cache
+from modules.manifest import get_entry, mark_fetched
+from modules.planner import PLAN_REASONS, plan_fetch
 
 
 def get_stock_revenue_data(api, stock_id, start_date=None, use_cache=True):
@@ -14,6 +18,16 @@ def get_stock_revenue_data(api, stock_id, start_date=None, use_cache=True):
         cached_data = load_cache(stock_id, 'revenue')
         if cached_data is not None:
             logging.info(f"  ✓ 快取: {stock_id} 營收")
+            metrics.record_cache('revenue', hit=True)
+            return cached_data
+    
+    # 上個月營收尚未公布：近期已查詢過 API，或已過公布期限且期限後已查詢過時沿用現有快取（見 modules.planner）
+    fetch, reason = plan_fetch(stock_id, 'revenue') if use_cache else (True, None)
+    if not fetch:
+        cached_data = load_cache(stock_id, 'revenue')
+        if cached_data is not None or not get_entry(stock_id, 'revenue')['rows']:
+            logging.info(f"  ✓ 快取: {stock_id} 營收（{PLAN_REASONS[reason]}）")
+            metrics.record_cache('revenue', hit=True)
             return cached_data
     
     # 地端沒有上個月資料，從 API 抓取
@@ -21,29 +35,37 @@ def get_stock_revenue_data(api, stock_id, start_date=None, use_cache=True):
         two_years_ago = datetime.now().replace(year=datetime.now().year - 2)
         start_date = two_years_ago.strftime('%Y-%m-%d')
     
-    logging.info(f"  ⟳ API: {stock_id} 營收")
+    # 增量模式：只抓取最新快取期間之後的數據
+    cached_data = load_cache(stock_id, 'revenue') if use_cache and INCREMENTAL_FETCH else None
+    entry = get_entry(stock_id, 'revenue')
+    fetch_start_date = get_incremental_start_date(cached_data, start_date, since=entry.get('since') if entry else None)
+    incremental = fetch_start_date != start_date
+    
+    if incremental:
+        logging.info(f"  ⟳ API: {stock_id} 營收（增量: {fetch_start_date} 起）")
+    else:
+        logging.info(f"  ⟳ API: {stock_id} 營收")
+    metrics.record_cache('revenue', hit=False)
     data = api.taiwan_stock_month_revenue(
         stock_id=stock_id,
-        start_date=start_date,
+        start_date=fetch_start_date,
     )
     
-    # 儲存到快取
+    # 儲存到快取（沒有新數據時仍記錄查詢時間）
     if data is not None and not data.empty:
-        save_cache(stock_id, 'revenue', data)
+        if incremental:
+            data = merge_incremental(cached_data, data, 'revenue')
+            save_cache(stock_id, 'revenue', data)
+        else:
+            save_cache(stock_id, 'revenue', data, since=start_date)
+    else:
+        mark_fetched(stock_id, 'revenue')
+        if incremental:
+            data = cached_data
     
     return data
 
 
-def extract_revenue_by_year_month(revenue_data, target_year, target_month):
-    """從營收數據中提取指定年月的營收"""
-    for i in range(len(revenue_data) - 1, -1, -1):
-        revenue_year = int(revenue_data.iloc[i]['revenue_year'])
-        revenue_month = int(revenue_data.iloc[i]['revenue_month'])
-        if revenue_year == target_year and revenue_month == target_month:
-            return revenue_data.iloc[i]['revenue']
-    return None
-
-
 def get_previous_two_months():
     """取得上個月和上上個月的年份和月份（保留舊函數以維持相容性）"""
     result = get_previous_three_months()
@@ -82,113 +104,124 @@ def get_previous_three_months():
     return (last_month_year, last_month), (previous_month_year, previous_month), (previous_month_year2, previous_month2)
 
 
-def get_ytd_revenue_from_monthly(revenue_data):
-    """從月營收數據計算今年累積營收"""
-    current_year = datetime.now().year
-    ytd_revenue_data = revenue_data[revenue_data['revenue_year'] == current_year]
-    
-    if ytd_revenue_data.empty:
+def load_revenue_for_table(ctx, stock_id):
+    """抓取單一股票的營收數據供整批計算使用，無數據或失敗時回傳 None"""
+    try:
+        revenue_data = ctx.get_revenue(stock_id)
+    except Exception as e:
+        logging.error(f"  錯誤: {stock_id} 營收數據獲取失敗 - {str(e)}")
         return None
     
-    return ytd_revenue_data['revenue'].sum()
+    if revenue_data is None or revenue_data.empty:
+        logging.warning(f"  警告: {stock_id} 無營收數據")
+        return None
+    return revenue_data
 
 
-def get_ytd_revenue_yoy(revenue_data):
-    """計算今年累積營收YoY，根據實際有資料的月份進行比較"""
-    current_year = datetime.now().year
-    last_year = current_year - 1
-    
-    # 取得今年的營收數據
-    current_year_data = revenue_data[revenue_data['revenue_year'] == current_year]
-    
-    if current_year_data.empty:
-        return None, None
-    
-    # 找出今年最新有資料的月份
-    latest_month = current_year_data['revenue_month'].max()
-    
-    # 計算今年截至最新月份的累積營收
-    current_ytd_data = current_year_data[current_year_data['revenue_month'] <= latest_month]
-    current_ytd = current_ytd_data['revenue'].sum()
-    
-    # 計算去年同期（相同月份）的累積營收
-    last_year_data = revenue_data[
-        (revenue_data['revenue_year'] == last_year) &
-        (revenue_data['revenue_month'] <= latest_month)
+def build_revenue_panel(revenue_frames):
+    """將所有股票的月營收合併為單一長表（row, period, revenue_year, revenue_month, revenue）
+    
+    revenue_frames 為 {列索引: 營收 DataFrame 或 None}；保留原始筆數，累積營收加總同一年度的所有筆數
+    """
+    import pandas as pd
+    
+    frames = [
+        pd.DataFrame({
+            'row': row,
+            'revenue_year': revenue_data['revenue_year'].astype(int).values,
+            'revenue_month': revenue_data['revenue_month'].astype(int).values,
+            'revenue': revenue_data['revenue'].values,
+        })
+        for row, revenue_data in revenue_frames.items()
+        if revenue_data is not None and not revenue_data.empty
     ]
+    if not frames:
+        return pd.DataFrame(columns=['row', 'period', 'revenue_year', 'revenue_month', 'revenue'])
     
-    if last_year_data.empty:
-        return None, latest_month
-    
-    last_year_ytd = last_year_data['revenue'].sum()
-    
-    # 計算YoY
-    if last_year_ytd and last_year_ytd != 0:
-        yoy = round((current_ytd - last_year_ytd) / last_year_ytd * 100, 2)
-        return yoy, latest_month
-    
-    return None, latest_month
+    panel = pd.concat(frames, ignore_index=True)
+    panel.insert(1, 'period', panel['revenue_year'] * 100 + panel['revenue_month'])
+    return panel
 
 
-def process_revenue_data(api, df, idx, stock_id, last_month_year, last_month, previous_month_year, previous_month, previous_month_year2, previous_month2, yoy_year):
-    """處理單一股票的營收數據"""
-    from modules.utils import convert_to_million, ensure_column_exists
+def compute_revenue_table(revenue_frames, rows, last_month_year, last_month, previous_month_year, previous_month, previous_month_year2, previous_month2, yoy_year):
+    """以整批向量化運算計算所有股票的營收表欄位，回傳以 rows 為索引的 DataFrame"""
+    import pandas as pd
     
-    # 動態初始化所有營收相關欄位（與 financial/eps 模組保持一致）
     current_year = datetime.now().year
-    ensure_column_exists(df, f'{last_month}月營收(M)')
-    ensure_column_exists(df, f'{previous_month}月營收(M)')
-    ensure_column_exists(df, f'{previous_month2}月營收(M)')
-    ensure_column_exists(df, 'MoM(%)')
-    ensure_column_exists(df, 'YoY(%)')
-    ensure_column_exists(df, f'{str(current_year)[-2:]}年累積營收(M)')
-    ensure_column_exists(df, '累積營收YoY(%)')
-    
-    try:
-        revenue_data = get_stock_revenue_data(api, stock_id)
-        
-        if revenue_data is None or revenue_data.empty:
-            logging.warning(f"  警告: {stock_id} 無營收數據")
-            return
-    except Exception as e:
-        logging.error(f"  錯誤: {stock_id} 營收數據獲取失敗 - {str(e)}")
-        return
-    
-    revenue_current = extract_revenue_by_year_month(revenue_data, last_month_year, last_month)
-    revenue_previous = extract_revenue_by_year_month(revenue_data, previous_month_year, previous_month)
-    revenue_previous2 = extract_revenue_by_year_month(revenue_data, previous_month_year2, previous_month2)
-    revenue_yoy = extract_revenue_by_year_month(revenue_data, yoy_year, last_month)
-    
-    # 轉換為百萬單位
-    revenue_current_million = convert_to_million(revenue_current)
-    revenue_previous_million = convert_to_million(revenue_previous)
-    revenue_previous2_million = convert_to_million(revenue_previous2)
-    
-    # 計算 MoM (Month over Month)
-    if revenue_current and revenue_previous and revenue_previous != 0:
-        mom = round((revenue_current - revenue_previous) / revenue_previous * 100, 2)
-    else:
-        mom = None
-    
-    # 計算 YoY (Year over Year)
-    if revenue_current and revenue_yoy and revenue_yoy != 0:
-        yoy = round((revenue_current - revenue_yoy) / revenue_yoy * 100, 2)
-    else:
-        yoy = None
-    
-    # 計算今年累積營收
-    ytd_revenue = get_ytd_revenue_from_monthly(revenue_data)
-    ytd_revenue_million = convert_to_million(ytd_revenue)
+    columns = [
+        f'{last_month}月營收(M)',
+        f'{previous_month}月營收(M)',
+        f'{previous_month2}月營收(M)',
+        'MoM(%)',
+        'YoY(%)',
+        f'{str(current_year)[-2:]}年累積營收(M)',
+        '累積營收YoY(%)',
+    ]
     
-    # 計算累積營收YoY
-    ytd_yoy, ytd_month = get_ytd_revenue_yoy(revenue_data)
+    panel = build_revenue_panel(revenue_frames)
+    
+    # 股票 × 期間 的營收矩陣，一次取出四個目標月份；同一期間有多筆時取最後一筆
+    latest = panel.drop_duplicates(subset=['row', 'period'], keep='last')
+    wide = latest.pivot(index='row', columns='period', values='revenue').reindex(rows)
+    
+    def month_values(year, month):
+        period = year * 100 + month
+        if period in wide.columns:
+            return wide[period].astype(float)
+        return pd.Series(float('nan'), index=wide.index)
+    
+    revenue_current = month_values(last_month_year, last_month)
+    revenue_previous = month_values(previous_month_year, previous_month)
+    revenue_previous2 = month_values(previous_month_year2, previous_month2)
+    revenue_yoy = month_values(yoy_year, last_month)
+    
+    def is_truthy(values):
+        return values.notna() & (values != 0)
+    
+    def to_million(values):
+        return [round(value / 1000000) if valid else None for value, valid in zip(values, is_truthy(values))]
+    
+    def growth(current, base):
+        valid = is_truthy(current) & is_truthy(base)
+        result = ((current - base) / base * 100).round(2)
+        return [value if ok else None for value, ok in zip(result, valid)]
+    
+    # 今年累積營收與去年同期（以今年最新月份為止）
+    this_year = panel[panel['revenue_year'] == current_year]
+    ytd_revenue = this_year.groupby('row')['revenue'].sum().reindex(rows)
+    latest_month = this_year.groupby('row')['revenue_month'].max()
+    
+    last_year = panel[panel['revenue_year'] == current_year - 1]
+    last_year = last_year[last_year['revenue_month'] <= last_year['row'].map(latest_month)]
+    last_year_ytd = last_year.groupby('row')['revenue'].sum().reindex(rows)
+    
+    ytd_valid = ytd_revenue.notna() & last_year_ytd.notna() & (last_year_ytd != 0)
+    ytd_yoy = ((ytd_revenue - last_year_ytd) / last_year_ytd * 100).round(2)
+    
+    values = [
+        to_million(revenue_current),
+        to_million(revenue_previous),
+        to_million(revenue_previous2),
+        growth(revenue_current, revenue_previous),
+        growth(revenue_current, revenue_yoy),
+        to_million(ytd_revenue),
+        [value if ok else None for value, ok in zip(ytd_yoy, ytd_valid)],
+    ]
+    # 以 object 欄位保存，缺值維持 None
+    return pd.DataFrame(
+        {column: pd.Series(column_values, index=rows, dtype=object) for column, column_values in zip(columns, values)},
+        index=rows,
+    )
+
+
+def process_revenue_table(df, revenue_frames, last_month_year, last_month, previous_month_year, previous_month, previous_month_year2, previous_month2, yoy_year):
+    """整批計算所有股票的營收數據並一次寫入 DataFrame（與逐檔計算結果相同，見 tests/test_revenue.py）"""
+    from modules.utils import ensure_column_exists
     
-    # 更新 DataFrame
-    current_year = datetime.now().year
-    df.at[idx, f'{last_month}月營收(M)'] = revenue_current_million
-    df.at[idx, f'{previous_month}月營收(M)'] = revenue_previous_million
-    df.at[idx, f'{previous_month2}月營收(M)'] = revenue_previous2_million
-    df.at[idx, 'MoM(%)'] = mom
-    df.at[idx, 'YoY(%)'] = yoy
-    df.at[idx, f'{str(current_year)[-2:]}年累積營收(M)'] = ytd_revenue_million
-    df.at[idx, '累積營收YoY(%)'] = ytd_yoy
+    table = compute_revenue_table(
+        revenue_frames, df.index,
+        last_month_year, last_month, previous_month_year, previous_month, previous_month_year2, previous_month2, yoy_year,
+    )
+    for column in table.columns:
+        ensure_column_exists(df, column)
+        df[column] = table[column]
@@ -0,0 +1,178 @@
+"""
+常駐服務模組
+stock_processor.py --serve 啟動後常駐於本機，保留已載入的 pandas 與數據處理模組、API 用戶端（含限速狀態）、
+股票名稱對照表、快取索引與快取內容；Excel 巨集透過 stock_client.py 送出更新請求，
+第一次之後的更新不需重新啟動程式、載入模組與解析快取
+
+協定（只接受本機連線）：用戶端每個連線送出一行 JSON 請求，服務端逐行回傳 JSON，
+{"log": 訊息} 為處理進度，最後一行為結果 {"ok": true/false, ...}
+每個請求須附上 "token"（config.SERVER_TOKEN_PATH 中的存取權杖），權杖不符的請求一律拒絕
+  {"command": "process", "input_file": 路徑, "output_file": 路徑, "bulk": false, "output_mode": null, "resume": false, "force": false}
+  {"command": "ping"}
+  {"command": "shutdown"}
+"""
+import hmac
+import json
+import logging
+import os
+import socketserver
+import time
+
+from config import SERVER_HOST, SERVER_IDLE_MINUTES, SERVER_PORT
+from modules.cache import clear_memory_cache, enable_memory_cache, get_cache_signature
+from modules.client import create_api_client
+from modules.logger import setup_logging
+from modules.manifest import reload_manifest
+from stock_client import get_server_token
+
+# 檢查閒置時間的間隔秒數
+POLL_SECONDS = 60
+
+
+class ClientLogHandler(logging.Handler):
+    """處理請求期間將日誌逐行傳給用戶端顯示"""
+    
+    def __init__(self, send):
+        super().__init__()
+        self.send = send
+        self.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S'))
+    
+    def emit(self, record):
+        try:
+            self.send({'log': self.format(record)})
+        except OSError:
+            # 用戶端已關閉視窗時繼續處理，結果仍會寫入 Excel
+            pass
+
+
+class StockRequestHandler(socketserver.StreamRequestHandler):
+    """處理單一連線的請求（服務端一次只處理一個請求）"""
+    
+    def send(self, message):
+        self.wfile.write((json.dumps(message, ensure_ascii=False) + '\n').encode('utf-8'))
+    
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            # 用戶端只檢查服務是否執行中，未送出請求
+            return
+        try:
+            request = json.loads(line.decode('utf-8'))
+            command = request.get('command', 'process')
+        except (ValueError, AttributeError):
+            self.send({'ok': False, 'error': '無法解析的請求'})
+            return
+        
+        server = self.server
+        if not hmac.compare_digest(str(request.get('token', '')), server.token):
+            logging.warning("拒絕存取權杖不符的請求")
+            self.send({'ok': False, 'error': '存取權杖不符'})
+            return
+        server.last_active = time.monotonic()
+        if command == 'ping':
+            self.send({'ok': True, 'pid': os.getpid(), 'requests': server.requests})
+        elif command == 'shutdown':
+            logging.info("收到結束請求，常駐服務即將結束")
+            server.running = False
+            self.send({'ok': True})
+        elif command == 'process':
+            self.send(server.process(request, self.send))
+        else:
+            self.send({'ok': False, 'error': f'未知的指令: {command}'})
+        server.last_active = time.monotonic()
+
+
+class StockServer(socketserver.TCPServer):
+    """常駐服務：依序處理請求，共用同一個 API 用戶端"""
+    
+    # Windows 的 SO_REUSEADDR 允許多個程序綁定同一埠號，只在其他平台啟用
+    allow_reuse_address = os.name != 'nt'
+    
+    def __init__(self, address, process_func, api, token):
+        super().__init__(address, StockRequestHandler)
+        self.process_func = process_func
+        self.api = api
+        self.token = token
+        self.cache_signature = get_cache_signature()
+        self.requests = 0
+        self.running = True
+        self.last_active = time.monotonic()
+        self.timeout = POLL_SECONDS
+    
+    def process(self, request, send):
+        """執行一次處理請求，處理期間的日誌同時傳給用戶端，回傳結果 dict"""
+        self.requests += 1
+        input_file = request.get('input_file')
+        if not input_file or not os.path.exists(input_file):
+            return {'ok': False, 'error': f'找不到輸入檔案: {input_file}'}
+        
+        handler = ClientLogHandler(send)
+        logging.getLogger().addHandler(handler)
+        self.refresh_cache_state()
+        self.api.reset_stats()
+        start = time.perf_counter()
+        try:
+            self.process_func(
+                input_file=input_file,
+                output_file=request.get('output_file') or input_file,
+                bulk=bool(request.get('bulk')),
+                output_mode=request.get('output_mode'),
+                resume=bool(request.get('resume')),
+                force=bool(request.get('force')),
+                api=self.api,
+            )
+            return {'ok': True, 'seconds': round(time.perf_counter() - start, 3)}
+        except Exception as e:
+            logging.exception(f"處理失敗: {str(e)}")
+            return {'ok': False, 'error': str(e)}
+        finally:
+            logging.getLogger().removeHandler(handler)
+            self.cache_signature = get_cache_signature()
+    
+    def refresh_cache_state(self):
+        """其他程序（例如排程直接執行）可能已更新快取：重新讀取快取索引，快取檔案有變動時捨棄記憶體快取"""
+        reload_manifest()
+        signature = get_cache_signature()
+        if signature != self.cache_signature:
+            logging.info("快取已由其他程序更新，重新讀取快取檔案")
+            clear_memory_cache()
+            self.cache_signature = signature
+    
+    def idle_expired(self):
+        """是否已閒置超過 SERVER_IDLE_MINUTES 分鐘"""
+        return SERVER_IDLE_MINUTES > 0 and time.monotonic() - self.last_active > SERVER_IDLE_MINUTES * 60
+
+
+def serve(process_func, host=SERVER_HOST, port=SERVER_PORT):
+    """啟動常駐服務，直到收到結束請求或閒置逾時，回傳結束代碼
+    
+    process_func 為 stock_processor.process_stock（避免循環匯入由呼叫端傳入）
+    """
+    setup_logging()
+    
+    # 預先載入 pandas 與數據處理模組、建立 API 用戶端，第一個請求不需再等待
+    import modules.bulk
+    import modules.checkpoint
+    import modules.excel_writer
+    import modules.financial
+    import modules.price
+    import modules.revenue
+    api = create_api_client()
+    enable_memory_cache()
+    
+    try:
+        server = StockServer((host, port), process_func, api, get_server_token())
+    except OSError as e:
+        logging.error(f"常駐服務無法啟動（{host}:{port} 可能已有服務在執行）: {str(e)}")
+        return 1
+    
+    with server:
+        logging.info(f"常駐服務已啟動: {host}:{port}（PID {os.getpid()}）")
+        if SERVER_IDLE_MINUTES > 0:
+            logging.info(f"閒置 {SERVER_IDLE_MINUTES} 分鐘後自動結束")
+        while server.running:
+            server.handle_request()
+            if server.idle_expired():
+                logging.info("閒置逾時，常駐服務結束")
+                break
+    return 0
@@ -0,0 +1,141 @@
+"""
+股票名稱對照模組
+整個程序只載入一次 data/stock_info.json；對照表過期時於背景重新抓取，
+遇到對照表中沒有的股票代號時重新抓取並等待結果
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+
+from config import CACHE_RETRY_HOURS, DATA_DIR, STOCK_INFO_REFRESH_DAYS
+
+STOCK_INFO_PATH = os.path.join(DATA_DIR, 'stock_info.json')
+
+# 遇到未知代號時等待重新抓取的最長秒數
+REFRESH_WAIT_SECONDS = 60
+
+# 程序結束時等待背景更新完成的最長秒數（逾時則放棄本次更新，原對照表不受影響）
+EXIT_WAIT_SECONDS = 5
+
+_lock = threading.Lock()
+_names = None
+_fetched_at = None
+_refresh_thread = None
+_refresh_started_at = None
+
+
+def _load():
+    """載入對照表（整個程序只讀取一次）
+    
+    格式為 {"fetched_at": ISO 時間, "names": {代號: 名稱}}；舊版直接存放 {代號: 名稱}，視為已過期
+    """
+    global _names, _fetched_at
+    if _names is not None:
+        return
+    
+    _names = {}
+    if not os.path.exists(STOCK_INFO_PATH):
+        return
+    try:
+        with open(STOCK_INFO_PATH, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except Exception as e:
+        logging.warning(f"股票名稱對照表讀取失敗，將重新抓取: {str(e)}")
+        return
+    
+    if isinstance(data.get('names'), dict):
+        _names = data['names']
+        _fetched_at = datetime.fromisoformat(data['fetched_at']) if data.get('fetched_at') else None
+    else:
+        _names = data
+
+
+def _save(names, fetched_at):
+    """以精簡格式寫回磁碟
+    
+    先寫入本程序專用的暫存檔再取代，背景執行緒寫到一半時程序結束或多個程序同時更新，都不會留下不完整的對照表
+    """
+    os.makedirs(os.path.dirname(STOCK_INFO_PATH), exist_ok=True)
+    tmp_path = f'{STOCK_INFO_PATH}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'fetched_at': fetched_at.isoformat(timespec='seconds'), 'names': names}, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, STOCK_INFO_PATH)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def refresh_stock_names(api):
+    """向 API 重新抓取股票名稱對照表並寫回磁碟，失敗時保留原對照表"""
+    global _names, _fetched_at
+    try:
+        df = api.taiwan_stock_info()
+        names = dict(zip(df['stock_id'], df['stock_name']))
+    except Exception as e:
+        logging.warning(f"股票名稱對照表更新失敗: {str(e)}")
+        return
+    if not names:
+        return
+    
+    fetched_at = datetime.now()
+    with _lock:
+        _names = names
+        _fetched_at = fetched_at
+    _save(names, fetched_at)
+    logging.info(f"股票名稱對照表已更新: {len(names)} 檔")
+
+
+def _start_refresh(api):
+    """於背景執行緒重新抓取，回傳該執行緒
+    
+    同時只執行一個；抓取失敗後在 CACHE_RETRY_HOURS['stock_info'] 小時內不再重試
+    """
+    global _refresh_thread, _refresh_started_at
+    retry_after = timedelta(hours=CACHE_RETRY_HOURS.get('stock_info', 6))
+    if _refresh_thread is None or (not _refresh_thread.is_alive() and datetime.now() - _refresh_started_at >= retry_after):
+        _refresh_thread = threading.Thread(target=refresh_stock_names, args=(api,), daemon=True)
+        _refresh_started_at = datetime.now()
+        _refresh_thread.start()
+    return _refresh_thread
+
+
+def _wait_for_refresh(timeout=None):
+    """程序結束前等待進行中的背景更新（最多 EXIT_WAIT_SECONDS 秒），讓單次執行也能保存更新結果"""
+    thread = _refresh_thread
+    if thread is not None and thread.is_alive():
+        thread.join(EXIT_WAIT_SECONDS if timeout is None else timeout)
+
+
+atexit.register(_wait_for_refresh)
+
+
+def _fetched_within(hours):
+    """對照表是否在指定時數內抓取過"""
+    return _fetched_at is not None and datetime.now() - _fetched_at < timedelta(hours=hours)
+
+
+def get_stock_name_mapping(api, stock_ids=None):
+    """取得股票代號與名稱的對應字典
+    
+    沒有對照表時直接抓取；對照表超過 STOCK_INFO_REFRESH_DAYS 天時於背景更新，本次先使用現有對照表；
+    stock_ids 中有對照表沒有的代號時重新抓取並等待（CACHE_RETRY_HOURS['stock_info'] 小時內不重複）
+    """
+    with _lock:
+        _load()
+        missing = not _names
+        unknown = [str(stock_id) for stock_id in (stock_ids or []) if str(stock_id) not in _names]
+        stale = not _fetched_within(STOCK_INFO_REFRESH_DAYS * 24)
+        retry = unknown and not _fetched_within(CACHE_RETRY_HOURS.get('stock_info', 6))
+        thread = _start_refresh(api) if missing or retry or stale else None
+    
+    if thread is not None and (missing or retry):
+        if unknown and not missing:
+            logging.info(f"股票名稱對照表缺少 {len(unknown)} 檔（例如 {unknown[0]}），重新抓取")
+        thread.join(REFRESH_WAIT_SECONDS)
+    
+    with _lock:
+        return dict(_names)
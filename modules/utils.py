@@ -1,29 +1,38 @@
 """
 通用工具函數模組
 """
-import json
-import os
+import logging
 
-import pandas as pd
+from modules.stock_names import get_stock_name_mapping
 
-from config import DATA_DIR
 
-
-def get_stock_name_mapping(api):
-    """獲取股票代號與名稱的對應字典"""
-    stock_info_path = os.path.join(DATA_DIR, 'stock_info.json')
-    if os.path.exists(stock_info_path):
-        with open(stock_info_path, 'r', encoding='utf-8') as f:
-            stock_dict = json.load(f)
-        return stock_dict
+def read_stock_ids(input_file, column='代號'):
+    """以唯讀串流方式逐列讀取第一個工作表的股票代號欄位（只解析該欄，不載入其他欄位與整張表）
+    
+    第一列為標題列；空白儲存格略過，無法轉為數字的代號記錄警告後略過（串流讀取時已開始抓取前面的股票，
+    不中斷整批處理），公式欄位取上次計算的值
+    """
+    from openpyxl import load_workbook
     
-    df = api.taiwan_stock_info()
-    stock_dict = dict(zip(df['stock_id'], df['stock_name']))
-    # save to json
-    os.makedirs(DATA_DIR, exist_ok=True)
-    with open(stock_info_path, 'w', encoding='utf-8') as f:
-        json.dump(stock_dict, f, ensure_ascii=False, indent=4)
-    return stock_dict
+    workbook = load_workbook(input_file, read_only=True, data_only=True)
+    try:
+        worksheet = workbook.worksheets[0]
+        header = next(worksheet.iter_rows(min_row=1, max_row=1, values_only=True), ())
+        if column not in header:
+            raise KeyError(f"找不到欄位: {column}")
+        col_idx = header.index(column) + 1
+        
+        for row_idx, (value,) in enumerate(worksheet.iter_rows(min_row=2, min_col=col_idx, max_col=col_idx, values_only=True), start=2):
+            if value is None or str(value).strip() == '':
+                continue
+            try:
+                stock_id = int(float(value)) if isinstance(value, str) else int(value)
+            except (TypeError, ValueError, OverflowError):
+                logging.warning(f"第 {row_idx} 列的{column}無效，略過: {value!r}")
+                continue
+            yield stock_id
+    finally:
+        workbook.close()
 
 
 def add_stock_names(df, stock_dict):
@@ -34,7 +43,7 @@ def add_stock_names(df, stock_dict):
 
 def process_info_data(api, df):
     """處理股票資訊數據，加入名稱欄位"""
-    stock_dict = get_stock_name_mapping(api)
+    stock_dict = get_stock_name_mapping(api, stock_ids=df['代號'].tolist())
     df = add_stock_names(df, stock_dict)
     return df
 
@@ -48,17 +57,3 @@ def ensure_column_exists(df, column_name):
     """確保欄位存在，如果不存在則初始化"""
     if column_name not in df.columns:
         df[column_name] = None
-
-
-def format_percentage_columns(worksheet, df):
-    """格式化工作表中的百分比欄位"""
-    from openpyxl.utils import get_column_letter
-    
-    for col_idx, col_name in enumerate(df.columns, start=1):
-        if '(%)' in str(col_name):
-            col_letter = get_column_letter(col_idx)
-            for row in range(2, len(df) + 2):
-                cell = worksheet[f'{col_letter}{row}']
-                if cell.value is not None and isinstance(cell.value, (int, float)):
-                    cell.number_format = '0.00%'
-                    cell.value = cell.value / 100
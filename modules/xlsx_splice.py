@@ -0,0 +1,276 @@
+"""
+xlsx 工作表替換模組
+直接在 xlsx 壓縮檔中替換指定工作表的 XML，其他工作表與檔案內容以串流原樣複製，不需載入整個活頁簿
+"""
+import logging
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+from xml.sax.saxutils import escape, quoteattr
+
+from openpyxl.utils import get_column_letter
+
+from modules.excel_writer import get_percent_mask, to_cell_value
+
+MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+WORKSHEET_REL_TYPE = REL_NS + '/worksheet'
+CALC_CHAIN_REL_TYPE = REL_NS + '/calcChain'
+WORKSHEET_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml'
+
+# 內建數字格式 10 即為 0.00%
+PERCENT_XF = '<xf numFmtId="10" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+
+# 替換工作表時沿用原工作表的版面設定（凍結窗格、欄寬等），依 XML 規定的順序排列：
+# sheetPr 須在 dimension 之前，其餘在 dimension 與 sheetData 之間
+KEPT_SHEET_ELEMENTS = ['sheetPr', 'sheetViews', 'sheetFormatPr', 'cols']
+
+# Excel 不允許的控制字元
+ILLEGAL_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _attributes(tag):
+    """解析 XML 標籤的屬性（忽略命名空間前綴）"""
+    return {name.split(':')[-1]: value for name, value in re.findall(r'([\w:]+)="([^"]*)"', tag)}
+
+
+def _unescape(value):
+    """還原 XML 屬性中的實體字元"""
+    return value.replace('&lt;', '<').replace('&gt;', '>').replace('&quot;', '"').replace('&apos;', "'").replace('&amp;', '&')
+
+
+def _part_path(target):
+    """將 workbook.xml.rels 中的 Target 轉為壓縮檔內的路徑"""
+    if target.startswith('/'):
+        return target[1:]
+    return os.path.normpath(os.path.join('xl', target)).replace(os.sep, '/')
+
+
+def read_sheet_names(workbook_file):
+    """讀取 xlsx 的工作表名稱（只解析 workbook.xml，不載入活頁簿）"""
+    with zipfile.ZipFile(workbook_file) as archive:
+        workbook_xml = archive.read('xl/workbook.xml').decode('utf-8')
+    return [_unescape(_attributes(tag)['name']) for tag in re.findall(r'<sheet\b[^>]*>', workbook_xml)]
+
+
+def _read_sheet_head(archive, part, limit=1024 * 1024):
+    """讀取工作表 XML 在 <sheetData> 之前的部分（不載入儲存格數據）"""
+    head = b''
+    with archive.open(part) as stream:
+        while b'<sheetData' not in head and len(head) < limit:
+            chunk = stream.read(65536)
+            if not chunk:
+                break
+            head += chunk
+    return head.split(b'<sheetData')[0].decode('utf-8', errors='ignore')
+
+
+def _kept_elements(head):
+    """從原工作表取出需沿用的版面設定元素，回傳 {元素名稱: XML}"""
+    kept = {}
+    for name in KEPT_SHEET_ELEMENTS:
+        match = re.search(rf'<{name}\b[^>]*/>|<{name}\b[^>]*>.*?</{name}>', head, re.DOTALL)
+        if match:
+            kept[name] = match.group(0)
+    return kept
+
+
+def _ensure_percent_style(styles_xml):
+    """確保 styles.xml 有百分比格式的 cellXfs 項目，回傳 (styles.xml, 樣式索引)"""
+    match = re.search(r'(<cellXfs\b[^>]*>)(.*?)(</cellXfs>)', styles_xml, re.DOTALL)
+    if not match:
+        raise ValueError("styles.xml 缺少 cellXfs")
+    
+    xfs = re.findall(r'<xf\b[^>]*/>|<xf\b[^>]*>.*?</xf>', match.group(2), re.DOTALL)
+    if PERCENT_XF in xfs:
+        return styles_xml, xfs.index(PERCENT_XF)
+    
+    opening = re.sub(r'count="\d+"', f'count="{len(xfs) + 1}"', match.group(1))
+    replaced = opening + match.group(2) + PERCENT_XF + match.group(3)
+    return styles_xml[:match.start()] + replaced + styles_xml[match.end():], len(xfs)
+
+
+def _cell_xml(reference, value, percent_style):
+    """產生單一儲存格的 XML（文字以 inline string 寫入，不需更新 sharedStrings）"""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return f'<c r="{reference}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        style = f' s="{percent_style}"' if percent_style is not None else ''
+        # repr 為可還原的最短表示法，讀回的值與 DataFrame 中的值完全相同
+        number = repr(value) if isinstance(value, float) else str(value)
+        return f'<c r="{reference}"{style}><v>{number}</v></c>'
+    
+    text = ILLEGAL_XML_CHARS.sub('', str(value))
+    space = ' xml:space="preserve"' if text != text.strip() else ''
+    return f'<c r="{reference}" t="inlineStr"><is><t{space}>{escape(text)}</t></is></c>'
+
+
+def build_sheet_xml(df, percent_style, percent_rows=None, kept=None):
+    """將 DataFrame 轉為工作表 XML（含標題列），百分比儲存格除以 100 並套用 percent_style
+    
+    kept 為 _kept_elements 取出的版面設定元素，依 CT_Worksheet 規定的順序放回
+    """
+    kept = kept or {}
+    sheet_pr = kept.get('sheetPr', '')
+    layout = ''.join(kept.get(name, '') for name in KEPT_SHEET_ELEMENTS if name != 'sheetPr')
+    mask = get_percent_mask(df, percent_rows)
+    letters = [get_column_letter(col_idx) for col_idx in range(1, len(df.columns) + 1)]
+    last_cell = f'{letters[-1]}{len(df) + 1}' if letters else 'A1'
+    
+    rows = ['<row r="1">' + ''.join(
+        _cell_xml(f'{letter}1', to_cell_value(column), None) for letter, column in zip(letters, df.columns)
+    ) + '</row>']
+    
+    columns = [df[column].tolist() for column in df.columns]
+    masks = [mask[column].tolist() for column in df.columns]
+    for row_pos in range(len(df)):
+        row_number = row_pos + 2
+        cells = []
+        for letter, values, percents in zip(letters, columns, masks):
+            value = to_cell_value(values[row_pos])
+            if percents[row_pos] and isinstance(value, (int, float)) and not isinstance(value, bool):
+                cells.append(_cell_xml(f'{letter}{row_number}', value / 100, percent_style))
+            else:
+                cells.append(_cell_xml(f'{letter}{row_number}', value, None))
+        rows.append(f'<row r="{row_number}">' + ''.join(cells) + '</row>')
+    
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<worksheet xmlns="{MAIN_NS}" xmlns:r="{REL_NS}">'
+        f'{sheet_pr}<dimension ref="A1:{last_cell}"/>'
+        f'{layout}<sheetData>{"".join(rows)}</sheetData>'
+        '</worksheet>'
+    )
+
+
+def _add_sheets(workbook_xml, rels_xml, types_xml, new_sheets):
+    """於 workbook.xml、workbook.xml.rels、[Content_Types].xml 登錄新的工作表，回傳更新後的三份 XML
+    
+    new_sheets 為 [(工作表名稱, 壓縮檔內路徑)]
+    """
+    # 只使用根元素宣告的前綴（openpyxl 產生的檔案在每個 <sheet> 上各自宣告，新增的項目無法沿用）
+    root_tag = re.search(r'<workbook\b[^>]*>', workbook_xml).group(0)
+    rel_prefix = re.search(rf'xmlns:(\w+)="{re.escape(REL_NS)}"', root_tag)
+    if rel_prefix is None:
+        workbook_xml = workbook_xml.replace('<workbook ', f'<workbook xmlns:r="{REL_NS}" ', 1)
+        rel_prefix = 'r'
+    else:
+        rel_prefix = rel_prefix.group(1)
+    
+    rel_ids = [int(number) for number in re.findall(r'Id="rId(\d+)"', rels_xml)]
+    sheet_ids = [int(number) for number in re.findall(r'<sheet\b[^>]*\bsheetId="(\d+)"', workbook_xml)]
+    next_rel = max(rel_ids, default=0) + 1
+    next_sheet = max(sheet_ids, default=0) + 1
+    
+    sheet_entries, rel_entries, type_entries = [], [], []
+    for sheet_name, part in new_sheets:
+        rel_id = f'rId{next_rel}'
+        sheet_entries.append(f'<sheet name={quoteattr(sheet_name)} sheetId="{next_sheet}" {rel_prefix}:id="{rel_id}"/>')
+        rel_entries.append(f'<Relationship Id="{rel_id}" Type="{WORKSHEET_REL_TYPE}" Target="/{part}"/>')
+        type_entries.append(f'<Override PartName="/{part}" ContentType="{WORKSHEET_CONTENT_TYPE}"/>')
+        next_rel += 1
+        next_sheet += 1
+    
+    workbook_xml = workbook_xml.replace('</sheets>', ''.join(sheet_entries) + '</sheets>', 1)
+    rels_xml = rels_xml.replace('</Relationships>', ''.join(rel_entries) + '</Relationships>', 1)
+    types_xml = types_xml.replace('</Types>', ''.join(type_entries) + '</Types>', 1)
+    return workbook_xml, rels_xml, types_xml
+
+
+def _drop_calc_chain(rels_xml, types_xml, workbook_xml):
+    """移除計算鏈（替換後的工作表儲存格與原計算鏈不一致，Excel 開啟時會自行重建），並要求開啟時重新計算"""
+    rels_xml = re.sub(rf'<Relationship\b[^>]*Type="{re.escape(CALC_CHAIN_REL_TYPE)}"[^>]*/>', '', rels_xml)
+    types_xml = re.sub(r'<Override\b[^>]*PartName="/xl/calcChain.xml"[^>]*/>', '', types_xml)
+    if '<calcPr' in workbook_xml and 'fullCalcOnLoad' not in workbook_xml:
+        workbook_xml = workbook_xml.replace('<calcPr', '<calcPr fullCalcOnLoad="1"', 1)
+    return rels_xml, types_xml, workbook_xml
+
+
+def splice_sheets(workbook_file, frames, percent_rows=None):
+    """以 frames 替換 xlsx 中的同名工作表（不存在則新增），其他內容原樣複製
+    
+    frames 為 {工作表名稱: DataFrame}；被替換的工作表只保留版面設定（凍結窗格、欄寬等），
+    儲存格內容完全由 DataFrame 取代。先寫入暫存檔再取代原檔，失敗時原檔不受影響
+    """
+    percent_rows = percent_rows or {}
+    
+    with zipfile.ZipFile(workbook_file) as archive:
+        names = set(archive.namelist())
+        workbook_xml = archive.read('xl/workbook.xml').decode('utf-8')
+        rels_xml = archive.read('xl/_rels/workbook.xml.rels').decode('utf-8')
+        types_xml = archive.read('[Content_Types].xml').decode('utf-8')
+        styles_xml = archive.read('xl/styles.xml').decode('utf-8')
+        
+        # 工作表名稱 -> 壓縮檔內路徑
+        targets = {}
+        for tag in re.findall(r'<Relationship\b[^>]*>', rels_xml):
+            attributes = _attributes(tag)
+            targets[attributes.get('Id')] = (attributes.get('Type'), _part_path(attributes.get('Target', '')))
+        sheet_parts = {}
+        for tag in re.findall(r'<sheet\b[^>]*>', workbook_xml):
+            attributes = _attributes(tag)
+            rel_type, part = targets.get(attributes.get('id'), (None, None))
+            if rel_type == WORKSHEET_REL_TYPE:
+                sheet_parts[_unescape(attributes['name'])] = part
+        
+        styles_xml, percent_style = _ensure_percent_style(styles_xml)
+        
+        replacements = {'xl/styles.xml': styles_xml.encode('utf-8')}
+        new_sheets = []
+        sheet_number = len(names)
+        for sheet_name, df in frames.items():
+            part = sheet_parts.get(sheet_name)
+            kept = {}
+            if part in names:
+                kept = _kept_elements(_read_sheet_head(archive, part))
+            else:
+                while part is None or part in names:
+                    sheet_number += 1
+                    part = f'xl/worksheets/sheet{sheet_number}.xml'
+                names.add(part)
+                new_sheets.append((sheet_name, part))
+            replacements[part] = build_sheet_xml(df, percent_style, percent_rows.get(sheet_name), kept).encode('utf-8')
+        
+        if new_sheets:
+            workbook_xml, rels_xml, types_xml = _add_sheets(workbook_xml, rels_xml, types_xml, new_sheets)
+        rels_xml, types_xml, workbook_xml = _drop_calc_chain(rels_xml, types_xml, workbook_xml)
+        replacements['xl/workbook.xml'] = workbook_xml.encode('utf-8')
+        replacements['xl/_rels/workbook.xml.rels'] = rels_xml.encode('utf-8')
+        replacements['[Content_Types].xml'] = types_xml.encode('utf-8')
+        
+        directory = os.path.dirname(os.path.abspath(workbook_file))
+        fd, temp_path = tempfile.mkstemp(suffix='.xlsx', dir=directory)
+        os.close(fd)
+        try:
+            with zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_DEFLATED) as output:
+                for info in archive.infolist():
+                    if info.filename == 'xl/calcChain.xml':
+                        continue
+                    entry = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+                    entry.compress_type = zipfile.ZIP_DEFLATED
+                    entry.external_attr = info.external_attr
+                    if info.filename in replacements:
+                        output.writestr(entry, replacements.pop(info.filename))
+                        continue
+                    # 其他工作表與檔案以串流複製，不解析內容
+                    entry.file_size = info.file_size
+                    with archive.open(info) as source, output.open(entry, 'w', force_zip64=info.file_size > zipfile.ZIP64_LIMIT) as target:
+                        shutil.copyfileobj(source, target, 1024 * 1024)
+                for part, data in replacements.items():
+                    output.writestr(part, data, compress_type=zipfile.ZIP_DEFLATED)
+        except Exception:
+            os.remove(temp_path)
+            raise
+    
+    # 原檔關閉後再取代（Windows 無法取代開啟中的檔案）；原檔被 Excel 開啟時會失敗，原檔不受影響
+    try:
+        os.replace(temp_path, workbook_file)
+    except Exception:
+        os.remove(temp_path)
+        raise
+    
+    logging.debug(f"  已替換工作表: {', '.join(frames)}")
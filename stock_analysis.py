@@ -2,22 +2,29 @@
 單一股票分析 - 月營收年度比較
 """
 import logging
+import multiprocessing
 import os
+import re
 import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
-import pandas as pd
-from FinMind.data import DataLoader
-
-from config import BASE_DIR
+# pandas 與營收、財務、Excel 模組載入需數秒，於使用的函數中才載入，輸入提示與使用說明可立即顯示
+from config import BASE_DIR, BATCH_WORKERS
+from modules.client import create_api_client
 from modules.logger import setup_logging
-from modules.utils import get_stock_name_mapping
-from modules.revenue import get_stock_revenue_data
-from modules.financial import get_stock_financial_data, get_last_season_month, get_previous_season_month, get_season_date, extract_value_by_date
+from modules.manifest import save_manifest
+from modules.stock_names import get_stock_name_mapping
+from modules.utils import read_stock_ids
 
 
 def get_monthly_revenue_by_years(api, stock_id, years=3, use_cache=True):
     """取得指定股票近N年的月營收數據，整理成月份行格式，並新增MoM和YoY"""
+    import pandas as pd
+    from modules.revenue import get_stock_revenue_data
+    
     current_year = datetime.now().year
     
     # 計算起始年份
@@ -45,60 +52,39 @@ def get_monthly_revenue_by_years(api, stock_id, years=3, use_cache=True):
         logging.warning(f"查無 {stock_id} 的營收數據")
         return None
     
-    # 輔助函數：取得指定年月的營收
-    def get_revenue(year, month):
-        data = revenue_data[
-            (revenue_data['revenue_year'] == year) & 
-            (revenue_data['revenue_month'] == month)
-        ]
-        if not data.empty:
-            return data.iloc[0]['revenue']
-        return None
-    
-    # 建立結果 DataFrame（橫縱對調：月份為行，年度為列）
-    result_rows = []
+    # 以期間序號（年 × 12 + 月）為索引的營收序列，同一年月有多筆時取第一筆；
+    # 各年度欄位、上個月與去年同月都以期間位移一次取出，不需逐月篩選
+    periods = revenue_data['revenue_year'].astype(int) * 12 + revenue_data['revenue_month'].astype(int) - 1
+    revenue_by_period = revenue_data['revenue'].groupby(periods.values).first()
     
     # 從 12 月到 1 月倒序排列
-    for month in range(12, 0, -1):
-        row = {'月份': f'{month}月'}
-        
-        # 每個年度作為一個欄位（由新到舊）
-        for year in range(current_year, start_year - 1, -1):
-            revenue = get_revenue(year, month)
-            
-            if revenue is not None:
-                # 轉換為百萬單位
-                revenue_million = round(revenue / 1000000)
-                row[f'{year}年'] = revenue_million
-            else:
-                row[f'{year}年'] = None
-        
-        # 計算 MoM（Month-over-Month）- 與上個月比較
-        current_revenue = get_revenue(current_year, month)
-        prev_month = month - 1 if month > 1 else 12
-        prev_year = current_year if month > 1 else current_year - 1
-        prev_revenue = get_revenue(prev_year, prev_month)
-        
-        if current_revenue and prev_revenue and prev_revenue != 0:
-            mom = round((current_revenue - prev_revenue) / prev_revenue * 100, 2)
-            row['MoM(%)'] = mom
-        else:
-            row['MoM(%)'] = None
-        
-        # 計算 YoY（Year-over-Year）- 與去年同月比較
-        last_year_revenue = get_revenue(current_year - 1, month)
-        
-        if current_revenue and last_year_revenue and last_year_revenue != 0:
-            yoy = round((current_revenue - last_year_revenue) / last_year_revenue * 100, 2)
-            row['YoY(%)'] = yoy
-        else:
-            row['YoY(%)'] = None
-        
-        result_rows.append(row)
+    months = list(range(12, 0, -1))
+    
+    def revenue_at(year, offset=0):
+        """取得指定年度 12 月到 1 月（位移 offset 個月）的營收，無數據為 NaN"""
+        return revenue_by_period.reindex([year * 12 + month - 1 - offset for month in months]).astype(float).reset_index(drop=True)
+    
+    def growth(current, base):
+        """計算成長率（%），任一方無數據或為 0 時為 None"""
+        result = ((current - base) / base * 100).round(2)
+        valid = current.notna() & (current != 0) & base.notna() & (base != 0)
+        return [value if ok else None for value, ok in zip(result, valid)]
+    
+    # 建立結果表（橫縱對調：月份為行，年度為列）
+    table = {'月份': [f'{month}月' for month in months]}
+    
+    # 每個年度作為一個欄位（由新到舊），轉換為百萬單位
+    for year in range(current_year, start_year - 1, -1):
+        table[f'{year}年'] = [round(value / 1000000) if pd.notna(value) else None for value in revenue_at(year)]
+    
+    # 計算 MoM（與上個月比較）和 YoY（與去年同月比較）
+    current_revenue = revenue_at(current_year)
+    table['MoM(%)'] = growth(current_revenue, revenue_at(current_year, offset=1))
+    table['YoY(%)'] = growth(current_revenue, revenue_at(current_year, offset=12))
     
     # 建立 DataFrame（年份降序：新的年份在先，最後加上 MoM 和 YoY）
     columns = ['月份'] + [f'{y}年' for y in range(current_year, start_year - 1, -1)] + ['MoM(%)', 'YoY(%)']
-    df = pd.DataFrame(result_rows, columns=columns)
+    df = pd.DataFrame(table, columns=columns)
     
     return df
 
@@ -109,6 +95,9 @@ def get_financial_statement(api, stock_id, use_cache=True):
     橫向：上一季、上上季、上上上季、上上上上季、今年累計、去年總共
     縱向：營業收入、毛利率、營益率、稅前淨利率、淨利率、EPS
     """
+    import pandas as pd
+    from modules.financial import get_stock_financial_data, get_last_season_month, get_previous_season_month, get_season_date, extract_value_by_date, get_year_values, index_financial_data
+    
     # 取得財務數據
     if use_cache:
         logging.info(f"正在取得 {stock_id} 的財務數據（優先使用快取）...")
@@ -132,6 +121,9 @@ def get_financial_statement(api, stock_id, use_cache=True):
         logging.warning(f"查無 {stock_id} 的財務數據")
         return None
     
+    # 轉為日期 × 科目矩陣，以下所有查詢都直接查表
+    financial_data = index_financial_data(financial_data)
+    
     # 計算需要的季度
     current_year, q1_month = get_last_season_month()
     q2_year, q2_month = get_previous_season_month(current_year, q1_month)
@@ -157,21 +149,12 @@ def get_financial_statement(api, stock_id, use_cache=True):
     
     # 計算今年累計（加總今年所有已公布季度）並取得季度數量
     def get_ytd(data_type):
-        year = datetime.now().year
-        data = financial_data[
-            (financial_data['type'] == data_type) & 
-            (financial_data['date'].str.startswith(str(year)))
-        ]
-        return data['value'].sum() if not data.empty else None
+        data = get_year_values(financial_data, data_type, datetime.now().year)
+        return data.sum() if not data.empty else None
     
     def get_ytd_quarter_count():
         """計算今年已公布的季度數量"""
-        year = datetime.now().year
-        data = financial_data[
-            (financial_data['type'] == 'Revenue') & 
-            (financial_data['date'].str.startswith(str(year)))
-        ]
-        return len(data) if not data.empty else 0
+        return len(get_year_values(financial_data, 'Revenue', datetime.now().year))
     
     # 取得今年累計季度數
     ytd_quarters = get_ytd_quarter_count()
@@ -179,12 +162,8 @@ def get_financial_statement(api, stock_id, use_cache=True):
     
     # 計算去年總共（加總去年四個季度）
     def get_last_year_total(data_type):
-        year = datetime.now().year - 1
-        data = financial_data[
-            (financial_data['type'] == data_type) & 
-            (financial_data['date'].str.startswith(str(year)))
-        ]
-        return data['value'].sum() if not data.empty else None
+        data = get_year_values(financial_data, data_type, datetime.now().year - 1)
+        return data.sum() if not data.empty else None
     
     # 建立資料行
     rows = []
@@ -218,18 +197,15 @@ def get_financial_statement(api, stock_id, use_cache=True):
         """計算去年同期累計（與今年相同季度數）"""
         last_year = datetime.now().year - 1
         
-        # 取得去年數據
-        data = financial_data[
-            (financial_data['type'] == data_type) & 
-            (financial_data['date'].str.startswith(str(last_year)))
-        ]
+        # 取得去年數據（已依日期排序）
+        data = get_year_values(financial_data, data_type, last_year)
         
         if data.empty:
             return None
         
-        # 依日期排序並取前N季（N = 今年已公布季度數）
-        data = data.sort_values('date').head(ytd_quarters)
-        return data['value'].sum() if not data.empty else None
+        # 取前N季（N = 今年已公布季度數）
+        data = data.head(ytd_quarters)
+        return data.sum() if not data.empty else None
     
     revenue_last_year_ytd = get_last_year_ytd('Revenue')
     
@@ -345,13 +321,16 @@ def get_financial_statement(api, stock_id, use_cache=True):
     return df
 
 
-def analyze_stock(stock_id, output_file=None, use_cache=True):
-    """分析單一股票並輸出 Excel
+def analyze_stock(stock_id, output_file=None, use_cache=True, api=None, stock_dict=None, output_dir=None):
+    """分析單一股票並輸出 Excel，回傳輸出檔案路徑（無營收數據時回傳 None）
     
     Args:
         stock_id: 股票代號
         output_file: 輸出檔案名稱
         use_cache: True=優先使用本地快取, False=強制從API抓取
+        api: 共用的 API 用戶端（批次模式），未提供時自行建立
+        stock_dict: 共用的名稱對照表（批次模式），未提供時自行載入
+        output_dir: 未指定 output_file 時的輸出目錄
     """
     # 初始化 logging
     setup_logging()
@@ -360,10 +339,13 @@ def analyze_stock(stock_id, output_file=None, use_cache=True):
     logging.info(f"開始分析股票: {stock_id}")
     logging.info(f"資料來源: {'本地快取/API' if use_cache else '強制API'}")
     
-    api = DataLoader()
+    own_api = api is None
+    if own_api:
+        api = create_api_client()
     
     # 取得股票名稱
-    stock_dict = get_stock_name_mapping(api)
+    if stock_dict is None:
+        stock_dict = get_stock_name_mapping(api, stock_ids=[stock_id])
     stock_name = stock_dict.get(str(stock_id), "未知")
     logging.info(f"股票名稱: {stock_name}")
     
@@ -383,56 +365,19 @@ def analyze_stock(stock_id, output_file=None, use_cache=True):
     # 決定輸出檔案名稱
     if output_file is None:
         output_file = f"{stock_id}_{stock_name}_分析.xlsx"
+        if output_dir:
+            output_file = os.path.join(output_dir, output_file)
     
-    # 輸出到 Excel
+    # 輸出到 Excel（檔案已存在時保留其他工作表），百分比欄位與列於寫入時直接套用格式
+    from modules.excel_writer import write_excel
     try:
-        import os
-        
-        # 判斷檔案是否存在，決定寫入模式
-        file_exists = os.path.exists(output_file)
-        mode = 'a' if file_exists else 'w'
-        
-        writer_kwargs = {'engine': 'openpyxl', 'mode': mode}
-        if file_exists:
-            writer_kwargs['if_sheet_exists'] = 'overlay'
+        frames = {'月營收': df_revenue}
+        if df_financial is not None:
+            frames['綜合損益表'] = df_financial
         
-        with pd.ExcelWriter(output_file, **writer_kwargs) as writer:
-            df_revenue.to_excel(writer, sheet_name='月營收', index=False)
-            
-            # 格式化月營收的百分比欄位
-            ws_revenue = writer.sheets['月營收']
-            mom_col_idx = df_revenue.columns.get_loc('MoM(%)') + 1
-            yoy_col_idx = df_revenue.columns.get_loc('YoY(%)') + 1
-            
-            for row_idx in range(2, ws_revenue.max_row + 1):
-                # MoM 欄位
-                cell_mom = ws_revenue.cell(row=row_idx, column=mom_col_idx)
-                if cell_mom.value is not None and isinstance(cell_mom.value, (int, float)):
-                    cell_mom.number_format = '0.00%'
-                    cell_mom.value = cell_mom.value / 100
-                
-                # YoY 欄位
-                cell_yoy = ws_revenue.cell(row=row_idx, column=yoy_col_idx)
-                if cell_yoy.value is not None and isinstance(cell_yoy.value, (int, float)):
-                    cell_yoy.number_format = '0.00%'
-                    cell_yoy.value = cell_yoy.value / 100
-            
-            if df_financial is not None:
-                df_financial.to_excel(writer, sheet_name='綜合損益表', index=False)
-                
-                # 格式化百分比欄位
-                from modules.utils import format_percentage_columns
-                ws = writer.sheets['綜合損益表']
-                percentage_rows = ['毛利率(%)', '營益率(%)', '稅前淨利率(%)', '淨利率(%)', 'QoQ/YoY']
-                
-                for row_idx, row in enumerate(ws.iter_rows(min_row=2, max_row=ws.max_row, min_col=1, max_col=1), start=2):
-                    cell_value = row[0].value
-                    if cell_value in percentage_rows:
-                        for col_idx in range(2, ws.max_column + 1):
-                            cell = ws.cell(row=row_idx, column=col_idx)
-                            if cell.value is not None and isinstance(cell.value, (int, float)):
-                                cell.number_format = '0.00%'
-                                cell.value = cell.value / 100
+        write_excel(output_file, frames, percent_rows={
+            '綜合損益表': ['毛利率(%)', '營益率(%)', '稅前淨利率(%)', '淨利率(%)', 'QoQ/YoY'],
+        })
         
         logging.info(f"\n已輸出至: {output_file}")
         logging.info(f"  - 月營收: {len(df_revenue)} 個月份數據")
@@ -441,38 +386,172 @@ def analyze_stock(stock_id, output_file=None, use_cache=True):
     except Exception as e:
         logging.error(f"儲存檔案時發生錯誤: {str(e)}")
     
+    if own_api:
+        api.log_budget()
     logging.info("分析完成")
     logging.info("="*60 + "\n")
+    
+    return output_file
+
+
+# 批次模式工作程序共用的 API 用戶端與名稱對照表（每個程序初始化一次）
+_worker_api = None
+_worker_names = None
+
+
+def _init_batch_worker(stock_dict, share):
+    """批次模式工作程序初始化：建立 logging 與 API 用戶端（平分每小時額度），名稱對照表由主程序傳入"""
+    global _worker_api, _worker_names
+    setup_logging()
+    _worker_api = create_api_client(share=share)
+    _worker_names = stock_dict
+
+
+def _analyze_in_worker(stock_id, output_dir, use_cache):
+    """在工作程序中分析單一股票，回傳摘要資料列"""
+    start = time.perf_counter()
+    calls_before = _worker_api.stats['calls']
+    try:
+        output_file = analyze_stock(stock_id, use_cache=use_cache, api=_worker_api, stock_dict=_worker_names, output_dir=output_dir)
+        status = '完成' if output_file else '無營收數據'
+    except Exception as e:
+        logging.error(f"  錯誤: {stock_id} 分析失敗 - {str(e)}")
+        output_file, status = None, f'失敗: {str(e)}'
+    
+    # 工作程序結束時不會執行 atexit，每檔分析完即寫回快取索引
+    save_manifest()
+    
+    return {
+        '代號': stock_id,
+        '名稱': _worker_names.get(str(stock_id), '未知'),
+        '狀態': status,
+        '耗時(秒)': round(time.perf_counter() - start, 2),
+        'API次數': _worker_api.stats['calls'] - calls_before,
+        '輸出檔': output_file or '',
+    }
+
+
+def analyze_stocks(stock_ids, output_dir=None, use_cache=True, workers=None):
+    """批次分析多檔股票，以多個程序並行產生各股票的 Excel，回傳摘要 DataFrame
+    
+    各程序共用磁碟快取與主程序載入的名稱對照表，API 每小時額度由各程序平分
+    """
+    setup_logging()
+    
+    stock_ids = list(dict.fromkeys(str(stock_id) for stock_id in stock_ids))
+    workers = max(1, min(workers or BATCH_WORKERS, len(stock_ids)))
+    
+    logging.info("="*60)
+    logging.info(f"批次分析 {len(stock_ids)} 檔股票，{workers} 個程序")
+    
+    api = create_api_client()
+    stock_dict = get_stock_name_mapping(api, stock_ids=stock_ids)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker, initargs=(stock_dict, workers)) as executor:
+        futures = [executor.submit(_analyze_in_worker, stock_id, output_dir, use_cache) for stock_id in stock_ids]
+        rows = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+    
+    import pandas as pd
+    summary = pd.DataFrame(rows)
+    logging.info(f"\n批次分析摘要:\n{summary.to_string(index=False)}")
+    logging.info(
+        f"完成 {(summary['狀態'] == '完成').sum()}/{len(summary)} 檔，"
+        f"總耗時 {elapsed:.1f} 秒，單檔合計 {summary['耗時(秒)'].sum():.1f} 秒，API 呼叫 {summary['API次數'].sum()} 次"
+    )
+    logging.info("="*60 + "\n")
+    return summary
+
+
+def parse_batch_targets(args):
+    """解析批次模式的股票清單：參數可為股票代號（可用逗號分隔）或檔案
+    
+    .xlsx/.xlsm 讀取第一個工作表的「代號」欄；其他檔案（.txt、.csv）以空白、逗號或換行分隔，略過非數字開頭的標題
+    """
+    stock_ids = []
+    for arg in args:
+        if os.path.isfile(arg):
+            if arg.lower().endswith(('.xlsx', '.xlsm')):
+                stock_ids.extend(str(stock_id) for stock_id in read_stock_ids(arg))
+                continue
+            with open(arg, 'r', encoding='utf-8-sig') as f:
+                tokens = re.split(r'[\s,]+', f.read())
+        else:
+            tokens = arg.split(',')
+        stock_ids.extend(token.strip() for token in tokens if token.strip()[:1].isdigit())
+    return stock_ids
+
+
+def preload_modules():
+    """預先載入 pandas、FinMind 與數據處理模組（於背景執行緒執行，與等待使用者輸入同時進行）"""
+    import modules.excel_writer
+    import modules.financial
+    import modules.revenue
+    try:
+        import FinMind.data
+    except ImportError:
+        # 未安裝時由 create_api_client 回報
+        pass
+
+
+def get_option_value(option):
+    """取得命令列選項後面的值，沒有時回傳 None"""
+    if option in sys.argv:
+        index = sys.argv.index(option)
+        if index + 1 < len(sys.argv):
+            return sys.argv[index + 1]
+    return None
 
 
 def main():
     """主程式進入點"""
     try:
+        use_cache = '--no-cache' not in sys.argv
+        
+        # 批次模式：python stock_analysis.py --batch 2330 2317 清單.txt [--workers N] [-o 輸出目錄]
+        if '--batch' in sys.argv:
+            option_values = {get_option_value('-o'), get_option_value('--workers')}
+            targets = [arg for arg in sys.argv[1:] if not arg.startswith('-') and arg not in option_values]
+            stock_ids = parse_batch_targets(targets)
+            if not stock_ids:
+                print("請指定股票代號或清單檔案")
+                print("使用方式: python stock_analysis.py --batch <股票代號或檔案...> [--workers N] [-o 輸出目錄]")
+                return 1
+            
+            workers = get_option_value('--workers')
+            summary = analyze_stocks(stock_ids, output_dir=get_option_value('-o'), use_cache=use_cache, workers=int(workers) if workers else None)
+            return 0 if (summary['狀態'] == '完成').all() else 1
+        
+        # 等待輸入股票代號的同時在背景載入 pandas 等模組，輸入完成後等候載入結束再開始分析
+        preload = threading.Thread(target=preload_modules, daemon=True)
+        preload.start()
         stock_id = input("請輸入股票編號: ")
+        preload.join()
         if stock_id.strip() == "":
             print("請輸入有效的股票編號")
             print("使用方式: python stock_analysis.py <股票代號> [選項]")
             print("\n選項:")
             print("  --no-cache    強制從API抓取，不使用本地快取")
-            print("  -o <檔名>     指定輸出檔案名稱")
+            print("  -o <檔名>     指定輸出檔案名稱（批次模式為輸出目錄）")
+            print("  --batch <股票代號或檔案...>  批次分析多檔股票（檔案可為 .txt/.csv 清單或含「代號」欄的 .xlsx）")
+            print("  --workers N   批次模式同時分析的程序數（預設 config.BATCH_WORKERS）")
             print("\n範例:")
             print("  python stock_analysis.py")
             print("  python stock_analysis.py --no-cache")
             print("  python stock_analysis.py -o 台積電分析.xlsx")
+            print("  python stock_analysis.py --batch 2330 2317 2454 -o 分析")
+            print("  python stock_analysis.py --batch 清單.txt --workers 8")
             return 1
         
-        use_cache = '--no-cache' not in sys.argv
-        
         # 處理輸出檔名
-        output_file = None
-        if '-o' in sys.argv:
-            o_index = sys.argv.index('-o')
-            if o_index + 1 < len(sys.argv):
-                output_file = sys.argv[o_index + 1]
+        output_file = get_option_value('-o')
         
         analyze_stock(stock_id, output_file, use_cache=use_cache)
         return 0
-        
+    
     except Exception as e:
         print(f"程式執行失敗: {str(e)}")
         import traceback
@@ -481,4 +560,6 @@ def main():
 
 
 if __name__ == '__main__':
+    # 打包成 exe 後，批次模式的工作程序需要此呼叫才能正確啟動
+    multiprocessing.freeze_support()
     sys.exit(main())
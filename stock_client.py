@@ -0,0 +1,170 @@
+"""
+常駐服務用戶端（Excel 巨集呼叫）
+將更新請求送給 stock_processor.py --serve 常駐服務並顯示處理進度；服務未執行時先在背景啟動，
+無法啟動時改為直接執行 stock_processor（與不使用常駐服務相同）
+只使用標準函式庫，不載入 pandas，啟動後立即連線
+
+使用方式: python stock_client.py [輸入檔案] [輸出檔案] [--bulk] [--splice|--sidecar] [--resume] [--force]
+          python stock_client.py --status  顯示常駐服務狀態
+          python stock_client.py --stop    結束常駐服務（處理中的請求完成後結束）
+打包後以 `股票數據處理器.exe --client ...` 執行
+"""
+import json
+import os
+import secrets
+import socket
+import subprocess
+import sys
+import time
+
+from config import BASE_DIR, SERVER_HOST, SERVER_PORT, SERVER_START_TIMEOUT_SECONDS, SERVER_TOKEN_PATH
+
+
+def get_server_token(path=SERVER_TOKEN_PATH):
+    """讀取常駐服務的存取權杖，不存在時產生（只有本機使用者可讀取的檔案）"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        pass
+    
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    token = secrets.token_hex(32)
+    try:
+        # 同時啟動的服務與用戶端只有一方建立檔案，其餘讀取建立者的權杖
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(token)
+    return token
+
+
+def send_request(request, on_log=None, timeout=None):
+    """送出一個請求（自動附上存取權杖）並逐行讀取回應，進度訊息交給 on_log 處理，回傳最後的結果 dict
+    
+    timeout 為連線與等待每行回應的逾時秒數（None 為不限時間）；無法連線時拋出 OSError
+    """
+    request = dict(request, token=get_server_token())
+    with socket.create_connection((SERVER_HOST, SERVER_PORT), timeout=timeout) as sock:
+        sock.sendall((json.dumps(request, ensure_ascii=False) + '\n').encode('utf-8'))
+        with sock.makefile('r', encoding='utf-8') as stream:
+            for line in stream:
+                message = json.loads(line)
+                if 'log' not in message:
+                    return message
+                if on_log:
+                    on_log(message['log'])
+    raise ConnectionError("常駐服務未回傳結果即中斷連線")
+
+
+def is_running():
+    """常駐服務是否已在監聽（正在處理其他請求時也算，新的請求會排隊等候）"""
+    try:
+        socket.create_connection((SERVER_HOST, SERVER_PORT), timeout=1).close()
+        return True
+    except OSError:
+        return False
+
+
+def get_processor_command(args):
+    """取得執行 stock_processor 的命令（打包後為 exe 本身）"""
+    if getattr(sys, 'frozen', False):
+        return [sys.executable] + args
+    return [sys.executable, os.path.join(BASE_DIR, 'stock_processor.py')] + args
+
+
+def start_server():
+    """在背景啟動常駐服務並等待開始監聽，回傳是否成功"""
+    options = {}
+    if os.name == 'nt':
+        # 不附屬於目前的命令列視窗，巨集的視窗關閉後服務繼續執行
+        options['creationflags'] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        options['start_new_session'] = True
+    process = subprocess.Popen(
+        get_processor_command(['--serve']), cwd=BASE_DIR,
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, **options,
+    )
+    
+    deadline = time.monotonic() + SERVER_START_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        if is_running():
+            return True
+        # 服務程序已結束：可能另一個用戶端同時啟動了服務，再確認一次
+        if process.poll() is not None:
+            return is_running()
+        time.sleep(0.2)
+    return False
+
+
+def show_status():
+    """顯示常駐服務狀態"""
+    if not is_running():
+        print("常駐服務未執行")
+        return 1
+    status = send_request({'command': 'ping'}, timeout=5)
+    print(f"常駐服務執行中: {SERVER_HOST}:{SERVER_PORT}（PID {status['pid']}，已處理 {status['requests']} 個請求）")
+    return 0
+
+
+def stop_server():
+    """結束常駐服務"""
+    if not is_running():
+        print("常駐服務未執行")
+        return 0
+    send_request({'command': 'shutdown'})
+    print("常駐服務已結束")
+    return 0
+
+
+def main(args):
+    """用戶端進入點，args 與 stock_processor.py 的命令列參數相同"""
+    if '--stop' in args:
+        return stop_server()
+    if '--status' in args:
+        return show_status()
+    
+    options = [arg for arg in args if arg.startswith('--')]
+    paths = [arg for arg in args if not arg.startswith('--')]
+    input_file = os.path.abspath(paths[0] if len(paths) > 0 else os.path.join(BASE_DIR, 'target.xlsx'))
+    output_file = os.path.abspath(paths[1]) if len(paths) > 1 else input_file
+    
+    if not os.path.exists(input_file):
+        print(f"錯誤: 找不到輸入檔案: {input_file}")
+        input("按 Enter 鍵離開...")
+        return 1
+    
+    if not is_running():
+        print("常駐服務未執行，正在啟動（第一次需載入模組，約需數秒）...", flush=True)
+        if not start_server():
+            print("常駐服務無法啟動，改為直接執行", flush=True)
+            return subprocess.call(get_processor_command(args))
+    
+    request = {
+        'command': 'process',
+        'input_file': input_file,
+        'output_file': output_file,
+        'bulk': '--bulk' in options,
+        'output_mode': 'sidecar' if '--sidecar' in options else 'splice' if '--splice' in options else None,
+        'resume': '--resume' in options,
+        'force': '--force' in options,
+    }
+    try:
+        result = send_request(request, on_log=lambda message: print(message, flush=True))
+    except (OSError, ValueError) as e:
+        print(f"與常駐服務的連線中斷: {str(e)}")
+        input("按 Enter 鍵離開...")
+        return 1
+    
+    if not result.get('ok'):
+        print(f"程式執行失敗: {result.get('error')}")
+        input("按 Enter 鍵離開...")
+        return 1
+    print(f"完成（常駐服務處理 {result['seconds']:.1f} 秒）")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -5,50 +5,80 @@
 import logging
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-import pandas as pd
-from FinMind.data import DataLoader
-
 # 導入配置
-from config import BASE_DIR
+from config import BASE_DIR, LOGS_DIR, MAX_WORKERS, PROFILE_FILENAME_FORMAT, SKIP_UNCHANGED_SHEETS
 
-# 導入模組
+# 導入模組（pandas 與數據處理模組於 process_stock 輸出開始訊息後才載入）
+from modules import metrics
 from modules.logger import setup_logging, clean_old_logs
-from modules.utils import process_info_data, format_percentage_columns
-from modules.revenue import process_revenue_data, get_previous_three_months
-from modules.financial import process_financial_data, process_eps_data
+from modules.utils import process_info_data, read_stock_ids
+from modules.client import create_api_client
+from modules.context import StockDataContext
+from modules.manifest import save_manifest
 
 
 
+def process_single_stock(ctx, idx, stock_id, checkpoint=None):
+    """抓取單一股票的營收和財務數據（所有股票抓取完成後再整批計算），成功時寫入檢查點
+    
+    檢查點中已完成的股票數據已在快取中，同樣經由 load_*_for_table 載入（快取命中，不查詢 API）
+    """
+    from modules.financial import load_financial_for_table
+    from modules.revenue import load_revenue_for_table
+    
+    if checkpoint is not None and stock_id in checkpoint:
+        logging.info(f"[{idx+1}] 已完成（檢查點）: {stock_id}")
+        checkpoint.mark_reused()
+        return load_revenue_for_table(ctx, stock_id), load_financial_for_table(ctx, stock_id)
+    
+    logging.info(f"[{idx+1}] 處理中: {stock_id}")
+    
+    revenue_data = load_revenue_for_table(ctx, stock_id)
+    financial_data = load_financial_for_table(ctx, stock_id)
+    
+    if checkpoint is not None:
+        if ctx.failed('revenue', stock_id) or ctx.failed('financial', stock_id):
+            checkpoint.mark_failed()
+        else:
+            checkpoint.record(stock_id)
+    return revenue_data, financial_data
+
 
-def process_stock(input_file='target.xlsx', output_file=None, revenue_sheet='月營收', financial_sheet='綜合損益表', eps_sheet='EPS'):
-    """處理股票數據，營收、財務和 EPS 數據分別輸出到不同的 sheet"""
-    # 初始化 logging
+def process_stock(input_file='target.xlsx', output_file=None, revenue_sheet='月營收', financial_sheet='綜合損益表', eps_sheet='EPS', bulk=False, output_mode=None, resume=False, force=False, api=None):
+    """處理股票數據，營收、財務和 EPS 數據分別輸出到不同的 sheet
+    
+    bulk=True 時先以全市場批次下載更新快取，無法涵蓋的股票再逐檔抓取
+    output_mode 為 openpyxl、splice 或 sidecar，預設使用 config.OUTPUT_MODE
+    resume=True 時續用上次中斷執行的檢查點，已完成的股票不再抓取
+    force=True 時即使工作表內容與上次輸出相同也重新寫入（見 config.SKIP_UNCHANGED_SHEETS）
+    api 為共用的 API 用戶端（常駐服務），未提供時自行建立
+    """
+    # 初始化 logging，並重新開始記錄本次執行的各階段耗時與 API 統計
     setup_logging()
     clean_old_logs(days=7)
+    metrics.reset()
     
     logging.info("="*60)
     logging.info("開始處理股票數據")
     logging.info(f"輸入檔案: {input_file}")
     
-    api = DataLoader()
-    # api.login_by_token(api_token='token')
-    # api.login(user_id='user_id', password='password')
-
-    # 讀取第一個 sheet 取得股票代號
-    df_base = pd.read_excel(input_file, sheet_name=0)
-    df_base = df_base[['代號']].astype(int)
+    # 延遲載入：pandas 與數據處理模組載入需數秒（打包後的 exe 更久），先輸出開始訊息再載入
+    with metrics.stage('import'):
+        import pandas as pd
+        from modules.revenue import get_previous_three_months, process_revenue_table
+        from modules.financial import get_last_season_month, process_financial_table, process_eps_table
+        from modules.bulk import bulk_prefetch
+        from modules.checkpoint import open_checkpoint
+        from modules.price import add_close_column, get_latest_closes
+        from modules.excel_writer import get_output_path, write_output
+        from modules.fingerprint import get_changed_sheets, save_fingerprints
     
-    # 創建三個 DataFrame：營收、綜合損益表、EPS
-    df_revenue = df_base.copy()
-    df_financial = df_base.copy()
-    df_eps = df_base.copy()
-    
-    # 加入名稱欄位
-    df_revenue = process_info_data(api, df_revenue)
-    df_financial = process_info_data(api, df_financial)
-    df_eps = process_info_data(api, df_eps)
+    # 限速、自動重試的 API 用戶端（Token 於 config.API_TOKEN 設定）
+    if api is None:
+        api = create_api_client()
     
     # 使用輔助函數計算時間
     (last_month_year, last_month), (previous_month_year, previous_month), (previous_month_year2, previous_month2) = get_previous_three_months()
@@ -56,25 +86,78 @@ def process_stock(input_file='target.xlsx', output_file=None, revenue_sheet='月
     # 計算去年同期
     yoy_year = last_month_year - 1
     
-    total = len(df_base)
-    for idx, row in df_base.iterrows():
-        stock_id = row["代號"]
-        logging.info(f"[{idx+1}/{total}] 處理中: {stock_id}")
+    # 單次執行的數據上下文：每檔股票的營收、財務、日線數據只載入一次
+    ctx = StockDataContext(api)
+    
+    # 檢查點：每完成一檔即寫入磁碟，中斷後可用 --resume 略過已完成的股票（數據期間不同時不續用）
+    season_year, season_month = get_last_season_month()
+    checkpoint = open_checkpoint(input_file, {
+        'revenue': f"{last_month_year}-{last_month:02d}",
+        'financial': f"{season_year}-{season_month:02d}",
+    }, resume=resume)
+    
+    # 以執行緒池並行抓取數據：串流讀取第一個 sheet 的股票代號，每讀到一檔就送出抓取工作，
+    # 讀檔與抓取同時進行；結果依輸入順序收集
+    logging.info(f"並行處理: {MAX_WORKERS} 個執行緒")
+    with ThreadPoolExecutor(max_workers=max(1, MAX_WORKERS)) as executor:
+        ticker_source = read_stock_ids(input_file)
         
-        # 處理營收數據（寫入 df_revenue）
-        process_revenue_data(api, df_revenue, idx, stock_id, last_month_year, last_month, previous_month_year, previous_month, previous_month_year2, previous_month2, yoy_year)
+        # 批次模式：先讀完代號並一次下載整期全市場數據寫入快取，再開始逐檔抓取
+        if bulk:
+            with metrics.stage('read_input'):
+                ticker_source = list(ticker_source)
+            with metrics.stage('bulk'):
+                bulk_prefetch(api, [stock_id for stock_id in ticker_source if stock_id not in checkpoint])
         
-        # 處理綜合損益表數據（寫入 df_financial）
-        try:
-            process_financial_data(api, df_financial, idx, stock_id)
-        except Exception as e:
-            logging.error(f"  錯誤: {stock_id} 財務數據處理失敗 - {str(e)}")
+        stock_ids = []
+        futures = []
+        with metrics.stage('read_input'):
+            for idx, stock_id in enumerate(ticker_source):
+                stock_ids.append(stock_id)
+                futures.append(executor.submit(process_single_stock, ctx, idx, stock_id, checkpoint))
+        logging.info(f"共讀取 {len(stock_ids)} 檔股票")
         
-        # 處理 EPS 數據（寫入 df_eps）
-        try:
-            process_eps_data(api, df_eps, idx, stock_id)
-        except Exception as e:
-            logging.error(f"  錯誤: {stock_id} EPS 數據處理失敗 - {str(e)}")
+        df_base = pd.DataFrame({'代號': stock_ids})
+        
+        # 創建三個 DataFrame：營收、綜合損益表、EPS
+        df_revenue = df_base.copy()
+        df_financial = df_base.copy()
+        df_eps = df_base.copy()
+        
+        # 加入名稱欄位
+        with metrics.stage('names'):
+            df_revenue = process_info_data(api, df_revenue)
+            df_financial = process_info_data(api, df_financial)
+            df_eps = process_info_data(api, df_eps)
+        
+        # 整批取得最新交易日收盤價，寫入 EPS 表的同一個日期欄位
+        with metrics.stage('price'):
+            trading_date, closes = get_latest_closes(api, stock_ids, ctx)
+            add_close_column(df_eps, trading_date, closes)
+        
+        revenue_frames = {}
+        financial_frames = {}
+        with metrics.stage('fetch'):
+            for idx, future in enumerate(futures):
+                # 單檔股票失敗不中斷整批處理，該列留空（與逐檔處理時相同）
+                try:
+                    revenue_frames[idx], financial_frames[idx] = future.result()
+                except Exception as e:
+                    logging.error(f"  錯誤: {stock_ids[idx]} 數據處理失敗 - {str(e)}")
+                    revenue_frames[idx] = financial_frames[idx] = None
+                    checkpoint.mark_failed()
+    
+    # 整批計算所有股票的營收、綜合損益表和 EPS 欄位，各自一次寫入
+    with metrics.stage('revenue'):
+        process_revenue_table(df_revenue, revenue_frames, last_month_year, last_month, previous_month_year, previous_month, previous_month_year2, previous_month2, yoy_year)
+    with metrics.stage('financial'):
+        process_financial_table(df_financial, financial_frames)
+    with metrics.stage('eps'):
+        process_eps_table(df_eps, financial_frames)
+    
+    ctx.log_summary()
+    api.log_budget()
+    save_manifest()
     
     logging.info("\n處理完成！")
     logging.info(f"\n營收數據:\n{df_revenue.head()}")
@@ -85,25 +168,60 @@ def process_stock(input_file='target.xlsx', output_file=None, revenue_sheet='月
     if output_file is None:
         output_file = input_file
     
-    # 使用 openpyxl 保留原檔案的其他 sheet 和格式
+    frames = {
+        revenue_sheet: df_revenue,
+        financial_sheet: df_financial,
+        eps_sheet: df_eps,
+    }
+    
+    # 保留原檔案的其他 sheet，百分比欄位於寫入時直接套用格式（輸出模式見 config.OUTPUT_MODE）
+    written = False
+    changed, skipped = [], []
     try:
-        # 使用 ExcelWriter 將三個 DataFrame 分別寫入不同 sheet
-        with pd.ExcelWriter(output_file, engine='openpyxl', mode='a', if_sheet_exists='overlay') as writer:
-            df_revenue.to_excel(writer, sheet_name=revenue_sheet, index=False)
-            df_financial.to_excel(writer, sheet_name=financial_sheet, index=False)
-            df_eps.to_excel(writer, sheet_name=eps_sheet, index=False)
-            
-            # 格式化百分比欄位
-            format_percentage_columns(writer.sheets[revenue_sheet], df_revenue)
-            format_percentage_columns(writer.sheets[financial_sheet], df_financial)
+        # 與上次輸出的內容指紋比對，只重寫有變動的工作表（sidecar 每次重新產生整個檔案，有變動時全部寫入）；
+        # 輸出檔損毀、被鎖定等無法比對時全部寫入
+        try:
+            target_file = get_output_path(output_file, output_mode)
+            changed, fingerprints = get_changed_sheets(target_file, frames)
+        except Exception as e:
+            logging.warning(f"無法比對上次輸出的內容，將重新寫入所有工作表: {str(e)}")
+            target_file, changed, fingerprints = output_file, list(frames), None
+        if force or not SKIP_UNCHANGED_SHEETS or (changed and target_file != output_file):
+            changed = list(frames)
+        skipped = [sheet_name for sheet_name in frames if sheet_name not in changed]
         
-        logging.info(f"\n已更新並儲存至: {output_file}")
-        logging.info(f"  - 營收數據: {revenue_sheet}")
-        logging.info(f"  - 綜合損益表: {financial_sheet}")
-        logging.info(f"  - EPS數據: {eps_sheet}")
+        if changed:
+            with metrics.stage('write'):
+                output_file = write_output(output_file, {sheet_name: frames[sheet_name] for sheet_name in changed}, mode=output_mode)
+            if fingerprints is not None:
+                save_fingerprints(output_file, fingerprints)
+            
+            logging.info(f"\n已更新並儲存至: {output_file}")
+            for sheet_name in changed:
+                logging.info(f"  - 已更新: {sheet_name}")
+            for sheet_name in skipped:
+                logging.info(f"  - 內容未變動，略過: {sheet_name}")
+        else:
+            output_file = target_file
+            logging.info(f"\n所有工作表內容與上次輸出相同，略過寫入: {output_file}（可加上 --force 強制重寫）")
+        written = True
     except Exception as e:
         logging.error(f"\n儲存檔案時發生錯誤: {str(e)}")
     
+    # 全部股票抓取成功且已輸出時刪除檢查點，否則保留供 --resume 使用
+    checkpoint.close(completed=written)
+    
+    # 各階段耗時、API 延遲與快取命中附加到當日的執行摘要檔（JSON lines）
+    metrics.write_run_summary(
+        script='stock_processor',
+        input_file=input_file,
+        output_file=output_file,
+        stocks=len(stock_ids),
+        sheets={'written': changed if written else [], 'skipped': skipped},
+        checkpoint={'reused': checkpoint.reused, 'recorded': checkpoint.recorded, 'failed': checkpoint.failed},
+        rate_limit={key: round(api.stats[key], 3) for key in ('retries', 'throttled', 'failures', 'wait_seconds')},
+    )
+    
     logging.info("處理完成")
     logging.info("="*60 + "\n")
     
@@ -113,7 +231,31 @@ def process_stock(input_file='target.xlsx', output_file=None, revenue_sheet='月
 def main():
     """主程式進入點，增加錯誤處理"""
     try:
-        args = sys.argv[1:]
+        # 選項
+        #   --bulk     以全市場批次下載更新快取（需 FinMind 付費方案，失敗時自動改為逐檔抓取）
+        #   --splice   只替換活頁簿中的三個工作表，不載入其他工作表（適合大型活頁簿）
+        #   --sidecar  不修改原活頁簿，輸出到另一個檔案
+        #   --resume   續用上次中斷執行的檢查點，已完成的股票不再抓取
+        #   --force    即使工作表內容與上次輸出相同也重新寫入
+        #   --plan     只列出依公布時程規劃的 API 查詢（不呼叫 API、不寫入 Excel），沒有需要查詢的數據時結束代碼為 2
+        #   --profile  以 cProfile 執行，統計檔輸出到 logs/profile_YYYYMMDD_HHMMSS.prof
+        #   --serve    常駐服務模式：保留已載入的模組、API 用戶端與快取，處理 --client 送來的請求
+        #   --client   將請求送給常駐服務（未啟動時自動啟動），供 Excel 巨集呼叫；--status、--stop 顯示狀態、結束服務
+        options = [arg for arg in sys.argv[1:] if arg.startswith('--')]
+        args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+        
+        if '--serve' in options:
+            from modules.server import serve
+            return serve(process_stock)
+        if '--client' in options or '--stop' in options or '--status' in options:
+            import stock_client
+            return stock_client.main([arg for arg in sys.argv[1:] if arg != '--client'])
+        
+        bulk = '--bulk' in options
+        resume = '--resume' in options
+        force = '--force' in options
+        output_mode = 'sidecar' if '--sidecar' in options else 'splice' if '--splice' in options else None
+        
         input_file = args[0] if len(args) > 0 else os.path.join(BASE_DIR, 'target.xlsx')
         output_file = args[1] if len(args) > 1 else input_file
         
@@ -124,7 +266,16 @@ def main():
             input("按 Enter 鍵離開...")
             return 1
         
-        process_stock(input_file=input_file, output_file=output_file)
+        if '--plan' in options:
+            from modules.planner import log_plan
+            setup_logging()
+            return 0 if log_plan(list(read_stock_ids(input_file))) else 2
+        
+        if '--profile' in options:
+            profile_path = os.path.join(LOGS_DIR, datetime.now().strftime(PROFILE_FILENAME_FORMAT))
+            metrics.run_profiled(profile_path, process_stock, input_file=input_file, output_file=output_file, bulk=bulk, output_mode=output_mode, resume=resume, force=force)
+        else:
+            process_stock(input_file=input_file, output_file=output_file, bulk=bulk, output_mode=output_mode, resume=resume, force=force)
         return 0
     except Exception as e:
         print(f"程式執行失敗: {str(e)}")
@@ -1,7 +1,13 @@
 # -*- mode: python ; coding: utf-8 -*-
+import os
 
 block_cipher = None
 
+# 打包模式（build_exe.ps1 以環境變數 STOCK_BUILD_MODE 指定）
+#   onedir  （預設）輸出 dist\股票數據處理器\ 資料夾，exe 與 _internal\ 放在一起，啟動時直接載入
+#   onefile  單一 exe，每次啟動都要先把 Python 與所有套件解壓到暫存資料夾，啟動需多等數秒
+ONEFILE = os.environ.get('STOCK_BUILD_MODE', 'onedir') == 'onefile'
+
 a = Analysis(
     ['stock_processor.py'],
     pathex=[],
@@ -13,9 +19,24 @@ a = Analysis(
     hiddenimports=[
         'modules.logger',
         'modules.cache',
+        'modules.manifest',
+        'modules.context',
+        'modules.checkpoint',
+        'modules.client',
+        'modules.metrics',
+        'modules.planner',
+        'modules.server',
+        'modules.bulk',
+        'modules.price',
+        'modules.excel_writer',
+        'modules.fingerprint',
+        'modules.xlsx_splice',
         'modules.revenue',
         'modules.financial',
         'modules.utils',
+        'modules.stock_names',
+        'stock_client',
+        'FinMind.data',
     ],
     hookspath=[],
     hooksconfig={},
@@ -29,19 +50,11 @@ a = Analysis(
 
 pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
 
-exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.zipfiles,
-    a.datas,
-    [],
+exe_options = dict(
     name='股票數據處理器',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
-    upx_exclude=[],
     runtime_tmpdir=None,
     console=True,  # 保持命令列視窗，可以看到處理進度
     disable_windowed_traceback=False,
@@ -51,3 +64,36 @@ exe = EXE(
     entitlements_file=None,
     icon=None,  # 如果有圖示可以指定
 )
+
+if ONEFILE:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        a.binaries,
+        a.zipfiles,
+        a.datas,
+        [],
+        upx=True,
+        upx_exclude=[],
+        **exe_options,
+    )
+else:
+    # onedir 不使用 UPX：壓縮過的 DLL 每次載入都要先解壓，反而拖慢啟動
+    exe = EXE(
+        pyz,
+        a.scripts,
+        [],
+        exclude_binaries=True,
+        upx=False,
+        **exe_options,
+    )
+    coll = COLLECT(
+        exe,
+        a.binaries,
+        a.zipfiles,
+        a.datas,
+        strip=False,
+        upx=False,
+        upx_exclude=[],
+        name='股票數據處理器',
+    )
@@ -0,0 +1,7 @@
+"""
+測試共用設定：將專案根目錄加入匯入路徑（與 benchmarks 相同）
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
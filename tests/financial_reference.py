@@ -0,0 +1,130 @@
+"""
+逐檔綜合損益表與 EPS 計算（改為整批計算前的版本），僅作為 compute_financial_table、compute_eps_table 的對照基準
+"""
+from datetime import datetime
+
+import pandas as pd
+
+from modules.financial import (
+    extract_value_by_date, get_last_season_month, get_previous_season_month, get_quarter_name,
+    get_season_date, get_year_values, index_financial_data,
+)
+from modules.utils import convert_to_million, ensure_column_exists
+
+
+def get_last_two_season_data(financial_data, data_type):
+    """取得上一季和上上季的指定數據"""
+    target_year, last_season_month = get_last_season_month()
+    prev_year, prev_month = get_previous_season_month(target_year, last_season_month)
+    
+    value_last = extract_value_by_date(financial_data, data_type, get_season_date(target_year, last_season_month))
+    value_prev = extract_value_by_date(financial_data, data_type, get_season_date(prev_year, prev_month))
+    return value_last, get_quarter_name(target_year, last_season_month), value_prev, get_quarter_name(prev_year, prev_month)
+
+
+def get_last_three_season_data(financial_data, data_type):
+    """取得上一季、上上季和上上上季的指定數據"""
+    target_year, last_season_month = get_last_season_month()
+    prev_year, prev_month = get_previous_season_month(target_year, last_season_month)
+    prev2_year, prev2_month = get_previous_season_month(prev_year, prev_month)
+    
+    result = []
+    for year, month in ((target_year, last_season_month), (prev_year, prev_month), (prev2_year, prev2_month)):
+        result += [extract_value_by_date(financial_data, data_type, get_season_date(year, month)), get_quarter_name(year, month)]
+    return tuple(result)
+
+
+def calculate_gross_margin(financial_data):
+    """計算所有季度的毛利率"""
+    matrix = index_financial_data(financial_data)
+    if 'GrossProfit' not in matrix.columns or 'Revenue' not in matrix.columns:
+        return pd.DataFrame(columns=['date', 'gross_profit', 'revenue', 'gross_margin'])
+    
+    merged_data = matrix[['GrossProfit', 'Revenue']].dropna().rename(columns={'GrossProfit': 'gross_profit', 'Revenue': 'revenue'})
+    merged_data.columns.name = None
+    merged_data['gross_margin'] = (merged_data['gross_profit'] / merged_data['revenue'] * 100).round(2)
+    merged_data.insert(0, 'date', merged_data.index.strftime('%Y-%m-%d'))
+    return merged_data.reset_index(drop=True)
+
+
+def get_last_two_season_gross_margin(financial_data):
+    """取得上一季和上上季的毛利率"""
+    target_year, last_season_month = get_last_season_month()
+    prev_year, prev_month = get_previous_season_month(target_year, last_season_month)
+    
+    gross_margin_data = calculate_gross_margin(financial_data).set_index('date')['gross_margin']
+    gross_margin_last = gross_margin_data.get(get_season_date(target_year, last_season_month))
+    gross_margin_prev = gross_margin_data.get(get_season_date(prev_year, prev_month))
+    return gross_margin_last, get_quarter_name(target_year, last_season_month), gross_margin_prev, get_quarter_name(prev_year, prev_month)
+
+
+def get_ytd_revenue(financial_data):
+    """計算今年累積營收"""
+    revenue_data = get_year_values(financial_data, 'Revenue', datetime.now().year)
+    return None if revenue_data.empty else revenue_data.sum()
+
+
+def get_ytd_eps(financial_data):
+    """計算今年累積 EPS"""
+    eps_data = get_year_values(financial_data, 'EPS', datetime.now().year)
+    if eps_data.empty:
+        return None
+    ytd_eps = eps_data.sum()
+    return round(ytd_eps, 2) if ytd_eps else None
+
+
+def process_financial_data(df, idx, financial_data):
+    """處理單一股票的綜合損益表（季營收、毛利率、累積營收、去年整年數據）"""
+    if financial_data is None or financial_data.empty:
+        return
+    financial_data = index_financial_data(financial_data)
+    
+    season_revenue_last, sr_quarter_last, season_revenue_prev, sr_quarter_prev = get_last_two_season_data(financial_data, 'Revenue')
+    ensure_column_exists(df, f'{sr_quarter_last}季營收(M)')
+    ensure_column_exists(df, f'{sr_quarter_prev}季營收(M)')
+    df.at[idx, f'{sr_quarter_last}季營收(M)'] = convert_to_million(season_revenue_last)
+    df.at[idx, f'{sr_quarter_prev}季營收(M)'] = convert_to_million(season_revenue_prev)
+    
+    gross_margin_last, gm_quarter_last, gross_margin_prev, gm_quarter_prev = get_last_two_season_gross_margin(financial_data)
+    ensure_column_exists(df, f'{gm_quarter_last}毛利率(%)')
+    ensure_column_exists(df, f'{gm_quarter_prev}毛利率(%)')
+    df.at[idx, f'{gm_quarter_last}毛利率(%)'] = gross_margin_last
+    df.at[idx, f'{gm_quarter_prev}毛利率(%)'] = gross_margin_prev
+    
+    current_year = datetime.now().year
+    ensure_column_exists(df, f'{str(current_year)[-2:]}年累積營收(M)')
+    df.at[idx, f'{str(current_year)[-2:]}年累積營收(M)'] = convert_to_million(get_ytd_revenue(financial_data))
+    
+    last_year = current_year - 1
+    last_year_revenue_data = get_year_values(financial_data, 'Revenue', last_year)
+    if not last_year_revenue_data.empty:
+        ensure_column_exists(df, f'{str(last_year)[-2:]}年整年營收(M)')
+        df.at[idx, f'{str(last_year)[-2:]}年整年營收(M)'] = convert_to_million(last_year_revenue_data.sum())
+    
+    last_year_gross_profit_data = get_year_values(financial_data, 'GrossProfit', last_year)
+    if not last_year_revenue_data.empty and not last_year_gross_profit_data.empty:
+        last_year_total_revenue = last_year_revenue_data.sum()
+        if last_year_total_revenue and last_year_total_revenue != 0:
+            last_year_gross_margin = round((last_year_gross_profit_data.sum() / last_year_total_revenue) * 100, 2)
+            ensure_column_exists(df, f'{str(last_year)[-2:]}年整年毛利率(%)')
+            df.at[idx, f'{str(last_year)[-2:]}年整年毛利率(%)'] = last_year_gross_margin
+
+
+def process_eps_data(df, idx, financial_data):
+    """處理單一股票近三季 EPS 與今年累積 EPS"""
+    if financial_data is None or financial_data.empty:
+        return
+    financial_data = index_financial_data(financial_data)
+    
+    eps_last, quarter_last, eps_prev, quarter_prev, eps_prev2, quarter_prev2 = get_last_three_season_data(financial_data, 'EPS')
+    ytd_eps = get_ytd_eps(financial_data)
+    
+    current_year = datetime.now().year
+    ensure_column_exists(df, f'{quarter_last}EPS')
+    ensure_column_exists(df, f'{quarter_prev}EPS')
+    ensure_column_exists(df, f'{quarter_prev2}EPS')
+    ensure_column_exists(df, f'{str(current_year)[-2:]}年累積EPS')
+    df.at[idx, f'{quarter_last}EPS'] = eps_last
+    df.at[idx, f'{quarter_prev}EPS'] = eps_prev
+    df.at[idx, f'{quarter_prev2}EPS'] = eps_prev2
+    df.at[idx, f'{str(current_year)[-2:]}年累積EPS'] = ytd_eps
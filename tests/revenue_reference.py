@@ -0,0 +1,95 @@
+"""
+逐檔營收計算（改為整批計算前的版本），僅作為 compute_revenue_table 的對照基準
+"""
+from datetime import datetime
+
+from modules.utils import convert_to_million, ensure_column_exists
+
+
+def extract_revenue_by_year_month(revenue_data, target_year, target_month):
+    """從營收數據中提取指定年月的營收"""
+    for i in range(len(revenue_data) - 1, -1, -1):
+        revenue_year = int(revenue_data.iloc[i]['revenue_year'])
+        revenue_month = int(revenue_data.iloc[i]['revenue_month'])
+        if revenue_year == target_year and revenue_month == target_month:
+            return revenue_data.iloc[i]['revenue']
+    return None
+
+
+def get_ytd_revenue_from_monthly(revenue_data):
+    """從月營收數據計算今年累積營收"""
+    current_year = datetime.now().year
+    ytd_revenue_data = revenue_data[revenue_data['revenue_year'] == current_year]
+    
+    if ytd_revenue_data.empty:
+        return None
+    
+    return ytd_revenue_data['revenue'].sum()
+
+
+def get_ytd_revenue_yoy(revenue_data):
+    """計算今年累積營收YoY，根據實際有資料的月份進行比較"""
+    current_year = datetime.now().year
+    last_year = current_year - 1
+    
+    current_year_data = revenue_data[revenue_data['revenue_year'] == current_year]
+    if current_year_data.empty:
+        return None, None
+    
+    latest_month = current_year_data['revenue_month'].max()
+    current_ytd_data = current_year_data[current_year_data['revenue_month'] <= latest_month]
+    current_ytd = current_ytd_data['revenue'].sum()
+    
+    last_year_data = revenue_data[
+        (revenue_data['revenue_year'] == last_year) &
+        (revenue_data['revenue_month'] <= latest_month)
+    ]
+    if last_year_data.empty:
+        return None, latest_month
+    
+    last_year_ytd = last_year_data['revenue'].sum()
+    if last_year_ytd and last_year_ytd != 0:
+        yoy = round((current_ytd - last_year_ytd) / last_year_ytd * 100, 2)
+        return yoy, latest_month
+    
+    return None, latest_month
+
+
+def process_revenue_data(df, idx, revenue_data, last_month_year, last_month, previous_month_year, previous_month, previous_month_year2, previous_month2, yoy_year):
+    """處理單一股票的營收數據（revenue_data 為 None 或空表時只建立欄位）"""
+    current_year = datetime.now().year
+    ensure_column_exists(df, f'{last_month}月營收(M)')
+    ensure_column_exists(df, f'{previous_month}月營收(M)')
+    ensure_column_exists(df, f'{previous_month2}月營收(M)')
+    ensure_column_exists(df, 'MoM(%)')
+    ensure_column_exists(df, 'YoY(%)')
+    ensure_column_exists(df, f'{str(current_year)[-2:]}年累積營收(M)')
+    ensure_column_exists(df, '累積營收YoY(%)')
+    
+    if revenue_data is None or revenue_data.empty:
+        return
+    
+    revenue_current = extract_revenue_by_year_month(revenue_data, last_month_year, last_month)
+    revenue_previous = extract_revenue_by_year_month(revenue_data, previous_month_year, previous_month)
+    revenue_previous2 = extract_revenue_by_year_month(revenue_data, previous_month_year2, previous_month2)
+    revenue_yoy = extract_revenue_by_year_month(revenue_data, yoy_year, last_month)
+    
+    if revenue_current and revenue_previous and revenue_previous != 0:
+        mom = round((revenue_current - revenue_previous) / revenue_previous * 100, 2)
+    else:
+        mom = None
+    
+    if revenue_current and revenue_yoy and revenue_yoy != 0:
+        yoy = round((revenue_current - revenue_yoy) / revenue_yoy * 100, 2)
+    else:
+        yoy = None
+    
+    ytd_yoy, _ = get_ytd_revenue_yoy(revenue_data)
+    
+    df.at[idx, f'{last_month}月營收(M)'] = convert_to_million(revenue_current)
+    df.at[idx, f'{previous_month}月營收(M)'] = convert_to_million(revenue_previous)
+    df.at[idx, f'{previous_month2}月營收(M)'] = convert_to_million(revenue_previous2)
+    df.at[idx, 'MoM(%)'] = mom
+    df.at[idx, 'YoY(%)'] = yoy
+    df.at[idx, f'{str(current_year)[-2:]}年累積營收(M)'] = convert_to_million(get_ytd_revenue_from_monthly(revenue_data))
+    df.at[idx, '累積營收YoY(%)'] = ytd_yoy
@@ -0,0 +1,68 @@
+"""
+快取後端測試：JSON 與 SQLite 後端存入後載入的內容須相同，包含沒有任何欄位的空 DataFrame
+"""
+import pandas as pd
+import pytest
+
+from modules.cache import JsonCacheBackend, SqliteCacheBackend
+
+BACKENDS = [JsonCacheBackend, SqliteCacheBackend]
+
+
+def _revenue_frame():
+    return pd.DataFrame({
+        'date': ['2024-01-01', '2024-02-01', '2024-03-01'],
+        'stock_id': ['2330', '2330', '2330'],
+        'revenue': [215785127000, 181648270000, 195211021000],
+        'revenue_month': [12, 1, 2],
+        'growth': [0.25, None, -3.5],
+    })
+
+
+@pytest.mark.parametrize('backend_class', BACKENDS)
+def test_round_trip(tmp_path, backend_class):
+    backend = backend_class(data_dir=str(tmp_path))
+    df = _revenue_frame()
+    backend.save('2330', 'revenue', df)
+    
+    loaded = backend.load('2330', 'revenue')
+    pd.testing.assert_frame_equal(loaded, df, check_dtype=False)
+    assert backend.load('2317', 'revenue') is None
+    assert backend.data_types() == ['revenue']
+    assert backend.stock_ids('revenue') == ['2330']
+
+
+@pytest.mark.parametrize('backend_class', BACKENDS)
+def test_save_empty_frame_without_columns(tmp_path, backend_class):
+    backend = backend_class(data_dir=str(tmp_path))
+    backend.save('2330', 'revenue', pd.DataFrame())
+    
+    loaded = backend.load('2330', 'revenue')
+    assert loaded is not None and loaded.empty and len(loaded.columns) == 0
+    assert backend.stock_ids('revenue') == ['2330']
+
+
+@pytest.mark.parametrize('backend_class', BACKENDS)
+def test_save_empty_frame_replaces_existing_rows(tmp_path, backend_class):
+    backend = backend_class(data_dir=str(tmp_path))
+    backend.save('2330', 'revenue', _revenue_frame())
+    backend.save('1101', 'revenue', _revenue_frame())
+    backend.save('2330', 'revenue', pd.DataFrame())
+    
+    assert backend.load('2330', 'revenue').empty
+    assert len(backend.load('1101', 'revenue')) == 3
+    
+    # 空 DataFrame 之後再存入數據
+    backend.save('2330', 'revenue', _revenue_frame())
+    assert len(backend.load('2330', 'revenue')) == 3
+
+
+def test_sqlite_adds_new_columns(tmp_path):
+    backend = SqliteCacheBackend(data_dir=str(tmp_path))
+    backend.save('2330', 'revenue', _revenue_frame())
+    
+    extended = _revenue_frame().assign(note=['a', 'b', None])
+    backend.save('1101', 'revenue', extended)
+    
+    pd.testing.assert_frame_equal(backend.load('1101', 'revenue'), extended, check_dtype=False)
+    assert list(backend.load('2330', 'revenue').columns) == list(_revenue_frame().columns)
@@ -0,0 +1,71 @@
+"""
+檢查點測試：只記錄已完成的股票代號，依輸入檔分開儲存，--resume 時續用相同期間的檢查點
+"""
+import json
+import os
+
+import pytest
+
+from modules import checkpoint
+from modules.checkpoint import get_checkpoint_path, open_checkpoint
+
+PERIOD = {'revenue': '2024-05', 'financial': '2024-03'}
+
+
+@pytest.fixture(autouse=True)
+def checkpoint_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(checkpoint, 'CHECKPOINT_DIR', str(tmp_path / 'checkpoints'))
+
+
+def test_journal_records_only_stock_ids(tmp_path):
+    journal = open_checkpoint(str(tmp_path / 'a.xlsx'), PERIOD)
+    journal.record(2330)
+    journal.record('2317')
+    journal.close(completed=False)
+    
+    with open(journal.path, 'r', encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+    assert records[0]['period'] == PERIOD
+    assert records[1:] == [{'stock_id': '2330', 'status': 'done'}, {'stock_id': '2317', 'status': 'done'}]
+
+
+def test_resume_skips_completed_stocks(tmp_path):
+    input_file = str(tmp_path / 'a.xlsx')
+    journal = open_checkpoint(input_file, PERIOD)
+    journal.record('2330')
+    journal.mark_failed()
+    journal.close(completed=True)
+    
+    resumed = open_checkpoint(input_file, PERIOD, resume=True)
+    assert 2330 in resumed and '2330' in resumed
+    assert '2317' not in resumed
+    resumed.record('2317')
+    resumed.close(completed=True)
+    assert not os.path.exists(resumed.path)
+
+
+def test_changed_period_starts_over(tmp_path):
+    input_file = str(tmp_path / 'a.xlsx')
+    journal = open_checkpoint(input_file, PERIOD)
+    journal.record('2330')
+    journal.close(completed=False)
+    
+    resumed = open_checkpoint(input_file, dict(PERIOD, revenue='2024-06'), resume=True)
+    assert '2330' not in resumed
+    resumed.close(completed=False)
+
+
+def test_checkpoints_are_kept_per_input_file(tmp_path):
+    first, second = str(tmp_path / 'a.xlsx'), str(tmp_path / 'b.xlsx')
+    assert get_checkpoint_path(first) != get_checkpoint_path(second)
+    
+    journal = open_checkpoint(first, PERIOD)
+    journal.record('2330')
+    journal.close(completed=False)
+    
+    # 另一個活頁簿的執行不會覆蓋第一個活頁簿的檢查點
+    other = open_checkpoint(second, PERIOD)
+    other.close(completed=False)
+    resumed = open_checkpoint(first, PERIOD, resume=True)
+    assert '2330' in resumed
+    resumed.close(completed=False)
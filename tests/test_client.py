@@ -0,0 +1,169 @@
+"""
+限速 API 用戶端測試：以假 DataLoader 與假時鐘驗證限速、退避、錯誤分類與用量統計，不需連線
+"""
+import pytest
+import requests
+
+from modules import client as client_module
+from modules.client import RateLimitedClient, TokenBucket, classify_error
+
+
+class FakeClock:
+    """取代 modules.client 中的 time 模組，sleep 只推進時間"""
+    
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+    
+    def monotonic(self):
+        return self.now
+    
+    def perf_counter(self):
+        return self.now
+    
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class StubDataLoader:
+    """依序回傳或拋出預先設定結果的假 DataLoader"""
+    
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+        self.token = 'stub'
+    
+    def taiwan_stock_month_revenue(self, stock_id=None, start_date=None):
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if self.outcomes else 'ok'
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+
+THROTTLE_ERROR = Exception('Final response status: 402, text: {"msg":"Requests reach the upper limit"}')
+PERMISSION_ERROR = Exception('Final response status: 400, text: {"msg":"Your level is register"}')
+SERVER_ERROR = Exception('Final response status: 503, text: Service Unavailable')
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(client_module, 'time', clock)
+    # 固定抖動，退避秒數即為 base * 2^attempt
+    monkeypatch.setattr(client_module.random, 'uniform', lambda low, high: 1.0)
+    return clock
+
+
+def make_client(loader, clock, **kwargs):
+    options = dict(requests_per_hour=3600, burst=1, max_retries=3, backoff_base=2, backoff_max=5,
+                   throttle_pause=60, sleep=clock.sleep)
+    options.update(kwargs)
+    return RateLimitedClient(loader, **options)
+
+
+def test_token_bucket_paces_after_burst(clock):
+    bucket = TokenBucket(rate_per_second=1, capacity=2)
+    
+    assert [bucket.acquire() for _ in range(4)] == [0, 0, 1.0, 1.0]
+    
+    # 閒置後最多只累積 capacity 個權杖
+    clock.now += 10
+    assert [bucket.acquire() for _ in range(3)] == [0, 0, 1.0]
+
+
+def test_token_bucket_pause_delays_next_request(clock):
+    bucket = TokenBucket(rate_per_second=100, capacity=10)
+    bucket.pause(30)
+    
+    assert bucket.acquire() == pytest.approx(30)
+
+
+def test_backoff_grows_exponentially_and_is_capped(clock):
+    api = make_client(StubDataLoader(), clock, backoff_base=2, backoff_max=10)
+    
+    assert [api._backoff_seconds(attempt) for attempt in range(5)] == [2, 4, 8, 10, 10]
+
+
+@pytest.mark.parametrize('error, kind', [
+    (THROTTLE_ERROR, 'throttle'),
+    (Exception('FinMind API unexpected response: Requests reach the upper limit'), 'throttle'),
+    (requests.ConnectionError('connection reset'), 'transient'),
+    (requests.ReadTimeout('read timed out'), 'transient'),
+    (SERVER_ERROR, 'transient'),
+    (PERMISSION_ERROR, 'permanent'),
+    (KeyError('date'), 'permanent'),
+    # 股票代號或日期中的 402、429 不是限流
+    (Exception('no data for 2429 between 2024-02-02 and 2024-04-29'), 'permanent'),
+])
+def test_classify_error(error, kind):
+    assert classify_error(error) == kind
+
+
+def test_throttle_pauses_bucket_and_retries(clock):
+    loader = StubDataLoader(THROTTLE_ERROR, 'data')
+    api = make_client(loader, clock)
+    
+    assert api.taiwan_stock_month_revenue(stock_id='2330') == 'data'
+    assert loader.calls == 2
+    assert api.stats['throttled'] == 1
+    assert api.stats['retries'] == 1
+    # 重試前等待退避 2 秒，並因限流暫停至少 throttle_pause 秒
+    assert sum(clock.sleeps) >= 60
+
+
+def test_transient_error_backs_off_and_retries(clock):
+    loader = StubDataLoader(requests.ConnectionError('reset'), SERVER_ERROR, 'data')
+    api = make_client(loader, clock)
+    
+    assert api.taiwan_stock_month_revenue(stock_id='2330') == 'data'
+    assert loader.calls == 3
+    assert api.stats['retries'] == 2
+    assert api.stats['throttled'] == 0
+    assert api.stats['failures'] == 0
+
+
+@pytest.mark.parametrize('error', [PERMISSION_ERROR, KeyError('date'), TypeError('bad argument')])
+def test_permanent_error_is_raised_without_retry(clock, error):
+    loader = StubDataLoader(error)
+    api = make_client(loader, clock)
+    
+    with pytest.raises(type(error)):
+        api.taiwan_stock_month_revenue(stock_id='2330')
+    assert loader.calls == 1
+    assert api.stats['retries'] == 0
+    assert api.stats['failures'] == 1
+    assert clock.sleeps == []
+
+
+def test_transient_error_gives_up_after_max_retries(clock):
+    loader = StubDataLoader(*[SERVER_ERROR] * 10)
+    api = make_client(loader, clock, max_retries=3)
+    
+    with pytest.raises(Exception, match='503'):
+        api.taiwan_stock_month_revenue(stock_id='2330')
+    assert loader.calls == 4
+    assert api.stats['retries'] == 3
+    assert api.stats['failures'] == 1
+
+
+def test_budget_counters(clock):
+    loader = StubDataLoader('a', SERVER_ERROR, 'b')
+    api = make_client(loader, clock, requests_per_hour=3600, burst=1)
+    
+    api.taiwan_stock_month_revenue(stock_id='2330')
+    api.taiwan_stock_month_revenue(stock_id='2317')
+    
+    assert api.stats['calls'] == 3
+    assert api.stats['success'] == 2
+    assert api.stats['retries'] == 1
+    assert api.stats['by_method'] == {'taiwan_stock_month_revenue': 2}
+    # 每秒 1 個權杖：第二、三次請求各等待權杖，再加上一次 2 秒的退避
+    assert api.stats['wait_seconds'] == pytest.approx(sum(clock.sleeps))
+    
+    # 非 taiwan_ 開頭的屬性直接轉給 DataLoader，不計入用量
+    assert api.token == 'stub'
+    
+    api.reset_stats()
+    assert api.stats['calls'] == 0 and api.stats['by_method'] == {}
@@ -0,0 +1,59 @@
+"""
+Excel 輸出測試：建立新檔的 write-only 串流寫入與覆寫既有活頁簿的結果須相同（數值與百分比格式）
+"""
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+
+from modules.excel_writer import write_excel, write_frame
+
+FRAMES = {
+    '月營收': pd.DataFrame({
+        '代號': [2330, 2317],
+        '名稱': ['台積電', None],
+        '營收成長(%)': [12.5, np.nan],
+        '備註': [np.inf, 1.0],
+    }),
+    '綜合損益表': pd.DataFrame({'項目': ['毛利率', '營收'], '2024Q1': [50.0, 100.0]}),
+}
+PERCENT_ROWS = {'綜合損益表': ['毛利率']}
+
+
+def _dump(path):
+    workbook = load_workbook(path)
+    return {
+        worksheet.title: [[(cell.value, cell.number_format) for cell in row] for row in worksheet.iter_rows()]
+        for worksheet in workbook
+    }
+
+
+def test_new_file_matches_overlay_output(tmp_path):
+    streamed = tmp_path / 'new.xlsx'
+    write_excel(str(streamed), FRAMES, PERCENT_ROWS, new=True)
+    
+    overlay = tmp_path / 'overlay.xlsx'
+    workbook = Workbook()
+    workbook.remove(workbook.active)
+    for sheet_name, df in FRAMES.items():
+        write_frame(workbook.create_sheet(sheet_name), df, PERCENT_ROWS.get(sheet_name))
+    workbook.save(overlay)
+    
+    assert _dump(streamed) == _dump(overlay)
+    assert _dump(streamed)['綜合損益表'][1][1] == (0.5, '0.00%')
+
+
+def test_existing_file_keeps_other_sheets_and_cells(tmp_path):
+    path = tmp_path / 'target.xlsx'
+    workbook = Workbook()
+    workbook.active.title = '清單'
+    workbook.active['A1'] = '代號'
+    workbook.create_sheet('月營收')['H1'] = '使用者備註'
+    workbook.save(path)
+    
+    write_excel(str(path), FRAMES, PERCENT_ROWS)
+    
+    workbook = load_workbook(path)
+    assert workbook.sheetnames == ['清單', '月營收', '綜合損益表']
+    assert workbook['清單']['A1'].value == '代號'
+    assert workbook['月營收']['H1'].value == '使用者備註'
+    assert workbook['月營收']['A2'].value == 2330
@@ -0,0 +1,75 @@
+"""
+綜合損益表與 EPS 整批計算測試：compute_financial_table、compute_eps_table 的結果（含欄位順序）
+須與逐檔計算（tests/financial_reference.py）完全相同
+"""
+from datetime import datetime
+
+import pandas as pd
+import pytest
+from financial_reference import process_eps_data, process_financial_data
+
+from modules.financial import get_last_season_month, get_season_date, process_eps_table, process_financial_table
+
+CURRENT_YEAR = datetime.now().year
+
+
+def _season_dates(first_year):
+    """first_year 起到上一季為止的所有季末日期"""
+    last_year, last_month = get_last_season_month()
+    return [
+        get_season_date(year, month)
+        for year in range(first_year, last_year + 1) for month in (3, 6, 9, 12)
+        if (year, month) <= (last_year, last_month)
+    ]
+
+
+def _financial(dates, types=('Revenue', 'GrossProfit', 'EPS'), seed=1):
+    rows = []
+    for i, season_date in enumerate(dates):
+        for data_type in types:
+            value = {'Revenue': 5e9 + i * 3.7e8 * seed, 'GrossProfit': 2.1e9 + i * 1.3e8, 'EPS': round(1.1 * seed + i * 0.37, 2)}[data_type]
+            rows.append({'date': season_date, 'stock_id': str(seed), 'type': data_type, 'value': value})
+    return pd.DataFrame(rows)
+
+
+def _cases():
+    dates = _season_dates(CURRENT_YEAR - 2)
+    duplicated = _financial(dates, seed=5)
+    duplicated = pd.concat([duplicated, duplicated.tail(3).assign(value=-1.0)], ignore_index=True)
+    zero_eps = _financial(dates, seed=6)
+    zero_eps.loc[(zero_eps['type'] == 'EPS') & zero_eps['date'].str.startswith(str(CURRENT_YEAR)), 'value'] = 0.0
+    zero_eps.loc[(zero_eps['type'] == 'Revenue') & zero_eps['date'].str.startswith(str(CURRENT_YEAR - 1)), 'value'] = 0.0
+    return {
+        0: _financial(dates, seed=2),
+        1: None,
+        2: _financial(dates, types=('EPS',), seed=3),
+        3: _financial(dates[:-2], seed=4),
+        4: duplicated,
+        5: _financial(dates, types=('Revenue', 'EPS'), seed=7),
+        6: zero_eps,
+        7: _financial([d for d in dates if d.startswith(str(CURRENT_YEAR))], seed=8),
+    }
+
+
+def _orderings():
+    cases = _cases()
+    # 第一檔沒有去年數據時，去年整年欄位由後面的股票建立，欄位順序須相同
+    reordered = {row: cases[key] for row, key in enumerate([7, 1, 2, 0, 3, 4, 5, 6])}
+    return [cases, reordered, {0: None, 1: None}, {0: cases[7], 1: cases[2]}]
+
+
+@pytest.mark.parametrize('frames', _orderings(), ids=['mixed', 'reordered', 'all_missing', 'no_last_year'])
+@pytest.mark.parametrize('process_table, process_data', [
+    (process_financial_table, process_financial_data),
+    (process_eps_table, process_eps_data),
+], ids=['financial', 'eps'])
+def test_table_matches_per_stock_engine(frames, process_table, process_data):
+    expected = pd.DataFrame({'代號': list(frames)})
+    for idx, financial_data in frames.items():
+        process_data(expected, idx, financial_data)
+    
+    actual = pd.DataFrame({'代號': list(frames)})
+    process_table(actual, frames)
+    
+    assert list(actual.columns) == list(expected.columns)
+    pd.testing.assert_frame_equal(actual, expected)
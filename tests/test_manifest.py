@@ -0,0 +1,62 @@
+"""
+快取索引測試：多個程序同時寫回索引時，各程序的更新都須保留
+"""
+import json
+import multiprocessing
+
+import pytest
+
+from modules import manifest
+
+
+def _update_many(path, worker, count):
+    """子程序：逐筆更新並寫回索引"""
+    manifest.MANIFEST_PATH = path
+    manifest._entries = None
+    manifest._changed.clear()
+    for i in range(count):
+        manifest.update_entry(f'{worker}-{i}', 'revenue', None)
+        manifest.save_manifest()
+
+
+@pytest.fixture
+def manifest_path(tmp_path, monkeypatch):
+    path = str(tmp_path / 'manifest.json')
+    monkeypatch.setattr(manifest, 'MANIFEST_PATH', path)
+    monkeypatch.setattr(manifest, 'DATA_DIR', str(tmp_path))
+    monkeypatch.setattr(manifest, '_entries', None)
+    monkeypatch.setattr(manifest, '_changed', set())
+    return path
+
+
+def test_save_merges_updates_from_other_processes(manifest_path):
+    manifest.update_entry('2330', 'revenue', None)
+    manifest.save_manifest()
+    
+    # 其他程序寫入後，本程序寫回時只覆蓋自己變更的紀錄
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+    entries['financial'] = {'1101': {'latest': None, 'rows': 0, 'fetched_at': None}}
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(entries, f)
+    
+    manifest.mark_fetched('2317', 'revenue')
+    manifest.save_manifest()
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+    assert set(entries['revenue']) == {'2330', '2317'}
+    assert set(entries['financial']) == {'1101'}
+
+
+def test_concurrent_processes_keep_every_update(manifest_path):
+    context = multiprocessing.get_context('spawn')
+    workers = [context.Process(target=_update_many, args=(manifest_path, worker, 40)) for worker in range(4)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join(timeout=120)
+        assert process.exitcode == 0
+    
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+    assert len(entries['revenue']) == 4 * 40
@@ -0,0 +1,104 @@
+"""
+收盤價取得測試：以假 DataLoader 計算各路徑的 API 呼叫次數，逐檔抓取的備援路徑不得超過每檔一次
+"""
+import pandas as pd
+import pytest
+
+from modules import price
+from modules.context import StockDataContext
+from modules.price import get_latest_closes
+
+STOCK_IDS = ['2330', '2317', '1101', '2454']
+PERMISSION_ERROR = Exception('Final response status: 400, text: {"msg":"Your level is register"}')
+
+
+class StubDataLoader:
+    """記錄 taiwan_stock_daily 呼叫次數的假 DataLoader；market_error 為全市場查詢拋出的例外"""
+    
+    def __init__(self, market_error=None):
+        self.market_error = market_error
+        self.market_calls = 0
+        self.stock_calls = 0
+    
+    def taiwan_stock_daily(self, stock_id=None, start_date=None, end_date=None):
+        if stock_id is None:
+            self.market_calls += 1
+            if self.market_error is not None:
+                raise self.market_error
+            return pd.DataFrame({'stock_id': STOCK_IDS, 'close': [100.0 + i for i in range(len(STOCK_IDS))]})
+        self.stock_calls += 1
+        return pd.DataFrame({'date': ['2024-01-02', '2024-01-03'], 'close': [10.0, float(stock_id)]})
+
+
+@pytest.fixture(autouse=True)
+def price_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(price, 'PRICE_CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(price, '_market_unavailable', False)
+
+
+def test_per_stock_path_costs_one_call_per_stock(monkeypatch):
+    monkeypatch.setattr(price, 'MARKET_WIDE_CLOSES', False)
+    api = StubDataLoader()
+    
+    trading_date, closes = get_latest_closes(api, STOCK_IDS, StockDataContext(api))
+    
+    assert api.market_calls == 0
+    assert api.stock_calls == len(STOCK_IDS)
+    assert trading_date == '2024-01-03'
+    assert closes == {stock_id: float(stock_id) for stock_id in STOCK_IDS}
+
+
+def test_rejected_market_query_is_not_retried(monkeypatch):
+    monkeypatch.setattr(price, 'MARKET_WIDE_CLOSES', True)
+    api = StubDataLoader(market_error=PERMISSION_ERROR)
+    
+    get_latest_closes(api, STOCK_IDS, StockDataContext(api))
+    assert api.market_calls == 1
+    assert api.stock_calls == len(STOCK_IDS)
+    
+    # 同一程序的下一次執行（例如常駐服務的下一個請求）不再查詢全市場，逐檔收盤價使用快取
+    get_latest_closes(api, STOCK_IDS, StockDataContext(api))
+    assert api.market_calls == 1
+    assert api.stock_calls == len(STOCK_IDS)
+
+
+def test_market_query_replaces_per_stock_calls(monkeypatch):
+    monkeypatch.setattr(price, 'MARKET_WIDE_CLOSES', True)
+    api = StubDataLoader()
+    
+    _, closes = get_latest_closes(api, STOCK_IDS, StockDataContext(api))
+    assert (api.market_calls, api.stock_calls) == (1, 0)
+    assert closes['2330'] == 100.0
+    
+    # 同一交易日再次執行使用收盤價快取，不呼叫 API
+    get_latest_closes(api, STOCK_IDS, StockDataContext(api))
+    assert (api.market_calls, api.stock_calls) == (1, 0)
+
+
+def test_per_stock_closes_are_cached_for_the_day(monkeypatch):
+    monkeypatch.setattr(price, 'MARKET_WIDE_CLOSES', False)
+    api = StubDataLoader()
+    first = get_latest_closes(api, STOCK_IDS[:3], StockDataContext(api))
+    assert api.stock_calls == 3
+    
+    # 當天再次執行只抓取快取中沒有的股票
+    second = get_latest_closes(api, STOCK_IDS, StockDataContext(api))
+    assert api.stock_calls == 4
+    assert second[0] == first[0] == '2024-01-03'
+    assert second[1] == {stock_id: float(stock_id) for stock_id in STOCK_IDS}
+    
+    get_latest_closes(api, STOCK_IDS, StockDataContext(api))
+    assert api.stock_calls == 4
+    snapshot = price.load_price_snapshot('2024-01-03')
+    assert snapshot['complete'] is False
+    assert sorted(snapshot['closes']) == sorted(STOCK_IDS)
+
+
+def test_per_stock_closes_from_another_day_are_refetched(monkeypatch):
+    monkeypatch.setattr(price, 'MARKET_WIDE_CLOSES', False)
+    price.save_price_snapshot('2024-01-03', {'complete': False, 'closes': {'2330': 1.0}, 'fetched_on': '2024-01-03'})
+    api = StubDataLoader()
+    
+    _, closes = get_latest_closes(api, STOCK_IDS, StockDataContext(api))
+    assert api.stock_calls == len(STOCK_IDS)
+    assert closes['2330'] == 2330.0
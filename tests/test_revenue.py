@@ -0,0 +1,63 @@
+"""
+營收整批計算測試：compute_revenue_table 的結果須與逐檔計算（tests/revenue_reference.py）完全相同，
+包含查無數據、只有部分月份、同一月份重複、營收為 0 的股票
+"""
+import pandas as pd
+import pytest
+from revenue_reference import process_revenue_data
+
+from modules.revenue import get_previous_three_months, process_revenue_table
+
+MONTHS = get_previous_three_months()
+(LAST_YEAR, LAST_MONTH), _, _ = MONTHS
+
+
+def _months_back(count):
+    """由上個月往前 count 個月的 (年, 月)，由舊到新"""
+    year, month = LAST_YEAR, LAST_MONTH
+    months = []
+    for _ in range(count):
+        months.append((year, month))
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return months[::-1]
+
+
+def _revenue(months, base=1_000_000_000, step=37_500_000):
+    return pd.DataFrame({
+        'date': [f'{year}-{month:02d}-01' for year, month in months],
+        'revenue_year': [year for year, _ in months],
+        'revenue_month': [month for _, month in months],
+        'revenue': [base + i * step for i in range(len(months))],
+    })
+
+
+def _cases():
+    full = _revenue(_months_back(26))
+    duplicated = pd.concat([full, _revenue(_months_back(1), base=2_222_222_222)], ignore_index=True)
+    zero_previous = full.copy()
+    zero_previous.loc[len(zero_previous) - 2, 'revenue'] = 0
+    return {
+        0: full,
+        1: None,
+        2: _revenue(_months_back(2)),
+        3: _revenue(_months_back(14)[:3]),
+        4: duplicated,
+        5: zero_previous,
+        6: pd.DataFrame(columns=['date', 'revenue_year', 'revenue_month', 'revenue']),
+        7: _revenue(_months_back(13)[:1] + _months_back(1)),
+    }
+
+
+@pytest.mark.parametrize('frames', [_cases(), {0: None, 1: None}], ids=['mixed', 'all_missing'])
+def test_revenue_table_matches_per_stock_engine(frames):
+    (last_year, last_month), (previous_year, previous_month), (previous_year2, previous_month2) = MONTHS
+    args = (last_year, last_month, previous_year, previous_month, previous_year2, previous_month2, last_year - 1)
+    
+    expected = pd.DataFrame({'代號': list(frames)})
+    for idx, revenue_data in frames.items():
+        process_revenue_data(expected, idx, revenue_data, *args)
+    
+    actual = pd.DataFrame({'代號': list(frames)})
+    process_revenue_table(actual, {idx: data if data is not None and not data.empty else None for idx, data in frames.items()}, *args)
+    
+    pd.testing.assert_frame_equal(actual, expected)
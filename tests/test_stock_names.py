@@ -0,0 +1,53 @@
+"""
+股票名稱對照表測試：背景更新於程序結束前完成寫入，寫入過程不留下暫存檔或不完整的對照表
+"""
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+from modules import stock_names
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 對照表過期時於背景更新，主程式取得現有對照表後立即結束
+ONE_SHOT_SCRIPT = '''
+import sys, time
+import pandas as pd
+from modules import stock_names
+stock_names.STOCK_INFO_PATH = sys.argv[1]
+
+class SlowLoader:
+    def taiwan_stock_info(self):
+        time.sleep(1)
+        return pd.DataFrame({'stock_id': ['2330', '2317'], 'stock_name': ['台積電', '鴻海']})
+
+print(stock_names.get_stock_name_mapping(SlowLoader(), ['2330']))
+'''
+
+
+def test_save_replaces_file_without_leftovers(tmp_path, monkeypatch):
+    path = tmp_path / 'stock_info.json'
+    monkeypatch.setattr(stock_names, 'STOCK_INFO_PATH', str(path))
+    
+    stock_names._save({'2330': '台積電'}, datetime(2024, 1, 2, 3, 4, 5))
+    
+    assert json.loads(path.read_text(encoding='utf-8')) == {'fetched_at': '2024-01-02T03:04:05', 'names': {'2330': '台積電'}}
+    assert os.listdir(tmp_path) == ['stock_info.json']
+
+
+def test_background_refresh_finishes_before_exit(tmp_path):
+    path = tmp_path / 'stock_info.json'
+    path.write_text(json.dumps({'fetched_at': '2000-01-01T00:00:00', 'names': {'2330': '舊名稱'}}), encoding='utf-8')
+    
+    result = subprocess.run(
+        [sys.executable, '-c', ONE_SHOT_SCRIPT, str(path)],
+        cwd=ROOT_DIR, capture_output=True, text=True, timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    assert '舊名稱' in result.stdout
+    
+    data = json.loads(path.read_text(encoding='utf-8'))
+    assert data['names'] == {'2330': '台積電', '2317': '鴻海'}
+    assert os.listdir(tmp_path) == ['stock_info.json']
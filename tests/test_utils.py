@@ -0,0 +1,31 @@
+"""
+股票代號讀取測試：串流讀取時略過空白與無效的代號，不中斷整批處理
+"""
+import logging
+
+from openpyxl import Workbook
+
+from modules.utils import read_stock_ids
+
+
+def _write_ids(path, values):
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.append(['名稱', '代號'])
+    for value in values:
+        worksheet.append(['x', value])
+    workbook.save(path)
+    return path
+
+
+def test_read_stock_ids_converts_numeric_cells(tmp_path):
+    path = _write_ids(tmp_path / 'ids.xlsx', [2330, '2317', 1101.0, ' 2454 '])
+    assert list(read_stock_ids(path)) == [2330, 2317, 1101, 2454]
+
+
+def test_read_stock_ids_skips_blank_and_invalid_cells(tmp_path, caplog):
+    path = _write_ids(tmp_path / 'ids.xlsx', [2330, None, '  ', '2881A', 'nan', 'inf', 1101])
+    with caplog.at_level(logging.WARNING):
+        assert list(read_stock_ids(path)) == [2330, 1101]
+    assert len(caplog.records) == 3
+    assert '第 5 列' in caplog.records[0].getMessage()
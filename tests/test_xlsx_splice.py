@@ -0,0 +1,59 @@
+"""
+工作表替換測試：替換後讀回的數值須與 DataFrame 完全相同（不得因格式化損失精度）
+"""
+import zipfile
+import xml.etree.ElementTree as ET
+
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+
+from modules.xlsx_splice import MAIN_NS, _cell_xml, splice_sheets
+
+# CT_Worksheet 規定的子元素順序（只列出本模組會寫入或沿用的元素）
+WORKSHEET_ORDER = ['sheetPr', 'dimension', 'sheetViews', 'sheetFormatPr', 'cols', 'sheetData']
+
+
+def test_cell_xml_uses_round_trip_float_format():
+    assert _cell_xml('A1', 0.1 + 0.2, None) == '<c r="A1"><v>0.30000000000000004</v></c>'
+    assert _cell_xml('A1', 1e-07, None) == '<c r="A1"><v>1e-07</v></c>'
+    assert _cell_xml('A1', 2330, None) == '<c r="A1"><v>2330</v></c>'
+
+
+def test_splice_sheets_round_trips_values(tmp_path):
+    path = tmp_path / 'out.xlsx'
+    workbook = Workbook()
+    workbook.active.title = '清單'
+    workbook.active.append(['代號', '名稱'])
+    workbook.save(path)
+    
+    values = [0.1 + 0.2, 123456789.12345679, 1 / 3, -2.5e-10]
+    df = pd.DataFrame({'代號': [2330, 2317, 1101, 2454], '數值': values, '名稱': ['台積電', ' 鴻海', 'A&B', None]})
+    splice_sheets(str(path), {'月營收': df})
+    
+    workbook = load_workbook(path)
+    assert workbook.sheetnames == ['清單', '月營收']
+    rows = list(workbook['月營收'].iter_rows(values_only=True))
+    assert rows[0] == ('代號', '數值', '名稱')
+    assert [row[1] for row in rows[1:]] == values
+    assert [row[2] for row in rows[1:]] == ['台積電', ' 鴻海', 'A&B', None]
+
+
+def test_splice_keeps_worksheet_element_order(tmp_path):
+    path = tmp_path / 'out.xlsx'
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.title = '月營收'
+    worksheet.sheet_properties.tabColor = 'FF0000'
+    worksheet.freeze_panes = 'B2'
+    worksheet.column_dimensions['A'].width = 20
+    worksheet.append(['舊數據'])
+    workbook.save(path)
+    
+    splice_sheets(str(path), {'月營收': pd.DataFrame({'代號': [2330], '數值': [1.5]})})
+    
+    with zipfile.ZipFile(path) as archive:
+        root = ET.fromstring(archive.read('xl/worksheets/sheet1.xml'))
+    tags = [child.tag.replace(f'{{{MAIN_NS}}}', '') for child in root]
+    assert tags == WORKSHEET_ORDER
+    assert root.find(f'{{{MAIN_NS}}}sheetPr/{{{MAIN_NS}}}tabColor') is not None
+    assert root.find(f'{{{MAIN_NS}}}sheetViews/{{{MAIN_NS}}}sheetView/{{{MAIN_NS}}}pane') is not None